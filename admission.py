@@ -0,0 +1,86 @@
+# admission.py
+#
+# Per-worker admission control. A call is admitted at the /incoming-call
+# webhook, which reserves a session slot until Twilio opens the media stream;
+# past the budget the webhook sheds the call instead, so a burst turns a few
+# callers away cleanly rather than degrading every call on the worker.
+
+import time
+from collections import deque
+
+from metrics import REGISTRY
+
+ADMITTED = REGISTRY.counter("golfbot_calls_admitted_total", "Calls admitted by the capacity manager.")
+SHED = REGISTRY.labeled_counter(
+    "golfbot_calls_shed_total",
+    "Calls turned away because the worker was over budget, by the limit that was hit.",
+    "reason")
+
+
+class CapacityManager:
+    """Tracks active sessions, event-loop lag and upload backlog against limits.
+
+    `loop_lag` and `upload_backlog` are callables read at decision time
+    (seconds and recording parts). A limit of 0 disables that check.
+    """
+
+    def __init__(self, max_sessions=50, max_loop_lag=0.25, max_upload_backlog=16,
+                 loop_lag=None, upload_backlog=None, reservation_ttl=15.0):
+        self.max_sessions = max_sessions
+        self.max_loop_lag = max_loop_lag
+        self.max_upload_backlog = max_upload_backlog
+        self.loop_lag = loop_lag or (lambda: 0.0)
+        self.upload_backlog = upload_backlog or (lambda: 0)
+        self.reservation_ttl = reservation_ttl
+        self.active = 0
+        self._reservations = deque()  # expiry times of admitted calls whose stream has not opened yet
+
+    @property
+    def reserved(self):
+        self._expire(time.monotonic())
+        return len(self._reservations)
+
+    def _expire(self, now):
+        while self._reservations and self._reservations[0] <= now:
+            self._reservations.popleft()
+
+    def over_budget(self):
+        """The name of the first limit the worker is over, or None."""
+        if self.max_sessions and self.active + self.reserved >= self.max_sessions:
+            return "sessions"
+        if self.max_loop_lag and self.loop_lag() >= self.max_loop_lag:
+            return "loop_lag"
+        if self.max_upload_backlog and self.upload_backlog() >= self.max_upload_backlog:
+            return "upload_backlog"
+        return None
+
+    def admit_call(self):
+        """Decide on a new call at the webhook. Returns the shed reason, or None if admitted."""
+        reason = self.over_budget()
+        if reason is not None:
+            SHED.inc(reason)
+            return reason
+        self._reservations.append(time.monotonic() + self.reservation_ttl)
+        ADMITTED.inc()
+        return None
+
+    def stream_started(self):
+        """Claim a slot for a media stream. Returns the shed reason, or None if it may proceed.
+
+        A stream for a call admitted at the webhook always proceeds; one with
+        no reservation (it expired, or the webhook was bypassed) is judged
+        like a new call.
+        """
+        if self.reserved:
+            self._reservations.popleft()
+        else:
+            reason = self.over_budget()
+            if reason is not None:
+                SHED.inc(reason)
+                return reason
+            ADMITTED.inc()
+        self.active += 1
+        return None
+
+    def stream_ended(self):
+        self.active -= 1
@@ -0,0 +1,144 @@
+# analytics.py
+#
+# Structured per-call analytics: transcripts, timings, tool calls and
+# outcomes. Logging an event during a call is one append to an in-memory
+# batch; a background task serializes the batch to gzipped JSON lines and
+# writes it to a local directory or S3 when it reaches `max_events` or every
+# `flush_interval` seconds, so logging volume never reaches the audio path.
+#
+# Files are named analytics/YYYY/MM/DD/HHMMSS-<id>.jsonl.gz, one event per
+# line, each with `type`, `ts` (unix time) and, for call events, `call_id`.
+
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+from metrics import REGISTRY
+
+EVENTS = REGISTRY.counter("golfbot_analytics_events_total", "Analytics events queued.")
+DROPPED = REGISTRY.counter("golfbot_analytics_events_dropped_total",
+                           "Analytics events dropped because the batch was full or a write failed.")
+BATCHES = REGISTRY.counter("golfbot_analytics_batches_total", "Analytics batches written.")
+FLUSH_LATENCY = REGISTRY.histogram("golfbot_analytics_flush_seconds", "Time to serialize and write one batch.")
+
+
+class CallLog:
+    """Events for one sampled call, tagged with its id."""
+
+    __slots__ = ("sink", "call_id")
+
+    def __init__(self, sink, call_id):
+        self.sink = sink
+        self.call_id = call_id
+
+    def event(self, type, **fields):
+        fields["type"] = type
+        fields["ts"] = time.time()
+        fields["call_id"] = self.call_id
+        self.sink.record(fields)
+
+
+class AnalyticsSink:
+    """Batches analytics events in memory and writes them out in the background.
+
+    `sample_rate` is the fraction of calls logged; a call is in or out as a
+    whole, so sampled transcripts are complete. At most `max_pending` events
+    wait in memory; beyond that new ones are dropped and counted rather than
+    slowing the caller. With `s3_client` batches go to `bucket` under
+    `prefix`, otherwise to `directory`.
+    """
+
+    def __init__(self, directory=None, s3_client=None, bucket=None, prefix="analytics/", sample_rate=1.0,
+                 max_events=1000, flush_interval=60.0, max_pending=50000):
+        self.directory = directory
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.sample_rate = sample_rate
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._events = deque()
+        self._full = asyncio.Event()
+        self._task = None
+
+    def call(self, call_id):
+        """A `CallLog` for `call_id`, or None if the call is not sampled."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return None
+        return CallLog(self, call_id)
+
+    def event(self, type, **fields):
+        """Log an event that belongs to no call, such as a shed call; sampled like calls."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        fields["type"] = type
+        fields["ts"] = time.time()
+        self.record(fields)
+
+    def record(self, event):
+        if len(self._events) >= self.max_pending:
+            DROPPED.inc()
+            return
+        self._events.append(event)
+        EVENTS.inc()
+        if len(self._events) >= self.max_events:
+            self._full.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the background task and write whatever is still batched."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._events:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            while self._events:
+                await self.flush()
+                if len(self._events) < self.max_events:
+                    break
+
+    async def flush(self):
+        """Write up to `max_events` batched events as one file."""
+        batch = [self._events.popleft() for _ in range(min(len(self._events), self.max_events))]
+        if not batch:
+            return
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._write, batch)
+            BATCHES.inc()
+        except Exception as e:
+            DROPPED.inc(len(batch))
+            print(f"Error writing {len(batch)} analytics events: {e}")
+        finally:
+            FLUSH_LATENCY.observe(time.monotonic() - started)
+
+    def _write(self, batch):
+        lines = "".join(json.dumps(event, separators=(",", ":"), default=str) + "\n" for event in batch)
+        body = gzip.compress(lines.encode("utf-8"), compresslevel=6)
+        name = f"{datetime.now(timezone.utc):%Y/%m/%d/%H%M%S}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+        if self.s3_client is not None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + name, Body=body,
+                                      ContentType="application/gzip")
+            return
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(body)
+        os.replace(path + ".tmp", path)
@@ -2,20 +2,53 @@ import os
 import json
 import base64
 import asyncio
-import websockets
+import functools
+from time import perf_counter
+from urllib.parse import parse_qs
 import config
 import uvicorn
 
 from fastapi import FastAPI, WebSocket, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.websockets import WebSocketDisconnect
-from twilio.twiml.voice_response import VoiceResponse, Connect, Say, Stream
-from s3_client import s3_client  # Import the S3 client object
-from asyncio import Queue
+from twilio.twiml.voice_response import VoiceResponse
+from s3_client import s3_client
+from s3_uploader import S3Uploader
+from recording import RecordingBuffer
+from spool import RecordingSpool, SpoolShipper
+from realtime_pool import RealtimeSessionPool
+from relay import loads, input_audio_append
+from relay_queue import RelayQueue
+from metrics import REGISTRY, CALLS, COURSE_CALLS, ACTIVE_CALLS, UPLOAD_LAG, CallMetrics
+from loop_watchdog import LoopWatchdog, handler_codes
+from admission import CapacityManager
+from vad import BargeInDetector, TurnDetector
+from call_io import CallRecording, TwilioOutput
+from golfnow import TOOLS, TOOL_INSTRUCTIONS, GolfNowClient, TeeTimeCache, TeeTimeTools
+from clip_cache import ClipCache, render_clip
+from courses import Course, CourseRegistry
+from analytics import AnalyticsSink
+from capture import CallCapture, TWILIO_IN, OPENAI_OUT, OPENAI_IN
+from cascade import CascadeEngine, backend, http_client
 
 # ssh -i ec2key.pem ec2-user@54.234.196.83 -vvv
 
-upload_queue = None
+uploader = None
+realtime_pool = None
+watchdog = None
+capacity = None
+spool_shipper = None
+golfnow = None
+tee_time_cache = None
+clip_cache = None
+courses = None
+analytics = None
+cascade = None
+startup_started = None
+ready_at = None  # when every warm resource first came up
+s3_ready = None  # True once S3 answered, else the last warm-up error
+s3_bucket_errors = {}  # bucket -> why S3 refused the warm-up request for it
+shutting_down = False
 
 # Configuration
 OPENAI_API_KEY = config.OPENAI_API_KEY
@@ -24,6 +57,12 @@ SYSTEM_MESSAGE = (
     "You are an AI answering machine for the Fremont Park golf course in Fremont, CA. The weather is 42 degrees fahrenheit low and 55 high. The course opens at 7:30am and last tee time is around 4pm. The restaurant in the clubhouse is open toda. There are clubs available for rent. Do not talk too much. Give concise responses and speak quickly. Be very courteous."
 )
 VOICE = 'alloy'
+COURSE_ID = os.getenv('COURSE_ID', 'fremont-park')
+GREETING = "Fremont Park Golf Course AI Assistant on the line. How can I help you?"
+# Courses answered by this worker, keyed by the Twilio number called (see courses.example.json).
+# Without the file every call gets the built-in course above.
+COURSES_FILE = os.getenv('COURSES_FILE', 'courses.json')
+COURSES_POLL_SECONDS = float(os.getenv('COURSES_POLL_SECONDS', 5))
 LOG_EVENT_TYPES = [
     'error', 'response.content.done', 'rate_limits.updated',
     'response.done', 'input_audio_buffer.committed',
@@ -35,6 +74,108 @@ SHOW_TIMING_MATH = False
 app = FastAPI()
 
 S3_BUCKET_NAME = "audio-calls-info"
+# Raise S3_MAX_POOL_CONNECTIONS (see s3_client.py) along with this
+S3_UPLOAD_WORKERS = int(os.getenv('S3_UPLOAD_WORKERS', 8))
+S3_MAX_PENDING_PARTS = int(os.getenv('S3_MAX_PENDING_PARTS', 16))
+RECORDING_MAX_PARTS = int(os.getenv('RECORDING_MAX_PARTS', 4))  # per-call cap, in 5 MB parts
+# Connections opened at startup, before /ready reports the worker ready. The warm-up
+# lists multipart uploads, so every course bucket needs s3:ListBucketMultipartUploads,
+# which spool recovery uses too. A bucket that refuses it is reported on /ready.
+S3_WARM_CONNECTIONS = int(os.getenv('S3_WARM_CONNECTIONS', 2))
+# 'combined': caller and agent audio in arrival order (mono)
+# 'stereo': caller left, agent right, aligned on the call timeline
+# 'off': no recording; audio payloads are relayed without being decoded
+RECORDING_MODE = os.getenv('RECORDING_MODE', 'combined')
+# Recordings are written to a per-call file here and shipped to S3 from disk, so a
+# crashed worker's calls are uploaded on the next startup. Empty keeps them in memory.
+RECORDING_SPOOL_DIR = os.getenv('RECORDING_SPOOL_DIR', 'recording_spool')
+SPOOL_STALE_HOURS = float(os.getenv('SPOOL_STALE_HOURS', 24))  # abort unclaimed multipart uploads older than this
+OPENAI_REALTIME_URL = os.getenv(
+    'OPENAI_REALTIME_URL',
+    'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17'
+)
+REALTIME_POOL_MIN = int(os.getenv('REALTIME_POOL_MIN', 1))
+REALTIME_POOL_MAX = int(os.getenv('REALTIME_POOL_MAX', 8))
+REALTIME_POOL_IDLE_TTL = float(os.getenv('REALTIME_POOL_IDLE_TTL', 300))
+# Agent audio is re-cut into frames of this length (0 relays OpenAI deltas as-is),
+# with a Twilio mark after every OUTBOUND_MARK_EVERY_MS of audio
+OUTBOUND_FRAME_MS = int(os.getenv('OUTBOUND_FRAME_MS', 100))
+OUTBOUND_MARK_EVERY_MS = int(os.getenv('OUTBOUND_MARK_EVERY_MS', 500))
+# Interrupt the agent from local VAD instead of waiting for OpenAI's server VAD
+LOCAL_BARGE_IN = os.getenv('LOCAL_BARGE_IN', '0') == '1'
+BARGE_IN_ENERGY_DBFS = float(os.getenv('BARGE_IN_ENERGY_DBFS', -30))
+BARGE_IN_MAX_ZCR = float(os.getenv('BARGE_IN_MAX_ZCR', 0.5))
+BARGE_IN_MIN_SPEECH_MS = int(os.getenv('BARGE_IN_MIN_SPEECH_MS', 60))
+# Per-worker call budget; 0 disables a limit
+MAX_ACTIVE_CALLS = int(os.getenv('MAX_ACTIVE_CALLS', 50))
+MAX_LOOP_LAG_MS = float(os.getenv('MAX_LOOP_LAG_MS', 250))
+MAX_UPLOAD_BACKLOG = int(os.getenv('MAX_UPLOAD_BACKLOG', S3_MAX_PENDING_PARTS))  # recording parts
+# What a shed caller gets: 'hold' (message, pause, retry), 'queue' (<Enqueue> into
+# SHED_QUEUE_NAME until /shed-wait sees room, checked every SHED_HOLD_SECONDS) or
+# 'redirect' (to /incorrect)
+SHED_ACTION = os.getenv('SHED_ACTION', 'hold')
+SHED_QUEUE_NAME = os.getenv('SHED_QUEUE_NAME', 'golfbot-overflow')
+SHED_HOLD_SECONDS = int(os.getenv('SHED_HOLD_SECONDS', 10))
+# Bounded queues between the legs: caller audio waiting for OpenAI (in 20 ms frames) and
+# messages waiting for Twilio. On overflow 'drop_oldest' discards the stalest audio,
+# 'block' stops reading from the source socket until the queue drains.
+OPENAI_QUEUE_SIZE = int(os.getenv('OPENAI_QUEUE_SIZE', 50))
+OPENAI_QUEUE_POLICY = os.getenv('OPENAI_QUEUE_POLICY', 'drop_oldest')
+TWILIO_QUEUE_SIZE = int(os.getenv('TWILIO_QUEUE_SIZE', 100))
+TWILIO_QUEUE_POLICY = os.getenv('TWILIO_QUEUE_POLICY', 'block')
+# GolfNow tee-time tools; empty GOLFNOW_API_URL leaves the session without tools
+GOLFNOW_API_URL = os.getenv('GOLFNOW_API_URL', '')
+GOLFNOW_API_KEY = os.getenv('GOLFNOW_API_KEY')
+GOLFNOW_COURSE_ID = os.getenv('GOLFNOW_COURSE_ID', COURSE_ID)
+TEE_TIME_DAYS_AHEAD = int(os.getenv('TEE_TIME_DAYS_AHEAD', 7))
+TEE_TIME_REFRESH_SECONDS = float(os.getenv('TEE_TIME_REFRESH_SECONDS', 60))
+TEE_TIME_TTL_SECONDS = float(os.getenv('TEE_TIME_TTL_SECONDS', 300))
+# Pre-rendered prompt clips: memory LRU, then this directory, then S3 (with CLIP_CACHE_S3=1).
+# Empty disables the cache and the model speaks the greeting.
+CLIP_CACHE_DIR = os.getenv('CLIP_CACHE_DIR', 'clip_cache')
+CLIP_CACHE_S3 = os.getenv('CLIP_CACHE_S3', '0') == '1'
+CLIP_CACHE_MAX_BYTES = int(os.getenv('CLIP_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+# Per-call analytics (transcripts, timings, tool calls, outcomes) as gzipped JSON lines,
+# in ANALYTICS_DIR or, with ANALYTICS_S3=1, in S3 under analytics/. Off unless one of
+# them is set, since the logs hold what callers said.
+ANALYTICS_DIR = os.getenv('ANALYTICS_DIR', '')
+ANALYTICS_S3 = os.getenv('ANALYTICS_S3', '0') == '1'
+ANALYTICS_SAMPLE_RATE = float(os.getenv('ANALYTICS_SAMPLE_RATE', 1.0))  # fraction of calls logged
+ANALYTICS_BATCH_EVENTS = int(os.getenv('ANALYTICS_BATCH_EVENTS', 1000))
+ANALYTICS_FLUSH_SECONDS = float(os.getenv('ANALYTICS_FLUSH_SECONDS', 60))
+# Have OpenAI transcribe the caller's audio for the analytics transcript. This adds
+# input_audio_transcription (whisper-1, billed per minute of caller audio) to every
+# Realtime session, sampled or not, so it is opt-in.
+ANALYTICS_CALLER_TRANSCRIPTS = os.getenv('ANALYTICS_CALLER_TRANSCRIPTS', '0') == '1'
+# Write both message streams of every call to CAPTURE_DIR, for replaying with
+# benchmarks/replay.py. Off when empty; meant for reproducing a problem, not for every call.
+CAPTURE_DIR = os.getenv('CAPTURE_DIR', '')
+# 'realtime' answers calls through an OpenAI Realtime session. 'cascade' detects the end of
+# the caller's turn locally, then chains speech-to-text, a streamed chat model and
+# sentence-by-sentence text-to-speech (cascade.py). A course's "engine" overrides it.
+# With no realtime courses, REALTIME_POOL_MIN=0 stops keeping warm Realtime sessions.
+ENGINE = os.getenv('ENGINE', 'realtime')
+# Cascade backends, by name from cascade.py, and the service each one calls
+CASCADE_ASR = os.getenv('CASCADE_ASR', 'whisper')
+CASCADE_ASR_URL = os.getenv('CASCADE_ASR_URL', 'https://api.openai.com')
+CASCADE_ASR_API_KEY = os.getenv('CASCADE_ASR_API_KEY', OPENAI_API_KEY)
+CASCADE_ASR_MODEL = os.getenv('CASCADE_ASR_MODEL')
+CASCADE_LLM = os.getenv('CASCADE_LLM', 'openai')
+CASCADE_LLM_URL = os.getenv('CASCADE_LLM_URL', 'https://api.openai.com')
+CASCADE_LLM_API_KEY = os.getenv('CASCADE_LLM_API_KEY', OPENAI_API_KEY)
+CASCADE_LLM_MODEL = os.getenv('CASCADE_LLM_MODEL')
+CASCADE_TTS = os.getenv('CASCADE_TTS', 'openai')  # or 'elevenlabs', with its URL and key
+CASCADE_TTS_URL = os.getenv('CASCADE_TTS_URL', 'https://api.openai.com')
+CASCADE_TTS_API_KEY = os.getenv('CASCADE_TTS_API_KEY', OPENAI_API_KEY)
+CASCADE_TTS_MODEL = os.getenv('CASCADE_TTS_MODEL')
+CASCADE_TTS_VOICE = os.getenv('CASCADE_TTS_VOICE', '')  # voice for every course; empty uses the course's
+# 0 synthesizes each reply in one request once the model has finished it
+CASCADE_SENTENCE_CHUNKS = os.getenv('CASCADE_SENTENCE_CHUNKS', '1') == '1'
+CASCADE_TTS_LOOKAHEAD = int(os.getenv('CASCADE_TTS_LOOKAHEAD', 2))  # sentences synthesized ahead of playback
+CASCADE_SILENCE_MS = int(os.getenv('CASCADE_SILENCE_MS', 500))  # caller silence that ends a turn
+CASCADE_HTTP_CONNECTIONS = int(os.getenv('CASCADE_HTTP_CONNECTIONS', 100))
+LOOP_WATCHDOG = os.getenv('LOOP_WATCHDOG', '0') == '1'
+LOOP_LAG_THRESHOLD_MS = float(os.getenv('LOOP_LAG_THRESHOLD_MS', 50))
 
 
 
@@ -49,251 +190,508 @@ async def index_page():
 async def index_page():
     return {"message": "Twilio connection failed"}
 
+def s3_needed():
+    return RECORDING_MODE != 'off' or CLIP_CACHE_S3 or ANALYTICS_S3
+
+def readiness_checks():
+    checks = {
+        "realtime_pool": realtime_pool is not None and realtime_pool.stats()["ready"] >= min(REALTIME_POOL_MIN, 1),
+    }
+    if s3_needed():
+        checks["s3"] = s3_ready is True
+    return checks
+
+@app.get("/ready")
+async def ready_page():
+    """Readiness probe: 503 until the warm resources are up, then 200 until shutdown.
+
+    Readiness latches, so a pool drained by a burst of calls does not take
+    the worker out of rotation; admission control handles load.
+    """
+    body = {
+        "ready": ready_at is not None and not shutting_down,
+        "checks": readiness_checks(),
+        "startup_seconds": round(ready_at - startup_started, 3) if ready_at is not None else None,
+    }
+    if s3_ready not in (None, True):
+        body["s3_error"] = s3_ready
+    if s3_bucket_errors:
+        # Reported, not gating: one misconfigured course must not take the worker out of rotation
+        body["s3_bucket_errors"] = s3_bucket_errors
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics_page():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def realtime_headers():
+    return {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "OpenAI-Beta": "realtime=v1"
+    }
+
+def build_session_setup():
+    """Serialize the course-independent session settings every pooled session is opened with.
+
+    Voice, instructions, tools and the greeting are per course; `relay_call`
+    sends those from the call's `Course` once it has a session.
+    """
+    session_update = {
+        "type": "session.update",
+        "session": {
+            "turn_detection": {"type": "server_vad"},
+            "input_audio_format": "g711_ulaw",
+            "output_audio_format": "g711_ulaw",
+            "modalities": ["text", "audio"],
+            "temperature": 0.8,
+        }
+    }
+    if analytics_enabled() and ANALYTICS_CALLER_TRANSCRIPTS:
+        session_update["session"]["input_audio_transcription"] = {"model": "whisper-1"}
+    print('Session update:', json.dumps(session_update))
+    return [json.dumps(session_update)]
+
+def build_cascade_engine():
+    """The cascade engine, with its backends sharing one pooled HTTP client."""
+    http = http_client(max_connections=CASCADE_HTTP_CONNECTIONS)
+    return CascadeEngine(
+        backend('asr', CASCADE_ASR, http, CASCADE_ASR_URL, CASCADE_ASR_API_KEY, CASCADE_ASR_MODEL),
+        backend('llm', CASCADE_LLM, http, CASCADE_LLM_URL, CASCADE_LLM_API_KEY, CASCADE_LLM_MODEL),
+        backend('tts', CASCADE_TTS, http, CASCADE_TTS_URL, CASCADE_TTS_API_KEY, CASCADE_TTS_MODEL),
+        http=http,
+        sentence_chunks=CASCADE_SENTENCE_CHUNKS,
+        tts_lookahead=CASCADE_TTS_LOOKAHEAD,
+    )
+
+def analytics_enabled():
+    return bool(ANALYTICS_DIR) or ANALYTICS_S3
+
+def course_defaults():
+    """Settings every course in COURSES_FILE inherits unless its entry overrides them."""
+    defaults = {"voice": VOICE, "bucket": S3_BUCKET_NAME, "engine": ENGINE}
+    if GOLFNOW_API_URL:
+        defaults["tools"] = TOOLS
+        defaults["tool_instructions"] = TOOL_INSTRUCTIONS
+    return defaults
+
+def default_course():
+    """The built-in course, for numbers COURSES_FILE does not list."""
+    return Course(
+        COURSE_ID,
+        "Fremont Park Golf Course",
+        SYSTEM_MESSAGE,
+        GREETING,
+        golfnow_course_id=GOLFNOW_COURSE_ID if GOLFNOW_API_URL else None,
+        **course_defaults(),
+    )
+
+async def called_number(request: Request):
+    """The Twilio number the caller dialled, from the webhook's form body or query string."""
+    if request.method == "POST":
+        form = parse_qs((await request.body()).decode())
+        if form.get("To"):
+            return form["To"][0]
+    return request.query_params.get("To")
+
 @app.api_route("/incoming-call", methods=["GET", "POST"])
 async def handle_incoming_call(request: Request):
     """Handle incoming call and return TwiML response to connect to Media Stream."""
+    number = await called_number(request)
+    course = courses.for_number(number)
+    reason = capacity.admit_call()
+    if reason is not None:
+        print(f"Shedding call: over {reason} budget")
+        if analytics is not None:
+            analytics.event("call.shed", course=course.id, reason=reason)
+        return HTMLResponse(content=shed_twiml(), media_type="application/xml")
+
+    print(f"Incoming call to {number} for {course.id}")
+    return HTMLResponse(content=course.twiml(request.url.hostname), media_type="application/xml")
+
+def shed_twiml():
+    """TwiML for a caller turned away by admission control."""
     response = VoiceResponse()
-    # <Say> punctuation to improve text-to-speech flow
-    response.say("Hello")
-
-    host = request.url.hostname
-    connect = Connect()
-    connect.stream(url=f'wss://{host}/media-stream')
-    response.append(connect)
-    print(str(response))
+    if SHED_ACTION == 'redirect':
+        response.redirect('/incorrect', method='GET')
+    elif SHED_ACTION == 'queue':
+        response.say("All of our lines are busy. Please stay on the line.")
+        response.enqueue(SHED_QUEUE_NAME, wait_url='/shed-wait')
+        # Reached once /shed-wait lets the caller <Leave> the queue
+        response.redirect('/incoming-call')
+    else:
+        response.say("All of our lines are busy. Please hold.")
+        response.pause(length=SHED_HOLD_SECONDS)
+        response.redirect('/incoming-call')
+    return str(response)
+
+@app.api_route("/shed-wait", methods=["GET", "POST"])
+async def handle_shed_wait(request: Request):
+    """The overflow queue's waitUrl: callers leave for /incoming-call once the worker has room.
+
+    Twilio requests it again whenever the returned TwiML finishes.
+    """
+    response = VoiceResponse()
+    if capacity.over_budget() is None:
+        response.leave()
+    else:
+        response.pause(length=SHED_HOLD_SECONDS)
     return HTMLResponse(content=str(response), media_type="application/xml")
 
 @app.websocket("/media-stream")
-async def handle_media_stream(websocket: WebSocket):
+@app.websocket("/media-stream/{course_id}")
+async def handle_media_stream(websocket: WebSocket, course_id: str = None):
     """Handle WebSocket connections between Twilio and OpenAI."""
-    print("Client connected")
-    await websocket.accept()
-
-    # headers = {
-    #     "Authorization": f"Bearer {OPENAI_API_KEY}",
-    #     "OpenAI-Beta": "realtime=v1"
-    # }
-    async with websockets.connect(
-        'wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17',
-        extra_headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "OpenAI-Beta": "realtime=v1"
-        }
-    ) as openai_ws:
-        
-        async def initialize_session(openai_ws):
-            """Control initial session with OpenAI."""
-            session_update = {
-                "type": "session.update",
-                "session": {
-                    "turn_detection": {"type": "server_vad"},
-                    "input_audio_format": "g711_ulaw",
-                    "output_audio_format": "g711_ulaw",
-                    "voice": VOICE,
-                    "instructions": SYSTEM_MESSAGE,
-                    "modalities": ["text", "audio"],
-                    "temperature": 0.8,
-                }
-            }
-            print('Sending session update:', json.dumps(session_update))
-            await openai_ws.send(json.dumps(session_update))
-
-        await initialize_session(openai_ws)
-
-        async def send_mark(connection, stream_sid):
-            if stream_sid:
-                mark_event = {
-                    "event": "mark",
-                    "streamSid": stream_sid,
-                    "mark": {"name": "responsePart"}
-                }
-                await connection.send_json(mark_event)
-                mark_queue.append('responsePart')
+    print(f"Client connected for {course_id or 'the default course'}")
+    reason = capacity.stream_started()
+    if reason is not None:
+        print(f"Rejecting media stream: over {reason} budget")
+        await websocket.close(code=1013)  # try again later
+        return
+    try:
+        await websocket.accept()
+        course = courses.get(course_id)
+        if course.engine == 'cascade':
+            await cascade_call(websocket, course)
+        else:
+            await relay_call(websocket, course)
+    finally:
+        capacity.stream_ended()
+
+def twilio_output(websocket: WebSocket, call_metrics, capture=None):
+    """The queue, pump and outbound scheduler carrying one call's audio to Twilio."""
+    return TwilioOutput(
+        websocket,
+        call_metrics,
+        queue_size=TWILIO_QUEUE_SIZE,
+        queue_policy=TWILIO_QUEUE_POLICY,
+        frame_ms=OUTBOUND_FRAME_MS,
+        mark_every_ms=OUTBOUND_MARK_EVERY_MS,
+        capture=capture,
+    )
+
+def call_recording():
+    return CallRecording(uploader, spool_shipper, RECORDING_MODE, RECORDING_MAX_PARTS)
+
+async def finish_call(course, engine, outcome, call_metrics, twilio, recording, call_log, queues=()):
+    """Hangup work both engines share: the call's logs, its recording and the `call.end` event."""
+    stream_sid = twilio.stream_sid
+    queues = (*queues, twilio.queue)
+    print(f"Call {stream_sid} timings: {call_metrics.summary()}")
+    print(f"Call {stream_sid} queues: " +
+          ", ".join(f"{queue.name} high-water {queue.high_water} dropped {queue.dropped}" for queue in queues))
+    await recording.complete_upload()
+    recording.discard()
+    if call_log is not None:
+        call_log.event(
+            "call.end",
+            course=course.id,
+            engine=engine,
+            outcome=outcome,
+            duration_s=round(perf_counter() - call_metrics.accepted, 1),
+            recording=recording.key,
+            **{f"dropped_{queue.name}": queue.dropped for queue in queues},
+            **call_metrics.stats(),
+        )
+
+async def read_until_start(websocket: WebSocket, twilio, clip=None, capture=None):
+    """Read Twilio messages until it names the stream, then queue the cached greeting `clip`, if any.
+
+    Nothing may be sent to `twilio` (a TwilioOutput) before then, since
+    media needs the stream SID. The greeting is framed and marked like model
+    audio, so barge-in can clear it. Returns the messages read to get there.
+    """
+    messages = []
+    async for message in websocket.iter_text():
+        if capture is not None:
+            capture.record(TWILIO_IN, message)
+        messages.append(message)
+        data = loads(message)
+        if data['event'] == 'start':
+            twilio.start(data['start']['streamSid'])
+            if clip is None:
+                break
+            outbound = twilio.outbound
+            if outbound.frame_bytes:
+                queued = outbound.push(None, clip.audio)
+            else:
+                queued = []
+                for frame in clip.frames:
+                    queued += outbound.push(frame)
+            await twilio.send_messages(queued + outbound.flush())
+            break
+        if data['event'] == 'stop':
+            break
+    return messages
+
+def capture_header(course, greeting_cached):
+    """What a replay needs to run the app the way it ran for the captured call."""
+    return {
+        "course": course.id,
+        "greeting_cached": greeting_cached,
+        "recording_mode": RECORDING_MODE,
+        "env": {
+            name: str(globals()[name]) for name in (
+                'OUTBOUND_FRAME_MS', 'OUTBOUND_MARK_EVERY_MS', 'LOCAL_BARGE_IN', 'BARGE_IN_ENERGY_DBFS',
+                'BARGE_IN_MAX_ZCR', 'BARGE_IN_MIN_SPEECH_MS', 'OPENAI_QUEUE_SIZE', 'OPENAI_QUEUE_POLICY',
+                'TWILIO_QUEUE_SIZE', 'TWILIO_QUEUE_POLICY',
+            )
+        },
+    }
+
+async def relay_call(websocket: WebSocket, course):
+    """Relay one accepted Twilio media stream through a Realtime session set up for `course`."""
+    call_metrics = CallMetrics(perf_counter())
+    tools = None
+    if tee_time_cache is not None and course.golfnow_course_id:
+        tools = TeeTimeTools(tee_time_cache, golfnow, course.golfnow_course_id)
+
+    greeting = clip_cache.get(course.id, course.voice, "greeting", course.greeting) if clip_cache else None
+    capture = CallCapture(CAPTURE_DIR, capture_header(course, greeting is not None)) if CAPTURE_DIR else None
+
+    # Each leg reads into the other's queue; a pump per queue does the sending.
+    # The Twilio pump starts now so a cached greeting plays while the session is acquired.
+    twilio = twilio_output(websocket, call_metrics, capture)
+    outbound = twilio.outbound
+    twilio_pump = asyncio.create_task(twilio.pump_to_twilio())
+    call_metrics.greeting_cached = greeting is not None
+    start_task = asyncio.create_task(read_until_start(websocket, twilio, greeting, capture))
+    try:
+        session_ws = await realtime_pool.acquire()
+    except BaseException:
+        start_task.cancel()
+        twilio.close()
+        raise
+
+    async with realtime_pool.session(session_ws) as openai_ws:
+        to_openai = RelayQueue("to_openai", OPENAI_QUEUE_SIZE, OPENAI_QUEUE_POLICY)
+        early_messages = []  # Twilio messages read before the stream started
+
+        async def send_to_openai(message):
+            started = perf_counter()
+            await openai_ws.send(message)
+            call_metrics.openai_sent(perf_counter() - started)
+            if capture is not None:
+                capture.record(OPENAI_OUT, message)
+
+        async def pump_to_openai():
+            try:
+                await to_openai.pump(send_to_openai)
+            except Exception as e:
+                print(f"Error in pump_to_openai: {e}")
 
         # Connection specific state
         stream_sid = None
         latest_media_timestamp = 0
         last_assistant_item = None
-        mark_queue = []
-        response_start_timestamp_twilio = None
-        s3_initialized = False  # Shared across all calls to receive_from_twilio
-        upload_id = None
-        
-        part_number = 1  # Start with part number 1
-        parts = []  # Metadata for uploaded parts
-        combined_audio_buffer = bytearray()
-
+        interrupted_item = None  # cut off by the caller; its late deltas are dropped
+        call_log = None  # analytics for this call, if it is sampled
+        outcome = None
+        recording = call_recording()
+        barge_in = BargeInDetector(
+            energy_dbfs=BARGE_IN_ENERGY_DBFS,
+            max_zero_crossing_rate=BARGE_IN_MAX_ZCR,
+            min_speech_ms=BARGE_IN_MIN_SPEECH_MS,
+        ) if LOCAL_BARGE_IN else None
+        response_active = False  # OpenAI is generating a response
+        reply_after_response = False  # a tool result is waiting for the current response to end
+        tool_tasks = set()
 
+        async def twilio_messages():
+            """Twilio messages, starting with any read while the greeting was played."""
+            for message in early_messages:
+                yield message
+            async for message in websocket.iter_text():
+                if capture is not None:
+                    capture.record(TWILIO_IN, message)
+                yield message
 
-        
         async def receive_from_twilio():
             """Receive audio data from Twilio and send it to the OpenAI Realtime API."""
-            nonlocal s3_initialized, stream_sid, latest_media_timestamp, combined_audio_buffer, upload_id
+            nonlocal stream_sid, latest_media_timestamp
+            nonlocal last_assistant_item, call_log, outcome
             try:
-                async for message in websocket.iter_text():
-                    data = json.loads(message)
+                async for message in twilio_messages():
+                    data = loads(message)
 
                     if data['event'] == 'start':
                         stream_sid = data['start']['streamSid']
                         print(f"Incoming stream has started with SID: {stream_sid}")
+                        twilio.start(stream_sid)
+
+                        # Initialize S3 multipart upload (created in the background)
+                        recording.start(stream_sid, course.bucket)
 
-                        # Initialize S3 multipart upload
-                        if not s3_initialized:
-                            combined_audio_upload = s3_client.create_multipart_upload(
-                                Bucket=S3_BUCKET_NAME,
-                                Key=f"{stream_sid}_combined_audio.raw"
-                            )
-                            upload_id = combined_audio_upload["UploadId"]
-                            s3_initialized = True
-                            print(f"S3 multipart upload initialized with Key: {stream_sid}_combined_audio.raw")
-
-                        response_start_timestamp_twilio = None
                         latest_media_timestamp = 0
                         last_assistant_item = None
 
+                        if analytics is not None and call_log is None:
+                            call_log = analytics.call(stream_sid)
+                            if call_log is not None:
+                                call_log.event("call.start", course=course.id, engine="realtime",
+                                               greeting_cached=greeting is not None)
+
+                        if greeting is not None:
+                            recording.write_agent(greeting.audio)
+
                     elif data['event'] == 'media' and openai_ws.open:
-                        latest_media_timestamp = int(data['media']['timestamp'])
+                        call_metrics.frame_received(perf_counter())
+                        media = data['media']
+                        latest_media_timestamp = int(media['timestamp'])
+
+                        # Only decode when something needs the raw audio
+                        agent_playing = barge_in is not None and outbound.playing
+                        audio_chunk = None
+                        if recording.active or agent_playing:
+                            audio_chunk = base64.b64decode(media['payload'])
 
                         # Append incoming audio to the buffer
-                        audio_chunk = base64.b64decode(data['media']['payload'])
-                        combined_audio_buffer.extend(audio_chunk)
+                        recording.write_caller(latest_media_timestamp, audio_chunk)
 
-                        # Send audio to OpenAI
-                        audio_append = {
-                            "type": "input_audio_buffer.append",
-                            "audio": data['media']['payload']
-                        }
+                        # Queue audio for OpenAI, payload passed through as-is
+                        await to_openai.put(input_audio_append(media['payload']))
 
-                        # print("SENT ONE MSG TO OPENAI")
-                        await openai_ws.send(json.dumps(audio_append))
+                        # Caller talking over the agent: cut it off without the server VAD round trip
+                        if agent_playing:
+                            if barge_in.process(audio_chunk):
+                                print("Local barge-in detected.")
+                                await handle_speech_started_event()
+                        elif barge_in is not None:
+                            barge_in.reset()
 
-                        # Trigger upload if buffer size exceeds 5 MB
-                        # await upload_audio_to_s3()
+                        await recording.flush_parts()
 
                     elif data['event'] == 'mark':
-                        if mark_queue:
-                           mark_queue.pop(0)  # Remove the acknowledged mark
+                        outbound.mark_played(data.get('mark', {}).get('name'))
                     
                     elif data['event'] == 'stop':
                         print("Call has ended. Stopping processing.")
-                        await complete_s3_upload()
+                        outcome = "hangup"
+                        await recording.complete_upload()
                         break  # Exit the loop to trigger cleanup
 
             except WebSocketDisconnect:
                 print("Twilio WebSocket disconnected.")
             except Exception as e:
                 print(f"Error in receive_from_twilio: {e}")
+                outcome = "error"
+            finally:
+                outcome = outcome or "disconnected"
+                # Twilio is gone; closing the OpenAI leg ends send_to_twilio
+                to_openai.close()
+                await openai_ws.close()
 
         async def send_to_twilio():
             """Receive events from the OpenAI Realtime API, send audio back to Twilio."""
-            nonlocal stream_sid, last_assistant_item, response_start_timestamp_twilio, combined_audio_buffer
+            nonlocal stream_sid, last_assistant_item, response_active, reply_after_response
             try:
                 async for openai_message in openai_ws:
-                    response = json.loads(openai_message)
+                    if capture is not None:
+                        capture.record(OPENAI_IN, openai_message)
+                    response = loads(openai_message)
                     
                     if response.get('type') in LOG_EVENT_TYPES:
                         print(f"OpenAI event: {response['type']}, details: {response}")
 
+                    if response.get('type') == 'response.created':
+                        response_active = True
+                    elif response.get('type') == 'response.done':
+                        response_active = False
+                        if reply_after_response:
+                            reply_after_response = False
+                            await to_openai.put(json.dumps({"type": "response.create"}), droppable=False)
+                    elif response.get('type') == 'response.function_call_arguments.done' and tools:
+                        # Answer off this loop so audio keeps flowing while the tool runs
+                        task = asyncio.create_task(answer_tool_call(response))
+                        tool_tasks.add(task)
+                        task.add_done_callback(tool_tasks.discard)
+
+                    if response.get('type') == 'input_audio_buffer.speech_stopped':
+                        call_metrics.user_stopped_speaking(perf_counter())
+
+                    if call_log is not None:
+                        if response.get('type') == 'conversation.item.input_audio_transcription.completed':
+                            call_log.event("transcript", role="caller", item_id=response.get('item_id'),
+                                           text=response.get('transcript'))
+                        elif response.get('type') == 'response.audio_transcript.done':
+                            call_log.event("transcript", role="agent", item_id=response.get('item_id'),
+                                           text=response.get('transcript'))
+
+                    # Audio of the item the caller cut off, already in flight; it must not restart playback
+                    if (response.get('type') in ('response.audio.delta', 'response.audio.done')
+                            and interrupted_item is not None and response.get('item_id') == interrupted_item):
+                        continue
+
                     if response.get('type') == 'response.audio.delta' and 'delta' in response:
-                        # Append outgoing audio to the buffer
-                        audio_chunk = base64.b64decode(response['delta'])
-
-                        # No need to record stream here also
-                        combined_audio_buffer.extend(audio_chunk)
-
-                        # Prepare audio payload for Twilio
-                        audio_payload = base64.b64encode(audio_chunk).decode('utf-8')
-                        audio_delta = {
-                            "event": "media",
-                            "streamSid": stream_sid,
-                            "media": {
-                                "payload": audio_payload
-                            }
-                        }
-                        await websocket.send_json(audio_delta)
+                        # Decode once, only if recording or re-framing needs the raw audio
+                        audio_chunk = None
+                        if recording.active or outbound.frame_bytes:
+                            audio_chunk = base64.b64decode(response['delta'])
 
-                        if response_start_timestamp_twilio is None:
-                            response_start_timestamp_twilio = latest_media_timestamp
-                            if SHOW_TIMING_MATH:
-                                print(f"Setting start timestamp for new response: {response_start_timestamp_twilio}ms")
+                        # Append outgoing audio to the buffer
+                        recording.write_agent(audio_chunk)
 
-                        # Update last_assistant_item safely
-                        if response.get('item_id'):
+                        # A new item restarts the playback position used for truncation
+                        messages = []
+                        if response.get('item_id') and response['item_id'] != last_assistant_item:
+                            messages = outbound.start_item()
                             last_assistant_item = response['item_id']
 
-                        await send_mark(websocket, stream_sid)
+                        messages += outbound.push(response['delta'], audio_chunk)
+                        await twilio.send_messages(messages)
 
-                        # Trigger an interruption. Your use case might work better using `input_audio_buffer.speech_stopped`, or combining the two.
-                        if response.get('type') == 'input_audio_buffer.speech_started':
-                            print("Speech started detected.")
-                            if last_assistant_item:
-                                print(f"Interrupting response with id: {last_assistant_item}")
-                                await handle_speech_started_event()
+                        await recording.flush_parts()
 
+                    elif response.get('type') == 'response.audio.done':
+                        # Send the last partial frame and mark the end of the item
+                        await twilio.send_messages(outbound.flush())
+
+                    # Trigger an interruption. Your use case might work better using `input_audio_buffer.speech_stopped`, or combining the two.
+                    if response.get('type') == 'input_audio_buffer.speech_started':
+                        print("Speech started detected.")
+                        if outbound.playing:
+                            print(f"Interrupting response with id: {last_assistant_item or 'greeting'}")
+                            await handle_speech_started_event()
 
-                        # Trigger upload if buffer size exceeds 5 MB
-                         # Enqueue upload task if buffer size exceeds threshold
-                        if len(combined_audio_buffer) >= 5 * 1024 * 1024:
-                            chunk = combined_audio_buffer[:5 * 1024 * 1024]
-                            combined_audio_buffer = combined_audio_buffer[5 * 1024 * 1024:]
-                            task_payload = {
-                                "chunk": chunk,
-                                "stream_sid": stream_sid,
-                                "upload_id": upload_id,
-                                "part_number": part_number
-                            }
-
-                        # Enqueue the task
-                        await upload_queue.put(task_payload)
-                        part_number += 1
-                                    
             except Exception as e:
                 print(f"Error in send_to_twilio: {e}")
+            finally:
+                twilio.close()
 
 
-        async def complete_s3_upload():
-            """Complete the multipart upload to S3."""
-            print ("came into complete_s3_upload 1")
-            try:
-                # Upload remaining data
-                if combined_audio_buffer:
-                    response = s3_client.upload_part(
-                        Bucket=S3_BUCKET_NAME,
-                        Key=f"{stream_sid}_combined_audio.raw",
-                        PartNumber=part_number,
-                        UploadId=upload_id,
-                        Body=combined_audio_buffer,
-                    )
-                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
-
-                # Finalize the upload
-                s3_client.complete_multipart_upload(
-                    Bucket=S3_BUCKET_NAME,
-                    Key=f"{stream_sid}_combined_audio.raw",
-                    MultipartUpload={"Parts": parts},
-                    UploadId=upload_id,
-                )
-                print("Combined audio successfully uploaded to S3.")
-            except Exception as e:
-                print(f"Error in complete_s3_upload: {e}")
-                # Abort incomplete uploads
-                s3_client.abort_multipart_upload(
-                    Bucket=S3_BUCKET_NAME,
-                    Key=f"{stream_sid}_combined_audio.raw",
-                    UploadId=upload_id,
-                )
-                print("Aborted incomplete multipart upload.")
+        async def answer_tool_call(event):
+            """Run one function call and give OpenAI the result, then ask it to speak."""
+            nonlocal reply_after_response
+            print(f"Tool call: {event['name']}({event.get('arguments')})")
+            started = perf_counter()
+            output = await tools.call(event['name'], event.get('arguments'))
+            if call_log is not None:
+                call_log.event("tool_call", name=event['name'], arguments=event.get('arguments'),
+                               ms=round((perf_counter() - started) * 1000, 1), error=output.get('error'))
+            await to_openai.put(json.dumps({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "function_call_output",
+                    "call_id": event['call_id'],
+                    "output": json.dumps(output),
+                }
+            }), droppable=False)
+            # OpenAI rejects response.create while the response that made the call is still running
+            if response_active:
+                reply_after_response = True
+            else:
+                await to_openai.put(json.dumps({"type": "response.create"}), droppable=False)
 
         async def handle_speech_started_event():
             """Handle interruptions when the caller's speech starts."""
-            nonlocal response_start_timestamp_twilio, last_assistant_item
+            nonlocal last_assistant_item, interrupted_item
             print("Handling speech started event.")
             try:
-                if mark_queue and response_start_timestamp_twilio is not None:
-                    # Calculate elapsed time since the AI's response started
-                    elapsed_time = latest_media_timestamp - response_start_timestamp_twilio
-                    if SHOW_TIMING_MATH:
-                        print(f"Calculating elapsed time for truncation: {latest_media_timestamp} - {response_start_timestamp_twilio} = {elapsed_time}ms")
+                if outbound.playing:
+                    # How much of the item the caller heard, from mark echoes
+                    elapsed_time = outbound.item_played_ms()
+                    if call_log is not None:
+                        call_log.event("barge_in", item_id=last_assistant_item, played_ms=elapsed_time)
 
                     if last_assistant_item:
                         if SHOW_TIMING_MATH:
@@ -306,18 +704,19 @@ async def handle_media_stream(websocket: WebSocket):
                             "content_index": 0,
                             "audio_end_ms": elapsed_time
                         }
-                        await openai_ws.send(json.dumps(truncate_event))
+                        await to_openai.put(json.dumps(truncate_event), droppable=False)
+                        interrupted_item = last_assistant_item
+
+                    # Stop generating, or the rest of the reply keeps arriving
+                    if response_active:
+                        await to_openai.put(json.dumps({"type": "response.cancel"}), droppable=False)
 
-                    # Clear any pending marks in Twilio's queue
-                    await websocket.send_json({
-                        "event": "clear",
-                        "streamSid": stream_sid
-                    })
+                    # Drop agent audio we have not sent yet, then clear what Twilio has buffered
+                    await twilio.clear_playback()
+                    recording.clear_agent()
 
                     # Reset internal state
-                    mark_queue.clear()
                     last_assistant_item = None
-                    response_start_timestamp_twilio = None
 
             except Exception as e:
                 print(f"Error in handle_speech_started_event: {e}")
@@ -325,66 +724,383 @@ async def handle_media_stream(websocket: WebSocket):
         
         
         async def send_initial_conversation_item(openai_ws):
-            """Send initial conversation item if AI talks first."""
-            initial_conversation_item = {
-                "type": "conversation.item.create",
-                "item": {
-                    "type": "message",
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "input_text",
-                            "text": "Greet the user with 'Fremont Park Golf Course AI Assistant on the line. How can I help you?'"
-                        }
-                    ]
-                }
-            }
-            await openai_ws.send(json.dumps(initial_conversation_item))
-            await openai_ws.send(json.dumps({"type": "response.create"}))
-
-        # Uncomment the next line to have the AI speak first
-        await send_initial_conversation_item(openai_ws)
+            """Start the greeting queued when the session was set up, if AI talks first."""
+            await send_to_openai(json.dumps({"type": "response.create"}))
 
+        CALLS.inc()
+        COURSE_CALLS.inc(course.id)
+        ACTIVE_CALLS.inc()
         try:
-            await asyncio.gather(receive_from_twilio(), send_to_twilio())
+            # Pooled sessions only carry the shared settings; make this one the course's
+            for message in course.setup_messages:
+                await openai_ws.send(message)
+                if capture is not None:
+                    capture.record(OPENAI_OUT, message)
+            # Model audio needs the stream SID, so the first response waits for Twilio's start
+            early_messages = await start_task
+            if greeting is not None:
+                await send_to_openai(course.greeting_played)
+            else:
+                # Uncomment the next line to have the AI speak first
+                await send_initial_conversation_item(openai_ws)
+
+            await asyncio.gather(receive_from_twilio(), send_to_twilio(), pump_to_openai(), twilio_pump)
         finally:
-            print ("came into finally before complete_s3_upload")
-            await complete_s3_upload()
-
-async def process_upload_queue():
-            """Background task to handle audio uploads to S3."""
-            part_number = 1
-            parts = []
-            while True:
-                task_payload = await upload_queue.get()  # Wait for a chunk to upload
+            start_task.cancel()
+            twilio.close()  # ends the Twilio pump if the call failed before it was gathered
+            for task in tool_tasks:
+                task.cancel()
+            ACTIVE_CALLS.dec()
+            await finish_call(course, "realtime", outcome, call_metrics, twilio, recording, call_log,
+                              queues=(to_openai,))
+            if capture is not None:
+                # After the recording, which matters more than a debugging aid
                 try:
-                    chunk = task_payload["chunk"]
-                    stream_sid = task_payload["stream_sid"]
-                    upload_id = task_payload["upload_id"]
-                    part_number = task_payload["part_number"]
-                    # Upload the chunk to S3
-                    response = s3_client.upload_part(
-                        Bucket=S3_BUCKET_NAME,
-                        Key=f"{stream_sid}_combined_audio.raw",
-                        PartNumber=part_number,
-                        UploadId=upload_id,
-                        Body=chunk,
-                    )
-                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
-                    print(f"Uploaded part {part_number} to S3.")
-                    part_number += 1
+                    path = await capture.close(stream_sid)
+                    print(f"Captured {capture.messages} messages of call {stream_sid} to {path}")
                 except Exception as e:
-                    print(f"Error uploading audio chunk: {e}")
-                finally:
-                    upload_queue.task_done()  # Mark task as done
+                    print(f"Error closing capture of call {stream_sid}: {e}")
+
+async def cascade_call(websocket: WebSocket, course):
+    """Answer one accepted Twilio media stream with the cascade engine instead of a Realtime session.
+
+    The caller's turns are found locally; each one is transcribed and the
+    reply spoken sentence by sentence as the model writes it. Calls are
+    recorded like Realtime calls but not captured, and have no tools.
+    """
+    call_metrics = CallMetrics(perf_counter())
+    voice = cascade_voice(course)
+    greeting = clip_cache.get(course.id, voice, "greeting", course.greeting) if clip_cache else None
+    call_metrics.greeting_cached = greeting is not None
+    conversation = [
+        {"role": "system", "content": course.instructions},
+        {"role": "assistant", "content": course.greeting},
+    ]
+    twilio = twilio_output(websocket, call_metrics)
+    outbound = twilio.outbound
+    turns = TurnDetector(
+        energy_dbfs=BARGE_IN_ENERGY_DBFS,
+        max_zero_crossing_rate=BARGE_IN_MAX_ZCR,
+        min_speech_ms=BARGE_IN_MIN_SPEECH_MS,
+        silence_ms=CASCADE_SILENCE_MS,
+    )
+    recording = call_recording()
+
+    # Connection specific state
+    stream_sid = None
+    call_log = None
+    outcome = None
+    speaking = None  # task greeting the caller or answering their last turn
+    unanswered = b""  # audio of turns cut off before they were transcribed
+
+    async def play_audio(chunk):
+        """Send a piece of agent audio to Twilio, framed and marked like Realtime audio."""
+        recording.write_agent(chunk)
+        payload = None if outbound.frame_bytes else base64.b64encode(chunk).decode("ascii")
+        await twilio.send_messages(outbound.push(payload, chunk))
+        await recording.flush_parts()
+
+    async def greet_caller():
+        try:
+            if greeting is not None:
+                await play_audio(greeting.audio)
+            else:
+                await cascade.speak(course.greeting, voice, play_audio)
+            await twilio.send_messages(outbound.flush())
+        except Exception as e:
+            print(f"Error in greet_caller: {e}")
+
+    async def answer_turn(audio, ended_at):
+        """Transcribe one caller turn and speak the reply as it is generated."""
+        nonlocal unanswered
+        spoken = []
+        try:
+            text = await cascade.transcribe(audio)
+            unanswered = b""
+            if not text:
+                return
+            conversation.append({"role": "user", "content": text})
+            if call_log is not None:
+                call_log.event("transcript", role="caller", text=text)
+            call_metrics.user_stopped_speaking(ended_at)
+            await twilio.send_messages(outbound.start_item())
+            await cascade.reply(list(conversation), voice, play_audio, spoken)
+            await twilio.send_messages(outbound.flush())
+        except Exception as e:
+            print(f"Error in answer_turn: {e}")
+        finally:
+            # Only what reached Twilio goes into the history, also when interrupted
+            if spoken:
+                reply = " ".join(spoken)
+                conversation.append({"role": "assistant", "content": reply})
+                if call_log is not None:
+                    call_log.event("transcript", role="agent", text=reply)
+
+    async def interrupt():
+        """The caller started talking: stop the agent and drop the audio Twilio has not played."""
+        nonlocal speaking
+        if speaking is not None:
+            speaking.cancel()
+            speaking = None
+        if outbound.playing:
+            if call_log is not None:
+                call_log.event("barge_in", played_ms=outbound.item_played_ms())
+            await twilio.clear_playback()
+            recording.clear_agent()
+
+    async def receive_from_twilio():
+        nonlocal stream_sid, call_log, outcome, speaking, unanswered
+        try:
+            async for message in websocket.iter_text():
+                data = loads(message)
+
+                if data['event'] == 'start':
+                    stream_sid = data['start']['streamSid']
+                    print(f"Incoming stream has started with SID: {stream_sid}")
+                    twilio.start(stream_sid)
+                    recording.start(stream_sid, course.bucket)
+                    if analytics is not None and call_log is None:
+                        call_log = analytics.call(stream_sid)
+                        if call_log is not None:
+                            call_log.event("call.start", course=course.id, engine="cascade",
+                                           greeting_cached=greeting is not None)
+                    speaking = asyncio.create_task(greet_caller())
+
+                elif data['event'] == 'media':
+                    now = perf_counter()
+                    call_metrics.frame_received(now)
+                    media = data['media']
+                    audio_chunk = base64.b64decode(media['payload'])
+                    recording.write_caller(int(media['timestamp']), audio_chunk)
+
+                    turn = turns.process(audio_chunk)
+                    if turn == TurnDetector.STARTED:
+                        await interrupt()
+                    elif turn == TurnDetector.ENDED:
+                        unanswered += turns.audio()
+                        speaking = asyncio.create_task(answer_turn(unanswered, now))
+
+                    await recording.flush_parts()
+
+                elif data['event'] == 'mark':
+                    outbound.mark_played(data.get('mark', {}).get('name'))
+
+                elif data['event'] == 'stop':
+                    print("Call has ended. Stopping processing.")
+                    outcome = "hangup"
+                    break
+
+        except WebSocketDisconnect:
+            print("Twilio WebSocket disconnected.")
+        except Exception as e:
+            print(f"Error in receive_from_twilio: {e}")
+            outcome = "error"
+        finally:
+            outcome = outcome or "disconnected"
+            if speaking is not None:
+                speaking.cancel()
+            twilio.close()
+
+    CALLS.inc()
+    COURSE_CALLS.inc(course.id)
+    ACTIVE_CALLS.inc()
+    try:
+        await asyncio.gather(receive_from_twilio(), twilio.pump_to_twilio())
+    finally:
+        if speaking is not None:
+            speaking.cancel()
+        ACTIVE_CALLS.dec()
+        await finish_call(course, "cascade", outcome, call_metrics, twilio, recording, call_log)
+
+# Handlers the watchdog names when one of them blocks the event loop, with the
+# closures each call defines inside relay_call and cascade_call
+WATCHED_HANDLERS = handler_codes(
+    relay_call, cascade_call, read_until_start, finish_call,
+    TwilioOutput.send_messages, TwilioOutput.pump_to_twilio, CallRecording.flush_parts, CallRecording.complete_upload,
+    handle_media_stream, handle_incoming_call, handle_shed_wait, called_number, ready_page, metrics_page,
+)
 
 @app.on_event("startup")
 async def start_background_tasks():
-    """Start the background task for processing the upload queue."""
-    global upload_queue
-    upload_queue = Queue()
-    loop = asyncio.get_event_loop()  # Get the current event loop
-    loop.create_task(process_upload_queue())  # Schedule the background task
+    """Create the S3 uploader and the warm Realtime session pool shared by every call."""
+    global uploader, realtime_pool, watchdog, capacity, spool_shipper
+    global golfnow, tee_time_cache, clip_cache, courses, analytics, cascade, startup_started
+    startup_started = perf_counter()
+    # The heartbeat always runs to feed admission control; stack reports are opt-in
+    watchdog = LoopWatchdog(WATCHED_HANDLERS, threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+    watchdog.start(monitor=LOOP_WATCHDOG)
+
+    courses = CourseRegistry(
+        COURSES_FILE,
+        default_course(),
+        defaults=course_defaults(),
+        poll_interval=COURSES_POLL_SECONDS,
+        on_reload=courses_reloaded,
+    )
+    courses.load()
+    courses.start()
+
+    uploader = S3Uploader(
+        s3_client,
+        S3_BUCKET_NAME,
+        max_workers=S3_UPLOAD_WORKERS,
+        max_pending_parts=S3_MAX_PENDING_PARTS,
+        lag_histogram=UPLOAD_LAG,
+    )
+    realtime_pool = RealtimeSessionPool(
+        OPENAI_REALTIME_URL,
+        realtime_headers(),
+        build_session_setup(),
+        min_size=REALTIME_POOL_MIN,
+        max_size=REALTIME_POOL_MAX,
+        idle_ttl=REALTIME_POOL_IDLE_TTL,
+    )
+    realtime_pool.start()
+    # Built even when no course uses it yet, since a reloaded COURSES_FILE can switch one over
+    cascade = build_cascade_engine()
+    if RECORDING_SPOOL_DIR and RECORDING_MODE != 'off':
+        spool_shipper = SpoolShipper(uploader, RECORDING_SPOOL_DIR, stale_after=SPOOL_STALE_HOURS * 3600)
+        spool_shipper.start()
+        # Finish recordings a previous worker left behind without delaying startup
+        asyncio.create_task(spool_shipper.recover(course_buckets()))
+    if GOLFNOW_API_URL:
+        golfnow = GolfNowClient(GOLFNOW_API_URL, GOLFNOW_API_KEY)
+        tee_time_cache = TeeTimeCache(
+            golfnow,
+            golfnow_course_ids(),
+            days_ahead=TEE_TIME_DAYS_AHEAD,
+            refresh_interval=TEE_TIME_REFRESH_SECONDS,
+            ttl=TEE_TIME_TTL_SECONDS,
+        )
+        tee_time_cache.start()
+    if CLIP_CACHE_DIR:
+        clip_cache = ClipCache(
+            CLIP_CACHE_DIR,
+            max_bytes=CLIP_CACHE_MAX_BYTES,
+            frame_bytes=max(OUTBOUND_FRAME_MS, 20) * 8,
+            s3_client=s3_client if CLIP_CACHE_S3 else None,
+            bucket=S3_BUCKET_NAME,
+        )
+        # Calls use the model greeting until the clips are loaded
+        warm_clips()
+    if analytics_enabled():
+        analytics = AnalyticsSink(
+            ANALYTICS_DIR,
+            s3_client=s3_client if ANALYTICS_S3 else None,
+            bucket=S3_BUCKET_NAME,
+            sample_rate=ANALYTICS_SAMPLE_RATE,
+            max_events=ANALYTICS_BATCH_EVENTS,
+            flush_interval=ANALYTICS_FLUSH_SECONDS,
+        )
+        analytics.start()
+    capacity = CapacityManager(
+        max_sessions=MAX_ACTIVE_CALLS,
+        max_loop_lag=MAX_LOOP_LAG_MS / 1000,
+        max_upload_backlog=MAX_UPLOAD_BACKLOG if RECORDING_MODE != 'off' else 0,
+        loop_lag=lambda: watchdog.lag,
+        upload_backlog=lambda: uploader.in_flight,
+    )
+
+    if s3_needed():
+        asyncio.create_task(warm_s3())
+    asyncio.create_task(watch_ready())
+
+    REGISTRY.callback("golfbot_startup_seconds", "Startup to ready, once the worker has been ready.",
+                      lambda: ready_at - startup_started if ready_at is not None else 0)
+    REGISTRY.callback("golfbot_upload_parts_in_flight", "Recording parts queued or uploading.",
+                      lambda: uploader.in_flight)
+    REGISTRY.callback("golfbot_recording_peak_bytes",
+                      "Largest per-call high-water mark of recording audio not yet handed to S3.",
+                      lambda: (RecordingSpool if spool_shipper is not None else RecordingBuffer).peak_bytes)
+    REGISTRY.callback("golfbot_realtime_pool_hits_total", "Calls answered with a warm Realtime session.",
+                      lambda: realtime_pool.hits, kind="counter")
+    REGISTRY.callback("golfbot_realtime_pool_misses_total", "Calls that had to open a Realtime session.",
+                      lambda: realtime_pool.misses, kind="counter")
+    REGISTRY.callback("golfbot_realtime_pool_ready", "Warm Realtime sessions waiting for a call.",
+                      lambda: realtime_pool.stats()["ready"])
+    REGISTRY.callback("golfbot_clip_cache_bytes", "Prompt clip audio held in memory.",
+                      lambda: clip_cache.bytes if clip_cache else 0)
+    REGISTRY.callback("golfbot_admission_reserved_calls", "Admitted calls whose media stream has not opened yet.",
+                      lambda: capacity.reserved)
+    REGISTRY.callback("golfbot_event_loop_lag_smoothed_seconds", "Smoothed event-loop lag seen by admission control.",
+                      lambda: watchdog.lag)
+
+async def warm_s3():
+    """Build the S3 client and open pooled connections, retrying until S3 answers."""
+    global s3_ready, s3_bucket_errors
+    while True:
+        try:
+            s3_bucket_errors = await uploader.warm(S3_WARM_CONNECTIONS, course_buckets())
+            for bucket, error in s3_bucket_errors.items():
+                print(f"S3 bucket {bucket} refused the warm-up request: {error}")
+            s3_ready = True
+            return
+        except Exception as e:
+            s3_ready = str(e)
+            print(f"Error warming S3 connections: {e}")
+            await asyncio.sleep(5)
+
+async def watch_ready():
+    """Note when every warm resource is first up."""
+    global ready_at
+    while not all(readiness_checks().values()):
+        await asyncio.sleep(0.05)
+    ready_at = perf_counter()
+    print(f"Ready {ready_at - startup_started:.2f}s after startup")
+
+def course_buckets():
+    return sorted({course.bucket for course in courses.courses() if course.bucket})
+
+def golfnow_course_ids():
+    return sorted({course.golfnow_course_id for course in courses.courses() if course.golfnow_course_id})
+
+def cascade_voice(course):
+    return CASCADE_TTS_VOICE or course.voice
+
+async def render_cascade_clip(voice, text):
+    """Speak `text` with the cascade engine's text-to-speech; returns the mu-law audio."""
+    audio = bytearray()
+    async for chunk in cascade.tts.stream(text, voice):
+        audio += chunk
+    return bytes(audio)
+
+def warm_clips():
+    """Load every course's greeting clip in the background; ones already in memory are skipped.
+
+    A clip is rendered by the engine that would otherwise speak it, in the voice that engine uses.
+    """
+    render_realtime = functools.partial(render_clip, OPENAI_REALTIME_URL, realtime_headers())
+    for course in courses.courses():
+        if course.engine == 'cascade':
+            voice, render = cascade_voice(course), render_cascade_clip
+        else:
+            voice, render = course.voice, render_realtime
+        asyncio.create_task(clip_cache.warm(course.id, voice, {"greeting": course.greeting}, render))
+
+def courses_reloaded(registry):
+    """Point the background caches at the courses from a reloaded COURSES_FILE."""
+    if tee_time_cache is not None:
+        tee_time_cache.course_ids = golfnow_course_ids()
+    if clip_cache is not None:
+        warm_clips()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    """Close warm sessions and let in-flight part uploads finish before the worker exits."""
+    global shutting_down
+    shutting_down = True
+    courses.stop()
+    await realtime_pool.close()
+    if spool_shipper is not None:
+        spool_shipper.stop()
+    if golfnow is not None:
+        tee_time_cache.stop()
+        await golfnow.close()
+    if analytics is not None:
+        await analytics.close()
+    await cascade.close()
+    await asyncio.to_thread(uploader.shutdown)
+    watchdog.stop()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=PORT)
\ No newline at end of file
@@ -0,0 +1,65 @@
+# benchmarks/bench_outbound.py
+#
+# Twilio messages and CPU per second of agent speech: one media + one mark
+# per OpenAI delta (old) vs. OutboundScheduler framing.
+#
+#   python -m benchmarks.bench_outbound
+
+import base64
+import json
+import os
+import random
+import time
+
+from outbound import OutboundScheduler
+from relay import TwilioMediaTemplate
+
+SPEECH_SECONDS = 600
+STREAM_SID = "MZ00000000000000000000000000000000"
+
+
+def make_deltas():
+    random.seed(7)
+    deltas, total = [], 0
+    while total < SPEECH_SECONDS * 8000:
+        n = random.randint(20, 120) * 8  # 20-120 ms deltas
+        deltas.append(base64.b64encode(os.urandom(n)).decode("ascii"))
+        total += n
+    return deltas
+
+
+def old(deltas):
+    messages = []
+    for delta in deltas:
+        audio_payload = base64.b64encode(base64.b64decode(delta)).decode('utf-8')
+        messages.append(json.dumps({"event": "media", "streamSid": STREAM_SID, "media": {"payload": audio_payload}}))
+        messages.append(json.dumps({"event": "mark", "streamSid": STREAM_SID, "mark": {"name": "responsePart"}}))
+    return len(messages)
+
+
+def new(deltas, frame_ms, mark_every_ms):
+    scheduler = OutboundScheduler(TwilioMediaTemplate(STREAM_SID), frame_ms=frame_ms, mark_every_ms=mark_every_ms)
+    count = 0
+    for delta in deltas:
+        count += len(scheduler.push(delta))
+    return count + len(scheduler.flush())
+
+
+def measure(name, fn, *args):
+    start = time.process_time()
+    count = fn(*args)
+    cpu = time.process_time() - start
+    print(f"{name:36s} {count / SPEECH_SECONDS:7.1f} msgs/s  {cpu / SPEECH_SECONDS * 1e6:7.1f} us CPU/s of speech")
+
+
+def main():
+    deltas = make_deltas()
+    print(f"{len(deltas)} deltas, {SPEECH_SECONDS}s of agent speech")
+    measure("old: media + mark per delta", old, deltas)
+    measure("passthrough, mark every 500 ms", new, deltas, 0, 500)
+    measure("100 ms frames, mark every 500 ms", new, deltas, 100, 500)
+    measure("200 ms frames, mark every 1000 ms", new, deltas, 200, 1000)
+
+
+if __name__ == "__main__":
+    main()
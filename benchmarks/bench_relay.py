@@ -0,0 +1,90 @@
+# benchmarks/bench_relay.py
+#
+# Per-frame relay cost, old path vs fast path, on one core.
+#
+#   python -m benchmarks.bench_relay
+
+import base64
+import json
+import os
+import time
+
+from relay import loads, input_audio_append, TwilioMediaTemplate, orjson
+
+FRAMES = 50000
+STREAM_SID = "MZ00000000000000000000000000000000"
+
+_payload = base64.b64encode(os.urandom(160)).decode("ascii")  # 20 ms of mu-law
+INBOUND = json.dumps({
+    "event": "media",
+    "sequenceNumber": "42",
+    "media": {"track": "inbound", "chunk": "41", "timestamp": "820", "payload": _payload},
+    "streamSid": STREAM_SID,
+})
+OUTBOUND = json.dumps({
+    "type": "response.audio.delta",
+    "event_id": "event_123",
+    "response_id": "resp_1",
+    "item_id": "item_1",
+    "output_index": 0,
+    "content_index": 0,
+    "delta": _payload,
+})
+
+
+def inbound_old():
+    data = json.loads(INBOUND)
+    int(data['media']['timestamp'])
+    base64.b64decode(data['media']['payload'])
+    json.dumps({"type": "input_audio_buffer.append", "audio": data['media']['payload']})
+
+
+def outbound_old():
+    response = json.loads(OUTBOUND)
+    audio_chunk = base64.b64decode(response['delta'])
+    audio_payload = base64.b64encode(audio_chunk).decode('utf-8')
+    # what Starlette's send_json does with the dict
+    json.dumps({"event": "media", "streamSid": STREAM_SID, "media": {"payload": audio_payload}})
+
+
+def inbound_fast(record):
+    media = loads(INBOUND)['media']
+    int(media['timestamp'])
+    if record:
+        base64.b64decode(media['payload'])
+    input_audio_append(media['payload'])
+
+
+_template = TwilioMediaTemplate(STREAM_SID)
+
+
+def outbound_fast(record):
+    response = loads(OUTBOUND)
+    if record:
+        base64.b64decode(response['delta'])
+    _template.render(response['delta'])
+
+
+def rate(fn, *args):
+    start = time.process_time()
+    for _ in range(FRAMES):
+        fn(*args)
+    return FRAMES / (time.process_time() - start)
+
+
+def main():
+    print(f"JSON codec: {'orjson' if orjson else 'json'}; {FRAMES} frames per case")
+    rows = [
+        ("inbound  old", rate(inbound_old)),
+        ("inbound  fast, recording on", rate(inbound_fast, True)),
+        ("inbound  fast, recording off", rate(inbound_fast, False)),
+        ("outbound old", rate(outbound_old)),
+        ("outbound fast, recording on", rate(outbound_fast, True)),
+        ("outbound fast, recording off", rate(outbound_fast, False)),
+    ]
+    for name, fps in rows:
+        print(f"{name:32s} {fps:12,.0f} frames/s/core")
+
+
+if __name__ == "__main__":
+    main()
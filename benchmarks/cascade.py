@@ -0,0 +1,222 @@
+# benchmarks/cascade.py
+#
+# Time to first audio of the cascade engine against the Realtime engine on one
+# app.py worker: from the media stream opening to the greeting, and from the
+# end of each caller turn to the first audio of the reply. The Realtime leg is
+# mock_realtime and the cascade services are cascade_stub, each with its own
+# model latency, so the numbers show what the pipeline adds on top of them.
+#
+#   python -m benchmarks.cascade --calls 4 --turns 3
+#   python -m benchmarks.cascade --model-delay-ms 800 --first-token-ms 300 --tts elevenlabs
+#
+# Runs three configurations: realtime, cascade, and cascade with every reply
+# synthesized in one request once it is complete (CASCADE_SENTENCE_CHUNKS=0),
+# which is what streaming the reply sentence by sentence saves.
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+
+import httpx
+import numpy as np
+import websockets
+
+from benchmarks.loadtest import CALLER_FRAMES, FRAME_MS, start_app, wait_until_up
+from mock_realtime import MockRealtimeServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SILENT_FRAME = base64.b64encode(b"\xff" * (FRAME_MS * 8)).decode("ascii")
+STAGES = (
+    ("speech-to-text", "golfbot_cascade_asr_seconds"),
+    ("chat first token", "golfbot_cascade_llm_first_token_seconds"),
+    ("tts first audio", "golfbot_cascade_tts_first_audio_seconds"),
+    ("chat request -> reply audio", "golfbot_cascade_reply_first_audio_seconds"),
+)
+
+
+class Caller:
+    """One simulated Twilio call: silence, then a turn of speech, then the endpointing silence, per turn."""
+
+    def __init__(self, call_no):
+        self.stream_sid = f"MZcascade{call_no:08d}"
+        self.greeting = None
+        self.responses = []
+        self.error = None
+
+    async def run(self, ws_url, turns, lead_ms, speech_ms, trailing_ms):
+        try:
+            started = time.monotonic()
+            async with websockets.connect(ws_url, max_queue=None) as ws:
+                await self._talk(ws, started, turns, lead_ms, speech_ms, trailing_ms)
+        except Exception as e:
+            self.error = repr(e)
+        return self
+
+    async def _talk(self, ws, started, turns, lead_ms, speech_ms, trailing_ms):
+        await ws.send(json.dumps({"event": "start", "start": {"streamSid": self.stream_sid}}))
+        turn_ended = None
+        playout_end = 0.0
+        marks = deque()  # (due time, name); Twilio echoes a mark once it has played
+
+        async def echo(name):
+            await ws.send(json.dumps({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}}))
+
+        async def receive():
+            nonlocal turn_ended, playout_end
+            async for message in ws:
+                now = time.monotonic()
+                data = json.loads(message)
+                if data.get("event") == "media":
+                    if self.greeting is None:
+                        self.greeting = now - started
+                    if turn_ended is not None:
+                        self.responses.append(now - turn_ended)
+                        turn_ended = None
+                    playout_end = max(playout_end, now) + len(data["media"]["payload"]) * 3 / 4 / 8000
+                elif data.get("event") == "mark":
+                    marks.append((max(playout_end, now), data["mark"]["name"]))
+                elif data.get("event") == "clear":
+                    playout_end = now
+                    while marks:
+                        await echo(marks.popleft()[1])
+
+        receiver = asyncio.create_task(receive())
+        lead = lead_ms // FRAME_MS
+        pattern = [False] * lead + [True] * (speech_ms // FRAME_MS) + [False] * (trailing_ms // FRAME_MS)
+        t0 = time.monotonic()
+        # One more lead of silence at the end, for the last reply
+        for n in range(len(pattern) * turns + lead):
+            delay = t0 + n * FRAME_MS / 1000 - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            speech = pattern[n % len(pattern)]
+            await ws.send(json.dumps({
+                "event": "media",
+                "streamSid": self.stream_sid,
+                "media": {"track": "inbound", "timestamp": str(n * FRAME_MS),
+                          "payload": CALLER_FRAMES[n % len(CALLER_FRAMES)] if speech else SILENT_FRAME},
+            }))
+            now = time.monotonic()
+            if speech and not pattern[(n + 1) % len(pattern)]:
+                turn_ended = now
+            while marks and marks[0][0] <= now:
+                await echo(marks.popleft()[1])
+        await ws.send(json.dumps({"event": "stop", "streamSid": self.stream_sid}))
+        receiver.cancel()
+
+
+def _percentiles(values):
+    if not values:
+        return "      -       -"
+    p50, p95 = np.percentile(np.asarray(values) * 1000, [50, 95])
+    return f"{p50:7.0f} {p95:7.0f}"
+
+
+async def _stage_means(http, app_url):
+    """Mean of each cascade stage histogram, in ms, from the worker's /metrics."""
+    values = {}
+    for line in (await http.get(f"{app_url}/metrics")).text.splitlines():
+        if line.startswith("golfbot_cascade_"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    means = {}
+    for label, metric in STAGES:
+        count = values.get(f"{metric}_count", 0)
+        means[label] = values.get(f"{metric}_sum", 0) / count * 1000 if count else None
+    return means
+
+
+async def run_engine(args, label, extra_env):
+    app_url = f"http://127.0.0.1:{args.app_port}"
+    process = start_app(args.app_port, args.mock_port, "off", None, extra_env)
+    try:
+        await wait_until_up(app_url)
+        async with httpx.AsyncClient() as http:
+            # The worker is ready once its warm Realtime session is up
+            while (await http.get(f"{app_url}/ready")).status_code != 200:
+                await asyncio.sleep(0.1)
+
+            async def staggered(i):
+                await asyncio.sleep(i * 0.25)
+                return await Caller(i).run(app_url.replace("http", "ws", 1) + "/media-stream", args.turns,
+                                           args.lead_ms, args.speech_ms, args.silence_ms)
+
+            callers = await asyncio.gather(*(staggered(i) for i in range(args.calls)))
+            stages = await _stage_means(http, app_url)
+    finally:
+        process.terminate()
+        await asyncio.to_thread(process.wait)
+
+    ok = [c for c in callers if c.error is None]
+    for c in callers:
+        if c.error is not None:
+            print(f"  call failed: {c.error}")
+    print(f"  {label:<28} {len(ok):3d}  {_percentiles([c.greeting for c in ok if c.greeting is not None])}  "
+          f"{_percentiles([r for c in ok for r in c.responses])}  "
+          f"{sum(len(c.responses) for c in ok):3d}/{len(ok) * args.turns}")
+    return stages
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Cascade vs Realtime time-to-first-audio benchmark")
+    parser.add_argument("--calls", type=int, default=4, help="concurrent calls per engine")
+    parser.add_argument("--turns", type=int, default=3, help="caller turns per call")
+    parser.add_argument("--speech-ms", type=int, default=1000, help="length of each caller turn")
+    parser.add_argument("--lead-ms", type=int, default=4500, help="silence before each turn, for the reply to play")
+    parser.add_argument("--silence-ms", type=int, default=500,
+                        help="silence that ends a turn, for both the cascade and the mock's server VAD")
+    parser.add_argument("--model-delay-ms", type=int, default=600, help="Realtime response.created to first audio")
+    parser.add_argument("--asr-ms", type=int, default=300)
+    parser.add_argument("--first-token-ms", type=int, default=400)
+    parser.add_argument("--token-ms", type=int, default=30)
+    parser.add_argument("--tts-ms", type=int, default=200)
+    parser.add_argument("--tts", default="openai", choices=("openai", "elevenlabs"))
+    parser.add_argument("--mock-port", type=int, default=9800)
+    parser.add_argument("--stub-port", type=int, default=8700)
+    parser.add_argument("--app-port", type=int, default=8800)
+    args = parser.parse_args()
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stub = subprocess.Popen(
+        [sys.executable, "cascade_stub.py", "--port", str(args.stub_port), "--asr-ms", str(args.asr_ms),
+         "--first-token-ms", str(args.first_token_ms), "--token-ms", str(args.token_ms),
+         "--tts-ms", str(args.tts_ms)],
+        cwd=ROOT, stdout=subprocess.DEVNULL,
+    )
+    cascade_env = {
+        "ENGINE": "cascade",
+        "CASCADE_ASR_URL": stub_url,
+        "CASCADE_LLM_URL": stub_url,
+        "CASCADE_TTS_URL": stub_url,
+        "CASCADE_TTS": args.tts,
+        "CASCADE_SILENCE_MS": str(args.silence_ms),
+    }
+    # The mock's server VAD answers at the end of every turn period, after the trailing silence
+    period_ms = args.lead_ms + args.speech_ms + args.silence_ms
+    mock = MockRealtimeServer(turn_ms=period_ms, response_delay_ms=args.model_delay_ms)
+    try:
+        await wait_until_up(stub_url)
+        async with mock.serve(port=args.mock_port):
+            print(f"{args.calls} calls x {args.turns} turns, ms   calls  greeting p50/p95  "
+                  f"turn end -> reply p50/p95  replies")
+            await run_engine(args, "realtime", {"ENGINE": "realtime"})
+            streamed = await run_engine(args, "cascade", cascade_env)
+            whole = await run_engine(args, "cascade, whole replies", dict(cascade_env, CASCADE_SENTENCE_CHUNKS="0"))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print("cascade stage means, ms       streamed    whole")
+    for label, _ in STAGES:
+        cells = [f"{s[label]:8.0f}" if s[label] is not None else "       -" for s in (streamed, whole)]
+        print(f"  {label:<28} {cells[0]} {cells[1]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,272 @@
+# benchmarks/loadtest.py
+#
+# Capacity test: N simulated Twilio callers against one app.py worker, with
+# the OpenAI leg served by mock_realtime.MockRealtimeServer.
+#
+#   python -m benchmarks.loadtest --levels 1 10 50 100 --duration 20
+#
+# Starts the app with uvicorn in a subprocess (it still needs config.py),
+# pointed at the mock. Run once with and once without --clip-cache, with a
+# realistic --model-delay-ms, to see what the cached greeting does to time to
+# first audio. To test a worker that is already running, start it
+# with OPENAI_REALTIME_URL=ws://127.0.0.1:<--mock-port> and pass --app-url
+# (and --app-pid to get its CPU and RSS).
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+
+import httpx
+import numpy as np
+import websockets
+
+from g711 import SAMPLE_RATE, pcm_to_ulaw
+from mock_realtime import MockRealtimeServer
+
+FRAME_MS = 20
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+LATE_TOLERANCE = 0.005  # playout may run dry by this much before a frame counts as late
+BURST_GAP = 0.3  # a longer pause between agent frames starts a new utterance
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _caller_frames():
+    """Speech-like (300 Hz tone) frames, base64-encoded once."""
+    t = np.arange(FRAME_SAMPLES * 50) / SAMPLE_RATE
+    audio = pcm_to_ulaw((6000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)).tobytes()
+    return [base64.b64encode(audio[i:i + FRAME_SAMPLES]).decode("ascii")
+            for i in range(0, len(audio), FRAME_SAMPLES)]
+
+
+CALLER_FRAMES = _caller_frames()
+
+
+class CallResult:
+    def __init__(self):
+        self.time_to_first_audio = None
+        self.response_latencies = []
+        self.frames_sent = 0
+        self.sender_late = 0  # our own sends that missed their 20 ms slot
+        self.agent_frames = 0
+        self.late_frames = 0
+        self.error = None
+
+
+async def simulated_call(app_url, call_no, duration, turn_ms):
+    """One Twilio call: webhook, then paced media frames with mark echoes, then stop."""
+    result = CallResult()
+    ws_url = app_url.replace("http", "ws", 1) + "/media-stream"
+    try:
+        async with httpx.AsyncClient() as http:
+            response = await http.post(f"{app_url}/incoming-call")
+            response.raise_for_status()
+
+        started = time.monotonic()
+        async with websockets.connect(ws_url, max_queue=None) as ws:
+            stream_sid = f"MZloadtest{call_no:08d}"
+            await ws.send(json.dumps({"event": "start", "start": {"streamSid": stream_sid}}))
+
+            playout_end = 0.0  # when the agent audio queued so far finishes playing
+            last_agent_frame = 0.0
+            turn_ended = None
+            marks = deque()  # (due time, name): Twilio echoes a mark once it has played
+
+            async def receive():
+                nonlocal playout_end, last_agent_frame, turn_ended
+                async for message in ws:
+                    now = time.monotonic()
+                    data = json.loads(message)
+                    event = data.get("event")
+                    if event == "media":
+                        result.agent_frames += 1
+                        if result.time_to_first_audio is None:
+                            result.time_to_first_audio = now - started
+                        if turn_ended is not None:
+                            result.response_latencies.append(now - turn_ended)
+                            turn_ended = None
+                        if now - last_agent_frame < BURST_GAP and now > playout_end + LATE_TOLERANCE:
+                            result.late_frames += 1
+                        last_agent_frame = now
+                        samples = len(data["media"]["payload"]) * 3 // 4
+                        playout_end = max(playout_end, now) + samples / SAMPLE_RATE
+                    elif event == "mark":
+                        marks.append((max(playout_end, now), data["mark"]["name"]))
+                    elif event == "clear":
+                        playout_end = now
+                        while marks:
+                            _, name = marks.popleft()
+                            await ws.send(json.dumps({"event": "mark", "streamSid": stream_sid,
+                                                      "mark": {"name": name}}))
+
+            receiver = asyncio.create_task(receive())
+            frames = duration * 1000 // FRAME_MS
+            frames_per_turn = max(turn_ms // FRAME_MS, 1) if turn_ms else 0
+            t0 = time.monotonic()
+            for n in range(frames):
+                delay = t0 + n * FRAME_MS / 1000 - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                elif delay < -FRAME_MS / 1000:
+                    result.sender_late += 1
+                await ws.send(json.dumps({
+                    "event": "media",
+                    "streamSid": stream_sid,
+                    "media": {"track": "inbound", "timestamp": str(n * FRAME_MS),
+                              "payload": CALLER_FRAMES[n % len(CALLER_FRAMES)]},
+                }))
+                result.frames_sent += 1
+                now = time.monotonic()
+                if frames_per_turn and (n + 1) % frames_per_turn == 0:
+                    turn_ended = now
+                while marks and marks[0][0] <= now:
+                    _, name = marks.popleft()
+                    await ws.send(json.dumps({"event": "mark", "streamSid": stream_sid,
+                                              "mark": {"name": name}}))
+            await ws.send(json.dumps({"event": "stop", "streamSid": stream_sid}))
+            receiver.cancel()
+    except Exception as e:
+        result.error = repr(e)
+    return result
+
+
+def _percentiles(values):
+    if not values:
+        return "      -       -       -"
+    p50, p95, p99 = np.percentile(np.asarray(values) * 1000, [50, 95, 99])
+    return f"{p50:7.0f} {p95:7.0f} {p99:7.0f}"
+
+
+def _process_usage(pid):
+    """(CPU seconds, RSS bytes) of `pid`, from /proc."""
+    if pid is None:
+        return None, None
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss = None
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1]) * 1024
+    return cpu, rss
+
+
+async def run_level(app_url, app_pid, mock, calls, duration, turn_ms):
+    appended_before = mock.appended_ms
+    cpu_before, _ = _process_usage(app_pid)
+    wall_before = time.monotonic()
+    ramp = min(2.0, calls * 0.02)
+
+    async def staggered(i):
+        await asyncio.sleep(ramp * i / calls)
+        return await simulated_call(app_url, i, duration, turn_ms)
+
+    results = await asyncio.gather(*(staggered(i) for i in range(calls)))
+    await asyncio.sleep(1.0)  # let the app flush the last frames to the mock
+    cpu_after, rss = _process_usage(app_pid)
+    wall = time.monotonic() - wall_before
+
+    ok = [r for r in results if r.error is None]
+    for r in results:
+        if r.error is not None:
+            print(f"  call failed: {r.error}")
+    sent = sum(r.frames_sent for r in ok)
+    forwarded = (mock.appended_ms - appended_before) // FRAME_MS
+    agent_frames = sum(r.agent_frames for r in ok)
+    late = sum(r.late_frames for r in ok)
+    cpu = f"{(cpu_after - cpu_before) / wall * 100:5.0f}%" if app_pid else "    -"
+    rss_mb = f"{rss / 2 ** 20:7.0f}" if rss else "      -"
+    print(f"{calls:6d} {len(ok):4d}  "
+          f"{_percentiles([r.time_to_first_audio for r in ok if r.time_to_first_audio is not None])}  "
+          f"{_percentiles([x for r in ok for x in r.response_latencies])}  "
+          f"{late:6d}/{agent_frames:<7d} {max(sent - forwarded, 0):7d} "
+          f"{sum(r.sender_late for r in ok):6d}  {cpu} {rss_mb}")
+
+
+def start_app(port, mock_port, recording_mode, clip_cache_dir, extra_env=None):
+    env = dict(os.environ, **(extra_env or {}))
+    env["OPENAI_REALTIME_URL"] = f"ws://127.0.0.1:{mock_port}"
+    env["RECORDING_MODE"] = recording_mode
+    env["CLIP_CACHE_DIR"] = clip_cache_dir or ""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env=env, stdout=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(app_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while True:
+            try:
+                await http.get(f"{app_url}/")
+                return
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.2)
+
+
+async def wait_for_clips(app_url, timeout=60):
+    """Wait until the app has loaded its prompt clips."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.monotonic() < deadline:
+            page = (await http.get(f"{app_url}/metrics")).text
+            for line in page.splitlines():
+                if line.startswith("golfbot_clip_cache_bytes ") and float(line.split()[1]) > 0:
+                    return
+            await asyncio.sleep(0.2)
+    raise TimeoutError("the app did not load its prompt clips")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent-call load test for app.py")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=int, default=20, help="seconds per call")
+    parser.add_argument("--turn-ms", type=int, default=4000, help="caller speaks a turn every this many ms")
+    parser.add_argument("--reply-ms", type=int, default=2000)
+    parser.add_argument("--model-delay-ms", type=int, default=0,
+                        help="mock model time before the first audio of each response")
+    parser.add_argument("--clip-cache", metavar="DIR",
+                        help="greet from the clip cache in DIR (rendered by the mock on first use)")
+    parser.add_argument("--recording", default="off", choices=("off", "combined", "stereo"))
+    parser.add_argument("--mock-port", type=int, default=9400)
+    parser.add_argument("--app-port", type=int, default=8400)
+    parser.add_argument("--app-url", help="use an already running app instead of starting one")
+    parser.add_argument("--app-pid", type=int)
+    args = parser.parse_args()
+
+    mock = MockRealtimeServer(reply_ms=args.reply_ms, turn_ms=args.turn_ms,
+                              response_delay_ms=args.model_delay_ms)
+    async with mock.serve(port=args.mock_port):
+        app_process = None
+        app_url, app_pid = args.app_url, args.app_pid
+        if app_url is None:
+            app_process = start_app(args.app_port, args.mock_port, args.recording, args.clip_cache)
+            app_url, app_pid = f"http://127.0.0.1:{args.app_port}", app_process.pid
+        try:
+            await wait_until_up(app_url)
+            if args.clip_cache:
+                await wait_for_clips(app_url)
+            print(f"{args.duration}s calls, caller turn every {args.turn_ms}ms, "
+                  f"greeting from {'clip cache' if args.clip_cache else 'model'}, latencies in ms")
+            print(" calls   ok  first audio p50/p95/p99  response p50/p95/p99  "
+                  "late/agent frames dropped s-late    cpu  rss MB")
+            for calls in args.levels:
+                await run_level(app_url, app_pid, mock, calls, args.duration, args.turn_ms)
+        finally:
+            if app_process is not None:
+                app_process.terminate()
+                app_process.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,344 @@
+# benchmarks/replay.py
+#
+# Replays a call captured with CAPTURE_DIR against one app.py worker: this
+# script plays the captured Twilio side, a mock OpenAI peer plays back the
+# captured OpenAI side, and each run ends with a timing report.
+#
+#   CAPTURE_DIR=captures python app.py          # capture the problem call
+#   python -m benchmarks.replay captures/MZ....gbcap --speed 1
+#   python -m benchmarks.replay captures/MZ....gbcap --speed 0 --repeat 20
+#
+# --speed 1 plays both sides at the captured pace, 4 four times faster and
+# 0 as fast as the app keeps up. Besides its time, each message waits until
+# every message captured before it on either side has been delivered, and
+# until the app has sent the control messages that came before it (the
+# response.create before a response, the mark before its echo), so the
+# interleaving stays causal at any speed. Audio frames are not counted as
+# control messages, since queue policies may drop them; a wait longer than
+# --wait-timeout is reported as a stall and the replay moves on.
+#
+# The app is started with the relay settings stored in the capture, pointed at
+# the peer, unless --app-url names one already running (with
+# OPENAI_REALTIME_URL=ws://127.0.0.1:<--peer-port>).
+
+import argparse
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+import websockets
+
+from benchmarks.loadtest import BURST_GAP, start_app, wait_until_up
+from capture import TWILIO_IN, TWILIO_OUT, OPENAI_OUT, OPENAI_IN, read_capture
+from relay import is_audio_append, is_twilio_media
+
+
+class Script:
+    """Both sides' messages from a capture.
+
+    Each entry is (seconds, message, app control messages sent on that leg
+    before it, messages delivered on the other side before it).
+    """
+
+    def __init__(self, records):
+        self.twilio = []
+        self.openai = []
+        self.twilio_control = Counter()  # app -> Twilio, by event
+        self.openai_control = Counter()  # app -> OpenAI, by type
+        self.first_audio = None
+        self.duration = records[-1][0] if records else 0.0
+        for t, direction, message in records:
+            if direction == TWILIO_IN:
+                self.twilio.append((t, message, sum(self.twilio_control.values()), len(self.openai)))
+            elif direction == OPENAI_IN:
+                self.openai.append((t, message, sum(self.openai_control.values()), len(self.twilio)))
+            elif direction == TWILIO_OUT:
+                if is_twilio_media(message):
+                    if self.first_audio is None:
+                        self.first_audio = t
+                else:
+                    self.twilio_control[json.loads(message).get("event")] += 1
+            elif direction == OPENAI_OUT and not is_audio_append(message):
+                self.openai_control[json.loads(message).get("type")] += 1
+
+
+class Progress:
+    """Messages sent on one leg so far, for messages that must wait on them."""
+
+    def __init__(self):
+        self.count = 0
+        self.missing = 0  # given up on after a stall
+        self.stalls = 0
+        self.by_type = Counter()
+        self._changed = asyncio.Event()
+
+    def sent(self, kind):
+        self.count += 1
+        self.by_type[kind] += 1
+        self._changed.set()
+
+    async def reach(self, needed, timeout):
+        needed -= self.missing
+        if self.count >= needed:
+            return
+        deadline = time.monotonic() + timeout
+        while self.count < needed:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                self.stalls += 1
+                self.missing += needed - self.count
+                return
+
+
+async def play(messages, send, control, delivered, other, t0, speed, wait_timeout):
+    """Send `messages` at their captured offsets (scaled by `speed`), each after what it depends on.
+
+    `control` counts the app's control messages on this leg, `delivered`
+    this side's sent messages and `other` the other side's.
+    """
+    for t, message, control_needed, other_needed in messages:
+        if speed:
+            delay = t0 + t / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await other.reach(other_needed, wait_timeout)
+        await control.reach(control_needed, wait_timeout)
+        await send(message)
+        delivered.sent("input")
+
+
+class ReplayPeer:
+    """Mock OpenAI Realtime endpoint that plays back the captured OpenAI side of one call.
+
+    The pool opens sessions before the call, so the call's session is the
+    first warm one to receive a message once the replay is armed (or the
+    first new one, if none were warm).
+    """
+
+    def __init__(self, script, speed, wait_timeout):
+        self.script = script
+        self.speed = speed
+        self.wait_timeout = wait_timeout
+        self.armed = False
+        self.started = asyncio.get_running_loop().create_future()  # the call's t0
+        self.warm = set()
+        self.call_ws = None
+        self.progress = Progress()  # app -> OpenAI control messages
+        self.delivered = Progress()  # captured OpenAI messages sent
+        self.twilio_delivered = None  # the driver's, set when the call starts
+        self.closed = asyncio.Event()  # the app closed the call's session
+        self.appends = []  # when each caller audio frame arrived
+        self.first_deltas = []  # when the first audio delta of each response was sent
+        self._player = None
+
+    async def handler(self, ws, path=None):
+        if not self.armed:
+            self.warm.add(ws)
+        try:
+            async for message in ws:
+                if self.call_ws is None:
+                    if not self.armed or (ws not in self.warm and any(w.open for w in self.warm)):
+                        continue
+                    self.call_ws = ws
+                    self._player = asyncio.create_task(self._play(ws))
+                if ws is not self.call_ws:
+                    continue
+                if is_audio_append(message):
+                    self.appends.append(time.monotonic())
+                else:
+                    self.progress.sent(json.loads(message).get("type"))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if ws is self.call_ws:
+                self.closed.set()
+                if self._player is not None:
+                    self._player.cancel()
+
+    async def _play(self, ws):
+        t0 = await self.started
+        responses = set()
+
+        async def send(message):
+            if '"response.audio.delta"' in message[:60]:
+                response_id = json.loads(message).get("response_id")
+                if response_id not in responses:
+                    responses.add(response_id)
+                    self.first_deltas.append(time.monotonic())
+            await ws.send(message)
+
+        try:
+            await play(self.script.openai, send, self.progress, self.delivered, self.twilio_delivered,
+                       t0, self.speed, self.wait_timeout)
+        except websockets.ConnectionClosed:
+            pass
+
+    def serve(self, host="127.0.0.1", port=9500):
+        return websockets.serve(self.handler, host, port, max_size=None)
+
+
+class ReplayResult:
+    def __init__(self):
+        self.t0 = None
+        self.wall = None
+        self.sent_media = []  # when each caller frame was sent
+        self.agent_media = []  # when each agent frame arrived
+        self.progress = Progress()  # app -> Twilio control messages
+        self.delivered = Progress()  # captured Twilio messages sent
+        self.error = None
+
+
+async def drive(app_url, course, script, peer, speed, wait_timeout, hangup_timeout=10.0):
+    """Play the captured Twilio side over a media stream and record what comes back.
+
+    The replay ends when the app closes the call's OpenAI session, as it does on `stop`.
+    """
+    result = ReplayResult()
+    ws_url = app_url.replace("http", "ws", 1) + f"/media-stream/{course}"
+    try:
+        peer.armed = True
+        async with websockets.connect(ws_url, max_queue=None, max_size=None) as ws:
+            result.t0 = time.monotonic()
+            peer.twilio_delivered = result.delivered
+            peer.started.set_result(result.t0)
+
+            async def receive():
+                async for message in ws:
+                    if is_twilio_media(message):
+                        result.agent_media.append(time.monotonic())
+                    else:
+                        result.progress.sent(json.loads(message).get("event"))
+
+            async def send(message):
+                if '"media"' in message[:40]:
+                    result.sent_media.append(time.monotonic())
+                await ws.send(message)
+
+            receiver = asyncio.create_task(receive())
+            await play(script.twilio, send, result.progress, result.delivered, peer.delivered,
+                       result.t0, speed, wait_timeout)
+            try:
+                await asyncio.wait_for(peer.closed.wait(), hangup_timeout)
+            except asyncio.TimeoutError:
+                pass
+            result.wall = time.monotonic() - result.t0
+            receiver.cancel()
+    except Exception as e:
+        result.error = repr(e)
+    return result
+
+
+def _ms(values):
+    if not values:
+        return "      -       -       -"
+    p50, p99, peak = np.percentile(np.asarray(values) * 1000, [50, 99, 100])
+    return f"{p50:7.1f} {p99:7.1f} {peak:7.1f}"
+
+
+def _control_diff(captured, replayed):
+    changed = [f"{kind} {captured[kind]}->{replayed[kind]}"
+               for kind in sorted(set(captured) | set(replayed), key=str) if captured[kind] != replayed[kind]]
+    return ", ".join(changed) if changed else "same as captured"
+
+
+def report(script, result, peer, speed):
+    """Timing report for one replay, as (printable lines, dict for --json)."""
+    first_audio = result.agent_media[0] - result.t0 if result.agent_media else None
+    # Frames queued when the call ends are never forwarded, so pair from the start
+    inbound = [received - sent for sent, received in zip(result.sent_media, peer.appends)]
+    responses = []
+    for sent in peer.first_deltas:
+        i = bisect_left(result.agent_media, sent)
+        if i < len(result.agent_media):
+            responses.append(result.agent_media[i] - sent)
+    gaps = [b - a for a, b in zip(result.agent_media, result.agent_media[1:]) if b - a < BURST_GAP]
+    summary = {
+        "speed": speed,
+        "captured_seconds": script.duration,
+        "wall_seconds": result.wall,
+        "first_audio_captured_ms": script.first_audio * 1000 if script.first_audio is not None else None,
+        "first_audio_ms": first_audio * 1000 if first_audio is not None else None,
+        "caller_frames_sent": len(result.sent_media),
+        "caller_frames_forwarded": len(peer.appends),
+        "agent_frames": len(result.agent_media),
+        "inbound_ms": [x * 1000 for x in inbound],
+        "response_ms": [x * 1000 for x in responses],
+        "agent_frame_gap_ms": [x * 1000 for x in gaps],
+        "stalls": {"twilio": result.progress.stalls + result.delivered.stalls,
+                   "openai": peer.progress.stalls + peer.delivered.stalls},
+        "openai_control": dict(peer.progress.by_type),
+        "twilio_control": dict(result.progress.by_type),
+    }
+    captured_first = f"{script.first_audio * 1000:.1f}" if script.first_audio is not None else "-"
+    replayed_first = f"{first_audio * 1000:.1f}" if first_audio is not None else "-"
+    lines = [
+        f"replayed {script.duration:.1f}s of call in {result.wall:.1f}s (speed {speed or 'max'})",
+        f"  first audio ms        captured {captured_first}, replay {replayed_first}",
+        "                            p50     p99     max",
+        f"  caller -> OpenAI ms   {_ms(inbound)}  {len(peer.appends)} of {len(result.sent_media)} frames forwarded",
+        f"  response -> caller ms {_ms(responses)}  over {len(responses)} responses",
+        f"  agent frame gap ms    {_ms(gaps)}  over {len(result.agent_media)} frames",
+        f"  stalls                twilio {summary['stalls']['twilio']}, openai {summary['stalls']['openai']}",
+        f"  app -> OpenAI control {_control_diff(script.openai_control, peer.progress.by_type)}",
+        f"  app -> Twilio control {_control_diff(script.twilio_control, result.progress.by_type)}",
+    ]
+    return lines, summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay a captured call against app.py")
+    parser.add_argument("capture", help="a .gbcap file written with CAPTURE_DIR")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 real time, >1 faster, 0 as fast as possible")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--wait-timeout", type=float, default=2.0,
+                        help="seconds a message waits for the app before counting a stall")
+    parser.add_argument("--clip-cache", metavar="DIR", help="start the app with this clip cache")
+    parser.add_argument("--json", metavar="PATH", help="also write the reports here")
+    parser.add_argument("--peer-port", type=int, default=9500)
+    parser.add_argument("--app-port", type=int, default=8500)
+    parser.add_argument("--app-url", help="use an already running app instead of starting one")
+    args = parser.parse_args()
+
+    header, records = read_capture(args.capture)
+    script = Script(records)
+    print(f"{args.capture}: course {header.get('course')}, {len(records)} messages over {script.duration:.1f}s, "
+          f"greeting {'cached' if header.get('greeting_cached') else 'from model'}")
+
+    reports = []
+    for run in range(args.repeat):
+        # A fresh peer and app per run, so no state carries over between replays
+        peer = ReplayPeer(script, args.speed, args.wait_timeout)
+        async with peer.serve(port=args.peer_port):
+            app_process = None
+            app_url = args.app_url
+            if app_url is None:
+                app_process = start_app(args.app_port, args.peer_port, "off", args.clip_cache,
+                                        extra_env=dict(header.get("env", {}), REALTIME_POOL_MIN="1"))
+                app_url = f"http://127.0.0.1:{args.app_port}"
+            try:
+                await wait_until_up(app_url)
+                await asyncio.sleep(0.5)  # let the pool open its warm session
+                result = await drive(app_url, header.get("course", ""), script, peer, args.speed, args.wait_timeout)
+            finally:
+                if app_process is not None:
+                    app_process.terminate()
+                    app_process.wait()
+        if result.error is not None:
+            print(f"run {run + 1}: failed: {result.error}")
+            continue
+        lines, summary = report(script, result, peer, args.speed)
+        print(f"run {run + 1}: " + "\n".join(lines))
+        reports.append(summary)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"capture": args.capture, "header": header, "runs": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
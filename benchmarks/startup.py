@@ -0,0 +1,108 @@
+# benchmarks/startup.py
+#
+# Cold-start benchmark: how long a new worker takes to import app.py, start
+# listening, and report ready on /ready (warm Realtime session, and S3
+# connections when recording). The OpenAI leg is mock_realtime.
+#
+#   python -m benchmarks.startup --runs 5
+#   S3_ENDPOINT_URL=http://127.0.0.1:9000 python -m benchmarks.startup --recording combined
+#
+# Also lists the slowest top-level imports of app.py, from -X importtime.
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.loadtest import start_app
+from mock_realtime import MockRealtimeServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_APP = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def import_seconds():
+    """Seconds to import app.py in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", IMPORT_APP], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count=8):
+    """(cumulative seconds, module) of the slowest modules app.py imports directly."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    found = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("   ") and not name.startswith("    "):  # imported by app itself
+            found.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(found, reverse=True)[:count]
+
+
+async def time_to_ready(port, mock_port, recording_mode, timeout=60):
+    """(listening, ready, app-reported startup) seconds for one worker started from scratch."""
+    started = time.monotonic()
+    process = start_app(port, mock_port, recording_mode, None)
+    url = f"http://127.0.0.1:{port}"
+    listening = None
+    try:
+        async with httpx.AsyncClient() as http:
+            while time.monotonic() - started < timeout:
+                try:
+                    response = await http.get(f"{url}/ready")
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.01)
+                    continue
+                if listening is None:
+                    listening = time.monotonic() - started
+                if response.status_code == 200:
+                    return listening, time.monotonic() - started, response.json()["startup_seconds"]
+                await asyncio.sleep(0.01)
+        raise TimeoutError(f"worker not ready after {timeout}s: {response.json()}")
+    finally:
+        process.terminate()
+        # The mock runs on this loop, and the worker closes its sessions on the way out
+        await asyncio.to_thread(process.wait)
+
+
+def _stats(values):
+    p50, peak = np.percentile(np.asarray(values) * 1000, [50, 100])
+    return f"{p50:7.0f} {peak:7.0f}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Worker import and time-to-ready benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--recording", default="off", choices=("off", "combined", "stereo"),
+                        help="with recording on, ready also waits for S3 (set S3_ENDPOINT_URL for a local one)")
+    parser.add_argument("--mock-port", type=int, default=9600)
+    parser.add_argument("--app-port", type=int, default=8600)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    print("slowest imports of app.py:")
+    for seconds, name in slowest_imports():
+        print(f"  {seconds * 1000:7.0f} ms  {name}")
+
+    mock = MockRealtimeServer()
+    results = []
+    async with mock.serve(port=args.mock_port):
+        for _ in range(args.runs):
+            results.append(await time_to_ready(args.app_port, args.mock_port, args.recording))
+
+    print(f"{args.runs} runs, recording {args.recording}, ms      p50     max")
+    print(f"  import app.py                  {_stats(imports)}")
+    print(f"  process start -> listening     {_stats([r[0] for r in results])}")
+    print(f"  process start -> ready         {_stats([r[1] for r in results])}")
+    print(f"  startup hook -> ready (app)    {_stats([r[2] for r in results])}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
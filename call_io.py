@@ -0,0 +1,162 @@
+# call_io.py
+#
+# Per-call plumbing shared by the Realtime and cascade engines: the queue,
+# pump and scheduler that carry agent audio to Twilio, and the recording
+# from the first frame to the finished S3 object. Each engine only decides
+# what to say; how it reaches the caller and the recording is the same.
+
+import json
+from time import perf_counter
+
+from capture import TWILIO_OUT
+from outbound import OutboundScheduler
+from recording import RECORDING_MAX_PARTS, RecordingBuffer, StereoRecorder
+from relay import TwilioMediaTemplate, is_twilio_media
+from relay_queue import BLOCK, RelayQueue
+
+
+class TwilioOutput:
+    """Everything one call sends to Twilio.
+
+    `send_messages` queues messages for `pump_to_twilio`, which writes them
+    to the socket, times each send into `call_metrics` and captures it.
+    Media may be dropped from a full queue; marks and control events never
+    are. `outbound` frames and marks the agent audio.
+    """
+
+    def __init__(self, websocket, call_metrics, queue_size=100, queue_policy=BLOCK,
+                 frame_ms=100, mark_every_ms=500, capture=None):
+        self.websocket = websocket
+        self.call_metrics = call_metrics
+        self.capture = capture
+        self.stream_sid = None
+        self.queue = RelayQueue("to_twilio", queue_size, queue_policy)
+        self.outbound = OutboundScheduler(TwilioMediaTemplate(None), frame_ms=frame_ms,
+                                          mark_every_ms=mark_every_ms)
+
+    def start(self, stream_sid):
+        """Address everything sent from now on to the stream Twilio just started."""
+        self.stream_sid = stream_sid
+        self.outbound.template = TwilioMediaTemplate(stream_sid)
+
+    async def send_messages(self, messages):
+        for message in messages:
+            await self.queue.put(message, droppable=is_twilio_media(message))
+
+    async def _send_to_socket(self, message):
+        started = perf_counter()
+        await self.websocket.send_text(message)
+        now = perf_counter()
+        self.call_metrics.twilio_sent(now - started)
+        if is_twilio_media(message):
+            self.call_metrics.audio_sent(now)
+        if self.capture is not None:
+            self.capture.record(TWILIO_OUT, message)
+
+    async def pump_to_twilio(self):
+        try:
+            await self.queue.pump(self._send_to_socket)
+        except Exception as e:
+            print(f"Error in pump_to_twilio: {e}")
+
+    async def clear_playback(self):
+        """Drop agent audio not sent yet and have Twilio drop what it has buffered."""
+        self.queue.clear()
+        await self.queue.put(json.dumps({"event": "clear", "streamSid": self.stream_sid}), droppable=False)
+        self.outbound.clear()
+
+    def close(self):
+        """Stop the pump; anything still queued is discarded."""
+        self.queue.close()
+
+
+class CallRecording:
+    """One call's recording, from the first frame to the finished S3 object.
+
+    Audio goes to a spool file when `spool_shipper` is set (it ships full
+    parts in the background), otherwise to a `RecordingBuffer` whose full
+    parts `flush_parts` hands to the uploader as the call goes. 'stereo'
+    mode mixes through a `StereoRecorder`; with mode 'off' nothing is
+    recorded and every method is a no-op.
+    """
+
+    def __init__(self, uploader, spool_shipper=None, mode="combined", max_parts=RECORDING_MAX_PARTS):
+        self.uploader = uploader
+        self.spool_shipper = spool_shipper
+        self.mode = mode
+        self.recorder = None
+        if spool_shipper is not None:
+            self.recorder = spool_shipper.open()
+        elif mode != "off":
+            self.recorder = RecordingBuffer(max_parts=max_parts)
+        self.stereo = StereoRecorder(self.recorder) if mode == "stereo" else None
+        self.stream_sid = None
+        self.upload = None  # multipart upload state for this call only
+        self.uploaded = False
+
+    @property
+    def active(self):
+        """Whether audio written here is kept, i.e. worth decoding."""
+        return self.recorder is not None
+
+    @property
+    def key(self):
+        """The S3 key of the recording once it is stored, else None."""
+        return self.upload.key if self.uploaded else None
+
+    def start(self, stream_sid, bucket):
+        """Begin the S3 upload once Twilio names the stream; it is created in the background."""
+        if self.recorder is None or self.upload is not None:
+            return
+        self.stream_sid = stream_sid
+        self.upload = self.uploader.start(f"{stream_sid}_{self.mode}_audio.raw", bucket)
+        if self.spool_shipper is not None:
+            self.recorder.attach(self.upload)
+
+    def write_caller(self, timestamp_ms, audio):
+        if self.stereo:
+            self.stereo.write_caller(timestamp_ms, audio)
+        elif self.recorder is not None:
+            self.recorder.write(audio)
+
+    def write_agent(self, audio):
+        if self.stereo:
+            self.stereo.write_agent(audio)
+        elif self.recorder is not None:
+            self.recorder.write(audio)
+
+    def clear_agent(self):
+        """Unplayed agent audio never reached the caller."""
+        if self.stereo:
+            self.stereo.clear_agent()
+
+    async def flush_parts(self):
+        """Hand every full part of the recording to the uploader."""
+        if self.spool_shipper is not None:
+            return  # shipped from the spool file in the background
+        while self.upload is not None and not self.upload.closed:
+            part = self.recorder.pop_full()
+            if part is None:
+                break
+            # Waits here if the upload pool is saturated
+            await self.uploader.upload_part(self.upload, part, on_done=self.recorder.release)
+
+    async def complete_upload(self):
+        """Upload the rest and complete the upload; the uploader aborts it on failure."""
+        if self.upload is None or self.upload.closed:
+            return
+        if self.stereo:
+            self.stereo.close()
+        if self.spool_shipper is not None:
+            self.uploaded = await self.spool_shipper.finish(self.recorder)
+        else:
+            await self.flush_parts()
+            self.uploaded = await self.uploader.complete(self.upload, self.recorder.tail(),
+                                                         on_done=self.recorder.release)
+        print(f"Recording for {self.stream_sid}: high-water {self.recorder.high_water} bytes, "
+              f"dropped {self.recorder.dropped} bytes, process peak {type(self.recorder).peak_bytes} bytes")
+
+    def discard(self):
+        """Forget a spool whose call never started an upload."""
+        if self.spool_shipper is not None and self.upload is None:
+            self.spool_shipper.discard(self.recorder)
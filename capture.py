@@ -0,0 +1,132 @@
+# capture.py
+#
+# Opt-in capture of both WebSocket streams of a call, for replaying an
+# incident call against the app (benchmarks/replay.py). Every message is
+# stored with its direction and a monotonic offset from the start of the
+# call, so the exact interleaving of Twilio and OpenAI traffic survives.
+#
+# File format, gzip-compressed:
+#
+#   b"GBCAP\x01", u32 header length, JSON header
+#   then per message: u64 microseconds since start, u8 direction, u32 length, UTF-8 message
+#
+# All integers little-endian. A capture cut off by a crash reads up to its
+# last complete record.
+
+import asyncio
+import gzip
+import json
+import os
+import struct
+import time
+import uuid
+import zlib
+
+MAGIC = b"GBCAP\x01"
+_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<QBI")
+
+TWILIO_IN = 0  # Twilio -> app
+TWILIO_OUT = 1  # app -> Twilio
+OPENAI_OUT = 2  # app -> OpenAI
+OPENAI_IN = 3  # OpenAI -> app
+DIRECTIONS = ("twilio->app", "app->twilio", "app->openai", "openai->app")
+
+
+class CallCapture:
+    """Writes one call's messages to a capture file in `directory`.
+
+    Records are buffered and compressed `flush_bytes` at a time (at the
+    fastest gzip level), so recording a message is a struct pack and a
+    bytearray append. Compressing and writing a full buffer runs on a
+    worker thread, one flush after another. The file is named after the
+    stream once it closes.
+    """
+
+    def __init__(self, directory, header=None, flush_bytes=64 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{uuid.uuid4().hex}.gbcap.part")
+        self.flush_bytes = flush_bytes
+        self.messages = 0
+        self._started = time.monotonic_ns()
+        self._file = None  # opened by the first write
+        self._writing = None  # task writing the last flushed buffer
+        self._buffer = bytearray(MAGIC)
+        encoded = json.dumps(header or {}).encode("utf-8")
+        self._buffer += _LENGTH.pack(len(encoded)) + encoded
+
+    def record(self, direction, message):
+        data = message.encode("utf-8") if isinstance(message, str) else message
+        self._buffer += _RECORD.pack((time.monotonic_ns() - self._started) // 1000, direction, len(data))
+        self._buffer += data
+        self.messages += 1
+        if len(self._buffer) >= self.flush_bytes:
+            self._flush()
+
+    def _flush(self):
+        chunk, self._buffer = self._buffer, bytearray()
+        self._writing = asyncio.create_task(self._write_after(self._writing, chunk))
+
+    async def _write_after(self, previous, chunk):
+        if previous is not None:
+            await previous  # keeps chunks in order
+        try:
+            await asyncio.to_thread(self._write, chunk)
+        except Exception as e:
+            print(f"Error writing capture {self.path}: {e}")
+
+    def _write(self, chunk):
+        if self._file is None:
+            self._file = gzip.open(self.path, "wb", compresslevel=1)
+        self._file.write(chunk)
+
+    async def close(self, name=None):
+        """Write what is buffered and move the file to `<name>.gbcap`.
+
+        Returns its path, or None if nothing could be written.
+        """
+        self._flush()
+        await self._writing
+        return await asyncio.to_thread(self._finish, name)
+
+    def _finish(self, name):
+        if self._file is None:
+            return None  # every write failed, so there is no file to move
+        self._file.close()
+        path = os.path.join(self.directory, f"{name or uuid.uuid4().hex}.gbcap")
+        os.replace(self.path, path)
+        return path
+
+
+def _read_all(path):
+    """The decompressed bytes of a capture, up to where a truncated file ends."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    # Unlike gzip.open, this keeps what it decoded when the stream just stops
+    # (a worker that died mid-call never wrote the gzip trailer)
+    try:
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS).decompress(raw)
+    except zlib.error as e:
+        raise ValueError(f"{path} is not a call capture: {e}")
+
+
+def read_capture(path):
+    """Load a capture: (header dict, [(seconds since start, direction, message str)])."""
+    data = _read_all(path)
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a call capture")
+    offset = len(MAGIC)
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+    header = json.loads(data[offset:offset + length])
+    offset += length
+    records = []
+    while offset + _RECORD.size <= len(data):
+        micros, direction, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            break
+        records.append((micros / 1e6, direction, data[offset:offset + length].decode("utf-8")))
+        offset += length
+    return header, records
@@ -0,0 +1,344 @@
+# cascade.py
+#
+# Cascaded alternative to the Realtime engine: the caller's turn is endpointed
+# locally (vad.TurnDetector), transcribed, answered by a streamed chat model
+# and spoken by text-to-speech. Reply tokens are cut at sentence boundaries as
+# they arrive and each sentence is synthesized as soon as it is complete, so
+# the caller hears the first sentence while the model is still writing the
+# rest. Every backend goes through one pooled async HTTP client shared by all
+# calls, so a turn reuses warm connections instead of opening new ones.
+#
+# Backends are looked up by name in ASR_BACKENDS, LLM_BACKENDS and
+# TTS_BACKENDS; any object with the same method works. cascade_stub.py serves
+# all of their endpoints locally for tests and benchmarks.
+
+import asyncio
+import io
+import json
+import re
+import time
+import wave
+
+import httpx
+import numpy as np
+
+from g711 import SAMPLE_RATE, pcm_to_ulaw, ulaw_to_pcm
+from metrics import REGISTRY
+
+ASR_LATENCY = REGISTRY.histogram("golfbot_cascade_asr_seconds", "Speech-to-text request for one caller turn.")
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    "golfbot_cascade_llm_first_token_seconds", "Chat request to the first reply token.")
+TTS_FIRST_AUDIO = REGISTRY.histogram(
+    "golfbot_cascade_tts_first_audio_seconds", "Text-to-speech request to its first audio bytes.")
+REPLY_FIRST_AUDIO = REGISTRY.histogram(
+    "golfbot_cascade_reply_first_audio_seconds", "Chat request to the first audio of the spoken reply.")
+
+# A sentence ends at ., ! or ? (closing quotes and brackets included) before whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s")
+_CLAUSE_END = re.compile(r"[,;:]\s")
+# Titles whose period does not end a sentence ("Mr. Smith", "Mt. Diablo")
+_ABBREVIATIONS = frozenset({"mr", "mrs", "ms", "dr", "st", "mt"})
+
+
+def _bearer(api_key):
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+def ulaw_wav(audio):
+    """Mu-law call audio as a 16-bit PCM WAV file, which every speech-to-text API accepts."""
+    out = io.BytesIO()
+    with wave.open(out, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(ulaw_to_pcm(audio).tobytes())
+    return out.getvalue()
+
+
+class WhisperASR:
+    """Speech to text through an OpenAI-compatible /v1/audio/transcriptions endpoint."""
+
+    def __init__(self, http, base_url, api_key=None, model=None):
+        self.http = http
+        self.url = f"{base_url.rstrip('/')}/v1/audio/transcriptions"
+        self.headers = _bearer(api_key)
+        self.model = model or "whisper-1"
+
+    async def transcribe(self, audio):
+        """The text of one turn of mu-law audio."""
+        response = await self.http.post(
+            self.url,
+            headers=self.headers,
+            data={"model": self.model, "language": "en"},
+            files={"file": ("turn.wav", ulaw_wav(audio), "audio/wav")},
+        )
+        response.raise_for_status()
+        return response.json()["text"]
+
+
+class OpenAIChat:
+    """Streamed chat completions from an OpenAI-compatible /v1/chat/completions endpoint."""
+
+    def __init__(self, http, base_url, api_key=None, model=None, temperature=0.8, max_tokens=300):
+        self.http = http
+        self.url = f"{base_url.rstrip('/')}/v1/chat/completions"
+        self.headers = _bearer(api_key)
+        self.model = model or "gpt-4o-mini"
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    async def stream(self, messages):
+        """Yield the reply to `messages` (chat-format dicts) as text deltas."""
+        body = {"model": self.model, "messages": messages, "stream": True,
+                "temperature": self.temperature, "max_tokens": self.max_tokens}
+        async with self.http.stream("POST", self.url, headers=self.headers, json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices")
+                if choices:
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+
+
+class ElevenLabsTTS:
+    """Text to speech from ElevenLabs' streaming endpoint, already 8 kHz mu-law."""
+
+    def __init__(self, http, base_url, api_key=None, model=None):
+        self.http = http
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"xi-api-key": api_key} if api_key else {}
+        self.model = model or "eleven_turbo_v2_5"
+
+    async def stream(self, text, voice):
+        """Yield `text` spoken by voice id `voice` as mu-law bytes."""
+        async with self.http.stream(
+            "POST",
+            f"{self.base_url}/v1/text-to-speech/{voice}/stream",
+            params={"output_format": "ulaw_8000"},
+            headers=self.headers,
+            json={"text": text, "model_id": self.model},
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                yield chunk
+
+
+class OpenAITTS:
+    """Text to speech from an OpenAI-compatible /v1/audio/speech endpoint.
+
+    The raw 24 kHz PCM16 it streams is averaged down to 8 kHz and mu-law
+    encoded chunk by chunk.
+    """
+
+    def __init__(self, http, base_url, api_key=None, model=None):
+        self.http = http
+        self.url = f"{base_url.rstrip('/')}/v1/audio/speech"
+        self.headers = _bearer(api_key)
+        self.model = model or "tts-1"
+
+    async def stream(self, text, voice):
+        body = {"model": self.model, "voice": voice, "input": text, "response_format": "pcm"}
+        pending = b""
+        async with self.http.stream("POST", self.url, headers=self.headers, json=body) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                pending += chunk
+                usable = len(pending) - len(pending) % 6  # whole groups of three samples
+                if usable:
+                    yield self._downsample(pending[:usable])
+                    pending = pending[usable:]
+
+    @staticmethod
+    def _downsample(pcm):
+        samples = np.frombuffer(pcm, dtype="<i2").reshape(-1, 3)
+        return pcm_to_ulaw(samples.mean(axis=1).astype(np.int16)).tobytes()
+
+
+ASR_BACKENDS = {"whisper": WhisperASR}
+LLM_BACKENDS = {"openai": OpenAIChat}
+TTS_BACKENDS = {"elevenlabs": ElevenLabsTTS, "openai": OpenAITTS}
+
+
+def backend(kind, name, http, base_url, api_key=None, model=None):
+    """Build the `kind` ('asr', 'llm' or 'tts') backend called `name`."""
+    backends = {"asr": ASR_BACKENDS, "llm": LLM_BACKENDS, "tts": TTS_BACKENDS}[kind]
+    if name not in backends:
+        raise ValueError(f"Unknown {kind} backend {name!r}; expected one of {sorted(backends)}")
+    return backends[name](http, base_url, api_key, model)
+
+
+class SentenceChunker:
+    """Cuts streamed reply text into pieces worth one text-to-speech request each.
+
+    `push` returns the sentences a text delta completed. A sentence ends at
+    `.`, `!` or `?` before whitespace once it is `min_chars` long, except
+    after a title such as "Mr.". Past `max_chars`, a comma, semicolon or
+    colon ends it too, or failing that the last space, always within the
+    first `max_chars` characters so no piece is longer. With `enabled` off
+    everything waits for `flush`, which returns the rest of the text.
+    """
+
+    def __init__(self, enabled=True, min_chars=4, max_chars=200):
+        self.enabled = enabled
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._text = ""
+
+    def push(self, delta):
+        self._text += delta
+        out = []
+        while self.enabled:
+            cut = self._cut()
+            if cut is None:
+                break
+            sentence = self._text[:cut].strip()
+            self._text = self._text[cut:]
+            if sentence:
+                out.append(sentence)
+        return out
+
+    def _cut(self):
+        # A cut within the first max_chars + 1 characters leaves at most max_chars once stripped
+        head = self._text[:self.max_chars + 1]
+        for match in _SENTENCE_END.finditer(head):
+            if match.end() > self.min_chars and not self._after_title(match.start()):
+                return match.end()
+        if len(self._text) >= self.max_chars:
+            clauses = list(_CLAUSE_END.finditer(head))
+            if clauses:
+                return clauses[-1].end()
+            space = head.rfind(" ")
+            if space > 0:
+                return space + 1
+            return self.max_chars  # one word longer than a chunk
+        return None
+
+    def _after_title(self, end):
+        if self._text[end] != ".":
+            return False
+        words = self._text[:end].rsplit(None, 1)
+        return bool(words) and words[-1].lstrip("\"'([").lower() in _ABBREVIATIONS
+
+    def flush(self):
+        text, self._text = self._text.strip(), ""
+        return text or None
+
+
+class CascadeEngine:
+    """Answers caller turns with speech-to-text, a streamed chat model and text-to-speech.
+
+    Shared by every call; a call keeps its own conversation and passes it
+    to `reply`. `sentence_chunks` off synthesizes each reply in one request
+    once the model has finished it, for comparison. `tts_lookahead` bounds
+    how many sentences are synthesized ahead of the one playing.
+    """
+
+    def __init__(self, asr, llm, tts, http=None, sentence_chunks=True, tts_lookahead=2):
+        self.asr = asr
+        self.llm = llm
+        self.tts = tts
+        self.http = http
+        self.sentence_chunks = sentence_chunks
+        self.tts_lookahead = tts_lookahead
+
+    async def transcribe(self, audio):
+        started = time.monotonic()
+        try:
+            return (await self.asr.transcribe(audio)).strip()
+        finally:
+            ASR_LATENCY.observe(time.monotonic() - started)
+
+    async def speak(self, text, voice, play):
+        """Synthesize `text` and `await play(chunk)` for each piece of mu-law audio."""
+        started = time.monotonic()
+        first = True
+        async for chunk in self.tts.stream(text, voice):
+            if first:
+                TTS_FIRST_AUDIO.observe(time.monotonic() - started)
+                first = False
+            await play(chunk)
+
+    async def reply(self, messages, voice, play, spoken):
+        """Speak the model's answer to `messages` through `play` as it is generated.
+
+        Sentences go to text-to-speech as soon as the model completes them
+        and are played in order. Each one is appended to `spoken` once all
+        its audio has been played, so after an interruption `spoken` holds
+        only what was sent to the caller.
+        """
+        started = time.monotonic()
+        sentences = asyncio.Queue()  # (text, queue of audio chunks ending with None), in reply order
+        ahead = asyncio.Semaphore(self.tts_lookahead)
+        tasks = []
+
+        async def synthesize(text, audio):
+            tts_started = time.monotonic()
+            first = True
+            try:
+                async for chunk in self.tts.stream(text, voice):
+                    if first:
+                        TTS_FIRST_AUDIO.observe(time.monotonic() - tts_started)
+                        first = False
+                    audio.put_nowait(chunk)
+            except Exception as e:
+                print(f"Error synthesizing {text!r}: {e}")
+            finally:
+                audio.put_nowait(None)
+
+        async def queue_sentence(text):
+            await ahead.acquire()
+            audio = asyncio.Queue()
+            tasks.append(asyncio.create_task(synthesize(text, audio)))
+            sentences.put_nowait((text, audio))
+
+        async def generate():
+            chunker = SentenceChunker(self.sentence_chunks)
+            first = True
+            try:
+                async for delta in self.llm.stream(messages):
+                    if first:
+                        LLM_FIRST_TOKEN.observe(time.monotonic() - started)
+                        first = False
+                    for sentence in chunker.push(delta):
+                        await queue_sentence(sentence)
+                rest = chunker.flush()
+                if rest:
+                    await queue_sentence(rest)
+            finally:
+                sentences.put_nowait(None)
+
+        producer = asyncio.create_task(generate())
+        first_audio = True
+        try:
+            while (item := await sentences.get()) is not None:
+                text, audio = item
+                while (chunk := await audio.get()) is not None:
+                    if first_audio:
+                        REPLY_FIRST_AUDIO.observe(time.monotonic() - started)
+                        first_audio = False
+                    await play(chunk)
+                spoken.append(text)
+                ahead.release()
+            await producer  # raises if the model request failed
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+
+
+def http_client(max_connections=100, timeout=10.0):
+    """The pooled HTTP client the backends share."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=5.0),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
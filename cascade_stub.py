@@ -0,0 +1,114 @@
+# cascade_stub.py
+#
+# Local stand-in for the cascade engine's speech-to-text, chat and
+# text-to-speech services, for tests and benchmarks.
+#
+#   python cascade_stub.py --port 8700 --asr-ms 300 --first-token-ms 400
+#   ENGINE=cascade CASCADE_ASR_URL=http://localhost:8700 CASCADE_LLM_URL=http://localhost:8700 \
+#       CASCADE_TTS_URL=http://localhost:8700 python app.py
+#
+# Serves the OpenAI transcription, streamed chat completion and speech
+# endpoints and the ElevenLabs streaming endpoint. Every transcript is the
+# same caller question and every reply the same canned answer, streamed a
+# word at a time; speech is a tone as long as the text would take to say.
+
+import argparse
+import asyncio
+import json
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+from g711 import SAMPLE_RATE, pcm_to_ulaw
+
+TRANSCRIPT = "What time do you open tomorrow?"
+REPLY = ("Sure. We open at 7:30 tomorrow morning, and the last tee time is around 4 PM. "
+         "Would you like me to check what is available?")
+MS_PER_CHAR = 60  # roughly how long a character takes to say
+CHUNK_MS = 100
+
+
+def _tone(ms, rate):
+    t = np.arange(ms * rate // 1000) / rate
+    return (6000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def create_app(asr_ms=300, first_token_ms=400, token_ms=30, tts_ms=200, tts_speed=4.0):
+    """The stub services.
+
+    Speech-to-text answers after `asr_ms`. A chat reply's first word comes
+    `first_token_ms` after the request and the rest `token_ms` apart.
+    Speech starts `tts_ms` after the request and streams at `tts_speed`
+    times real time.
+    """
+    app = FastAPI()
+    app.state.requests = {"asr": 0, "llm": 0, "tts": 0}
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcribe(request: Request):
+        app.state.requests["asr"] += 1
+        await request.body()
+        await asyncio.sleep(asr_ms / 1000)
+        return {"text": TRANSCRIPT}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        app.state.requests["llm"] += 1
+        await request.json()
+
+        async def events():
+            await asyncio.sleep(first_token_ms / 1000)
+            words = REPLY.split(" ")
+            for n, word in enumerate(words):
+                if n:
+                    await asyncio.sleep(token_ms / 1000)
+                delta = {"choices": [{"index": 0, "delta": {"content": word if n == 0 else " " + word}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def speech(text, rate, encode):
+        app.state.requests["tts"] += 1
+        samples = _tone(len(text) * MS_PER_CHAR, rate)
+        audio = encode(samples)
+        step = rate * CHUNK_MS // 1000 * (len(audio) // len(samples))  # CHUNK_MS of audio
+        await asyncio.sleep(tts_ms / 1000)
+        for offset in range(0, len(audio), step):
+            if offset and tts_speed:
+                await asyncio.sleep(CHUNK_MS / 1000 / tts_speed)
+            yield audio[offset:offset + step]
+
+    @app.post("/v1/audio/speech")
+    async def openai_speech(request: Request):
+        body = await request.json()
+        return StreamingResponse(speech(body["input"], 24000, lambda pcm: pcm.astype("<i2").tobytes()),
+                                 media_type="audio/pcm")
+
+    @app.post("/v1/text-to-speech/{voice}/stream")
+    async def elevenlabs_speech(voice: str, request: Request):
+        body = await request.json()
+        return StreamingResponse(speech(body["text"], SAMPLE_RATE, lambda pcm: pcm_to_ulaw(pcm).tobytes()),
+                                 media_type="audio/basic")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub speech-to-text, chat and text-to-speech services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--asr-ms", type=int, default=300, help="speech-to-text latency")
+    parser.add_argument("--first-token-ms", type=int, default=400, help="chat latency to the first word")
+    parser.add_argument("--token-ms", type=int, default=30, help="gap between words of a reply")
+    parser.add_argument("--tts-ms", type=int, default=200, help="text-to-speech latency to the first audio")
+    parser.add_argument("--tts-speed", type=float, default=4.0, help="speech streams this many times real time")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.asr_ms, args.first_token_ms, args.token_ms, args.tts_ms, args.tts_speed),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# clip_cache.py
+#
+# Pre-rendered mu-law clips for prompts that never change within a
+# deployment, which today is each course's greeting. Anything that varies
+# from day to day (weather, availability) must come from the model instead.
+# Playing the greeting from here means the caller hears it while the
+# Realtime session is still being acquired, instead of after a model turn.
+#
+# Lookups during a call only touch the in-memory LRU. `warm` fills it from
+# disk, then S3, then by having a Realtime session speak the text, and writes
+# each clip back to the slower tiers so the next worker starts warm.
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import websockets
+
+from g711 import SAMPLE_RATE
+from metrics import REGISTRY
+
+CLIP_HITS = REGISTRY.counter("golfbot_clip_cache_hits_total", "Prompt clips played from the in-memory cache.")
+CLIP_MISSES = REGISTRY.counter("golfbot_clip_cache_misses_total", "Prompt clips not in the in-memory cache.")
+
+
+class Clip:
+    """One mu-law clip, with its Twilio media payloads encoded once."""
+
+    __slots__ = ("audio", "frames")
+
+    def __init__(self, audio, frame_bytes=800):
+        self.audio = audio
+        self.frames = [base64.b64encode(audio[i:i + frame_bytes]).decode("ascii")
+                       for i in range(0, len(audio), frame_bytes)]
+
+    def __len__(self):
+        return len(self.audio)
+
+    @property
+    def duration(self):
+        return len(self.audio) / SAMPLE_RATE
+
+
+async def render_clip(url, headers, voice, text):
+    """Have a Realtime session speak `text` in `voice`; returns the mu-law audio."""
+    async with websockets.connect(url, extra_headers=headers) as ws:
+        await ws.send(json.dumps({
+            "type": "session.update",
+            "session": {
+                "voice": voice,
+                "output_audio_format": "g711_ulaw",
+                "modalities": ["text", "audio"],
+                "instructions": "Read the user's message aloud exactly as written, with nothing added.",
+                "turn_detection": None,
+            }
+        }))
+        await ws.send(json.dumps({
+            "type": "conversation.item.create",
+            "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": text}]},
+        }))
+        await ws.send(json.dumps({"type": "response.create"}))
+        audio = bytearray()
+        async for message in ws:
+            event = json.loads(message)
+            if event.get("type") == "response.audio.delta":
+                audio += base64.b64decode(event["delta"])
+            elif event.get("type") == "response.done":
+                break
+            elif event.get("type") == "error":
+                raise RuntimeError(f"Realtime error while rendering a clip: {event.get('error')}")
+    return bytes(audio)
+
+
+class ClipCache:
+    """Prompt clips keyed by course, voice, prompt name and a digest of the text.
+
+    Keeping the text digest in the key means an edited prompt is rendered
+    again instead of playing the old audio. The in-memory tier holds at most
+    `max_bytes` of audio and evicts the least recently played clip.
+    """
+
+    def __init__(self, directory, max_bytes=8 * 1024 * 1024, frame_bytes=800,
+                 s3_client=None, bucket=None, prefix="clips/"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.frame_bytes = frame_bytes
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.bytes = 0
+        self._clips = OrderedDict()  # key -> Clip, least recently used first
+
+    @staticmethod
+    def _key(course, voice, name, text):
+        return (course, voice, name, hashlib.sha1(text.encode("utf-8")).hexdigest()[:12])
+
+    def _path(self, key):
+        course, voice, name, digest = key
+        return f"{course}/{voice}/{name}-{digest}.ulaw"
+
+    def get(self, course, voice, name, text):
+        """The clip for this prompt if it is in memory, else None."""
+        key = self._key(course, voice, name, text)
+        clip = self._clips.get(key)
+        if clip is None:
+            CLIP_MISSES.inc()
+            return None
+        self._clips.move_to_end(key)
+        CLIP_HITS.inc()
+        return clip
+
+    def _put(self, key, audio):
+        if key in self._clips:
+            self.bytes -= len(self._clips.pop(key))
+        clip = Clip(audio, self.frame_bytes)
+        self._clips[key] = clip
+        self.bytes += len(clip)
+        while self.bytes > self.max_bytes and len(self._clips) > 1:
+            _, evicted = self._clips.popitem(last=False)
+            self.bytes -= len(evicted)
+        return clip
+
+    def _read_disk(self, path):
+        try:
+            with open(os.path.join(self.directory, path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, path, audio):
+        full = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full + ".tmp", "wb") as f:
+            f.write(audio)
+        os.replace(full + ".tmp", full)
+
+    def _read_s3(self, path):
+        try:
+            return self.s3_client.get_object(Bucket=self.bucket, Key=self.prefix + path)["Body"].read()
+        except self.s3_client.exceptions.NoSuchKey:
+            return None
+
+    def _write_s3(self, path, audio):
+        self.s3_client.put_object(Bucket=self.bucket, Key=self.prefix + path, Body=audio)
+
+    async def warm(self, course, voice, prompts, render):
+        """Load every clip in `prompts` ({name: text}), rendering the missing ones with `render(voice, text)`."""
+        for name, text in prompts.items():
+            key = self._key(course, voice, name, text)
+            if key in self._clips:
+                continue
+            path = self._path(key)
+            try:
+                audio = await asyncio.to_thread(self._read_disk, path)
+                if audio is None and self.s3_client is not None:
+                    audio = await asyncio.to_thread(self._read_s3, path)
+                    if audio is not None:
+                        await asyncio.to_thread(self._write_disk, path, audio)
+                if audio is None:
+                    audio = await render(voice, text)
+                    if not audio:
+                        raise RuntimeError("no audio rendered")
+                    print(f"Rendered {name} clip for {course}/{voice}: {len(audio) / SAMPLE_RATE:.1f}s")
+                    await asyncio.to_thread(self._write_disk, path, audio)
+                    if self.s3_client is not None:
+                        await asyncio.to_thread(self._write_s3, path, audio)
+                self._put(key, audio)
+            except Exception as e:
+                print(f"Error loading {name} clip for {course}/{voice}: {e}")
@@ -1,38 +1,87 @@
+import argparse
 import wave
+
 import numpy as np
 
-def raw_to_wav(input_raw_file, output_wav_file, sample_rate=44100, num_channels=1, sample_width=2):
+from g711 import SAMPLE_RATE, ULAW_TO_PCM
+
+CHUNK_SAMPLES = 1 << 16  # samples per channel read at a time
+
+
+def raw_to_wav(input_raw_file, output_wav_file, sample_rate=SAMPLE_RATE, num_channels=1,
+               encoding="ulaw", chunk_samples=CHUNK_SAMPLES):
     """
-    Converts a raw audio file to WAV format.
+    Converts a raw audio recording to a 16-bit PCM WAV file.
+
+    The input is read in fixed-size chunks, so memory use does not depend
+    on the length of the recording.
 
     Parameters:
-        input_raw_file (str): Path to the input raw file.
-        output_wav_file (str): Path to the output WAV file.
-        sample_rate (int): Sampling rate of the audio (default: 44100).
-        num_channels (int): Number of audio channels (1 for mono, 2 for stereo).
-        sample_width (int): Sample width in bytes (2 for 16-bit audio).
+        input_raw_file (str or binary file): Raw recording to read.
+        output_wav_file (str or binary file): WAV file to write.
+        sample_rate (int): Sampling rate of the audio (default: 8000).
+        num_channels (int): Number of interleaved channels (2 for stereo recordings).
+        encoding (str): "ulaw" for G.711 mu-law as recorded by app.py,
+            "pcm16" for little-endian 16-bit samples.
+        chunk_samples (int): Samples per channel decoded per chunk.
 
+    Returns:
+        int: Number of frames (samples per channel) written.
     """
-    # Read the raw audio file
-    with open(input_raw_file, 'rb') as raw_file:
-        raw_data = raw_file.read()
-    
-    # Convert raw data to numpy array
-    audio_data = np.frombuffer(raw_data, dtype=np.int16)
-    
-    # Create the WAV file
-    with wave.open(output_wav_file, 'wb') as wav_file:
-        wav_file.setnchannels(num_channels)
-        wav_file.setsampwidth(sample_width)
-        wav_file.setframerate(sample_rate)
-        wav_file.writeframes(audio_data.tobytes())
-
-    print(f"Converted {input_raw_file} to {output_wav_file}.")
-
-# Example usage
-input_raw_file = "/Users/sanatmouli/Desktop/input.raw"
-output_wav_file = "/Users/sanatmouli/downloads/output.wav"
-sample_rate = 8000
-num_channels = 1
-sample_width = 1
-raw_to_wav(input_raw_file, output_wav_file, )
+    if encoding not in ("ulaw", "pcm16"):
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    sample_width = 1 if encoding == "ulaw" else 2
+    frame_bytes = sample_width * num_channels
+    chunk_bytes = chunk_samples * frame_bytes
+
+    raw_file = open(input_raw_file, 'rb') if isinstance(input_raw_file, str) else input_raw_file
+    try:
+        with wave.open(output_wav_file, 'wb') as wav_file:
+            wav_file.setnchannels(num_channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+
+            frames = 0
+            leftover = b""
+            while True:
+                data = raw_file.read(chunk_bytes)
+                if not data:
+                    break
+                if leftover:
+                    data = leftover + data
+                # Only whole frames; a split frame waits for the next read
+                usable = len(data) - len(data) % frame_bytes
+                leftover = data[usable:]
+                if encoding == "ulaw":
+                    samples = ULAW_TO_PCM[np.frombuffer(data, dtype=np.uint8, count=usable)]
+                else:
+                    samples = np.frombuffer(data, dtype='<i2', count=usable // 2)
+                wav_file.writeframes(samples.astype('<i2', copy=False).tobytes())
+                frames += usable // frame_bytes
+    finally:
+        if raw_file is not input_raw_file:
+            raw_file.close()
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a raw call recording to WAV.")
+    parser.add_argument("input_raw_file")
+    parser.add_argument("output_wav_file")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--channels", type=int, default=None,
+                        help="default: 2 for *_stereo_audio.raw recordings, else 1")
+    parser.add_argument("--encoding", choices=("ulaw", "pcm16"), default="ulaw")
+    args = parser.parse_args(argv)
+
+    num_channels = args.channels
+    if num_channels is None:
+        num_channels = 2 if args.input_raw_file.endswith("_stereo_audio.raw") else 1
+    frames = raw_to_wav(args.input_raw_file, args.output_wav_file, sample_rate=args.sample_rate,
+                        num_channels=num_channels, encoding=args.encoding)
+    print(f"Converted {args.input_raw_file} to {args.output_wav_file} "
+          f"({frames / args.sample_rate:.1f}s, {num_channels} channel(s)).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# courses.py
+#
+# Per-course configuration, so one worker pool can answer for many courses.
+# Courses come from a JSON file and are compiled once into everything a call
+# sends (session.update, greeting items, TwiML), so answering a call costs a
+# dict lookup. The file is polled for changes and swapped in whole.
+#
+# {
+#   "default": "fremont-park",
+#   "courses": [
+#     {"id": "fremont-park", "name": "Fremont Park Golf Course",
+#      "numbers": ["+15105550100"], "instructions": "...", "voice": "alloy",
+#      "greeting": "...", "bucket": "...",
+#      "golfnow_course_id": "...", "engine": "realtime"}
+#   ]
+# }
+
+import asyncio
+import json
+import os
+from urllib.parse import quote
+
+from twilio.twiml.voice_response import VoiceResponse, Connect
+
+_HOST = "__HOST__"
+
+
+class Course:
+    """One course, with the messages and TwiML for its calls pre-serialized."""
+
+    __slots__ = ("id", "name", "numbers", "voice", "greeting", "bucket", "golfnow_course_id",
+                 "engine", "instructions", "setup_messages", "greeting_played", "_twiml")
+
+    def __init__(self, id, name, instructions, greeting, voice="alloy", numbers=(),
+                 bucket=None, golfnow_course_id=None, tools=None, tool_instructions="", say="Hello",
+                 engine="realtime"):
+        self.id = id
+        self.name = name
+        self.numbers = tuple(numbers)
+        self.voice = voice
+        self.greeting = greeting
+        self.bucket = bucket
+        self.golfnow_course_id = golfnow_course_id
+        self.engine = engine  # 'realtime' or 'cascade'
+        self.instructions = instructions  # the cascade engine's system prompt
+
+        session = {"voice": voice, "instructions": instructions}
+        if tools and golfnow_course_id:
+            session["tools"] = tools
+            session["tool_choice"] = "auto"
+            session["instructions"] += tool_instructions
+        # Sent when a call takes a session, with the greeting queued behind it
+        self.setup_messages = [
+            json.dumps({"type": "session.update", "session": session}),
+            json.dumps({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "message",
+                    "role": "user",
+                    "content": [{"type": "input_text", "text": f"Greet the user with '{greeting}'"}],
+                }
+            }),
+        ]
+        # Tells the model the cached greeting clip has already been played
+        self.greeting_played = json.dumps({
+            "type": "conversation.item.create",
+            "item": {"type": "message", "role": "assistant", "content": [{"type": "text", "text": greeting}]},
+        })
+
+        response = VoiceResponse()
+        response.say(say)
+        connect = Connect()
+        connect.stream(url=f"wss://{_HOST}/media-stream/{quote(id, safe='')}")
+        response.append(connect)
+        self._twiml = str(response).split(_HOST)
+
+    def twiml(self, host):
+        """TwiML connecting a call to this course's media stream on `host`."""
+        return self._twiml[0] + host + self._twiml[1]
+
+
+class CourseRegistry:
+    """Courses by id and by called number, reloaded when the config file changes.
+
+    `default` answers numbers the file does not list, and is the only course
+    if there is no file. `defaults` are merged into every course entry.
+    `on_reload(registry)` runs after each successful reload.
+    """
+
+    def __init__(self, path, default, defaults=None, poll_interval=5.0, on_reload=None):
+        self.path = path
+        self.default = default
+        self.defaults = defaults or {}
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+        self.by_id = {default.id: default}
+        self.by_number = {}
+        self.reloads = 0
+        self._mtime = None
+        self._task = None
+
+    def courses(self):
+        return list(self.by_id.values())
+
+    def get(self, course_id):
+        return self.by_id.get(course_id, self.default)
+
+    def for_number(self, number):
+        return self.by_number.get(number, self.default)
+
+    def load(self):
+        """Reload the file if it changed. Returns whether the registry changed."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            with open(self.path) as f:
+                config = json.load(f)
+            by_id = {}
+            for entry in config["courses"]:
+                course = Course(**{**self.defaults, **entry})
+                by_id[course.id] = course
+        except Exception as e:
+            print(f"Error loading courses from {self.path}, keeping the previous config: {e}")
+            return False
+        by_number = {number: course for course in by_id.values() for number in course.numbers}
+        default = by_id.get(config.get("default"), self.default)
+        by_id.setdefault(default.id, default)
+        # Swap in whole so a call never sees half a reload
+        self.by_id, self.by_number, self.default = by_id, by_number, default
+        self.reloads += 1
+        print(f"Loaded {len(by_id)} courses from {self.path}")
+        return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if await asyncio.to_thread(self.load) and self.on_reload is not None:
+                self.on_reload(self)
@@ -0,0 +1,50 @@
+# g711.py
+#
+# G.711 mu-law codec on NumPy arrays, using lookup tables in both directions.
+# Twilio media streams and the Realtime API's g711_ulaw format both carry
+# 8 kHz mono, one mu-law byte per sample.
+
+import numpy as np
+
+SAMPLE_RATE = 8000
+ULAW_SILENCE = 0xFF
+
+_BIAS = 0x84
+_CLIP = 32635
+
+
+def _build_decode_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + _BIAS) << exponent) - _BIAS
+    return np.where(u & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_encode_table():
+    # Same rounding as the reference G.711 encoder: work on 14-bit samples
+    pcm = np.arange(-32768, 32768, dtype=np.int32) >> 2
+    magnitude = np.minimum(np.abs(pcm), _CLIP >> 2) + (_BIAS >> 2)
+    # Position of the highest set bit above bit 5 is the segment
+    segment = np.floor(np.log2(magnitude)).astype(np.int32) - 5
+    mantissa = (magnitude >> (segment + 1)) & 0x0F
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    return (((segment << 4) | mantissa) ^ mask).astype(np.uint8)
+
+
+ULAW_TO_PCM = _build_decode_table()
+PCM_TO_ULAW = _build_encode_table()  # indexed by sample + 32768
+# Squared sample values, so frame energy is one lookup and a mean
+ULAW_ENERGY = ULAW_TO_PCM.astype(np.float32) ** 2
+
+
+def ulaw_to_pcm(data):
+    """Decode mu-law bytes (or a uint8 array) to a PCM16 NumPy array."""
+    return ULAW_TO_PCM[np.frombuffer(data, dtype=np.uint8)]
+
+
+def pcm_to_ulaw(samples):
+    """Encode PCM16 samples (array or bytes) to a uint8 mu-law NumPy array."""
+    if not isinstance(samples, np.ndarray):
+        samples = np.frombuffer(samples, dtype=np.int16)
+    return PCM_TO_ULAW[samples.astype(np.int32) + 32768]
@@ -0,0 +1,260 @@
+# golfnow.py
+#
+# Tee-time availability and booking through GolfNow, exposed to the Realtime
+# session as function tools. Availability is answered from an in-memory index
+# that a background task keeps fresh, so a tool call costs a dict lookup and a
+# bisect instead of an upstream round trip.
+#
+# The endpoint shapes used here are the ones golfnow_stub.py serves.
+
+import asyncio
+import json
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+import httpx
+
+from metrics import REGISTRY
+
+CACHE_HITS = REGISTRY.counter("golfbot_teetime_cache_hits_total", "Availability lookups answered from the cache.")
+CACHE_MISSES = REGISTRY.counter(
+    "golfbot_teetime_cache_misses_total", "Availability lookups that had to wait for GolfNow.")
+UPSTREAM_LATENCY = REGISTRY.histogram("golfbot_golfnow_request_seconds", "Time for one GolfNow API request.")
+TOOL_LATENCY = REGISTRY.histogram("golfbot_tool_call_seconds", "Time to answer one realtime function call.")
+
+# Function tools for `session.update`
+TOOLS = [
+    {
+        "type": "function",
+        "name": "check_tee_times",
+        "description": "List open tee times on a day, optionally within a time window and for a group size.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "date": {"type": "string", "description": "'today', 'tomorrow' or YYYY-MM-DD"},
+                "earliest": {"type": "string", "description": "Earliest start, 24h HH:MM"},
+                "latest": {"type": "string", "description": "Latest start, 24h HH:MM"},
+                "players": {"type": "integer", "description": "Number of golfers, 1 to 4"},
+            },
+            "required": ["date"],
+        },
+    },
+    {
+        "type": "function",
+        "name": "book_tee_time",
+        "description": "Book a tee time returned by check_tee_times.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "tee_time_id": {"type": "string"},
+                "players": {"type": "integer"},
+                "name": {"type": "string", "description": "Name the booking is under"},
+            },
+            "required": ["tee_time_id", "players", "name"],
+        },
+    },
+]
+# Appended to a course's instructions when its session has the tools
+TOOL_INSTRUCTIONS = (
+    " Use check_tee_times to look up open tee times and book_tee_time to book one"
+    " once the caller has confirmed the time, group size and name."
+)
+
+
+def _minute(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_day(value, today=None):
+    """'today', 'tomorrow' or an ISO date, as a `date`."""
+    today = today or date.today()
+    value = (value or "today").strip().lower()
+    if value == "today":
+        return today
+    if value == "tomorrow":
+        return today + timedelta(days=1)
+    return date.fromisoformat(value)
+
+
+class GolfNowClient:
+    """Async GolfNow API client over one pooled HTTP connection set."""
+
+    def __init__(self, base_url, api_key=None, timeout=5.0, max_connections=20):
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections),
+        )
+
+    async def _request(self, method, path, **kwargs):
+        started = time.monotonic()
+        try:
+            response = await self._http.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        finally:
+            UPSTREAM_LATENCY.observe(time.monotonic() - started)
+
+    async def tee_times(self, course_id, day):
+        """Every tee time on `day`: [{"id", "time": "HH:MM", "players", "price"}]."""
+        data = await self._request("GET", f"/courses/{course_id}/tee-times", params={"date": day.isoformat()})
+        return data["tee_times"]
+
+    async def book(self, course_id, tee_time_id, players, name):
+        return await self._request(
+            "POST",
+            f"/courses/{course_id}/bookings",
+            json={"tee_time_id": tee_time_id, "players": players, "name": name},
+        )
+
+    async def close(self):
+        await self._http.aclose()
+
+
+class _Day:
+    """Tee times for one course and date, sorted by start time for range lookups."""
+
+    __slots__ = ("fetched", "minutes", "slots", "by_id")
+
+    def __init__(self, slots, fetched):
+        self.slots = sorted(slots, key=lambda slot: _minute(slot["time"]))
+        self.minutes = [_minute(slot["time"]) for slot in self.slots]
+        self.by_id = {slot["id"]: slot for slot in self.slots}
+        self.fetched = fetched
+
+
+class TeeTimeCache:
+    """Tee-time availability per (course, date), indexed by start time.
+
+    A background task refetches the next `days_ahead` days of every course
+    in `course_ids` every `refresh_interval` seconds. Any other day is
+    fetched on first use. Entries older than `ttl` are evicted. A lookup
+    that misses waits for one upstream fetch, shared by every concurrent
+    lookup of the same day.
+    """
+
+    def __init__(self, client, course_ids, days_ahead=7, refresh_interval=60, ttl=300):
+        self.client = client
+        self.course_ids = list(course_ids)
+        self.days_ahead = days_ahead
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self._days = {}  # (course id, date) -> _Day
+        self._inflight = {}  # (course id, date) -> task fetching it
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            today = date.today()
+            keys = [(course_id, today + timedelta(days=n))
+                    for course_id in self.course_ids for n in range(self.days_ahead)]
+            results = await asyncio.gather(*(self._fetch(key) for key in keys), return_exceptions=True)
+            for key, result in zip(keys, results):
+                if isinstance(result, Exception):
+                    print(f"Error refreshing tee times for {key[0]} on {key[1]}: {result}")
+            self._evict(today)
+            await asyncio.sleep(self.refresh_interval)
+
+    def _evict(self, today):
+        now = time.monotonic()
+        for key, entry in list(self._days.items()):
+            if key[1] < today or now - entry.fetched > self.ttl:
+                del self._days[key]
+
+    def _fetch(self, key):
+        """Fetch one day from GolfNow, joining a fetch already in flight for it."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A cancelled caller must not cancel the fetch other callers share
+        return asyncio.shield(task)
+
+    async def _load(self, key):
+        slots = await self.client.tee_times(*key)
+        entry = _Day(slots, time.monotonic())
+        self._days[key] = entry
+        return entry
+
+    async def day(self, course_id, day):
+        entry = self._days.get((course_id, day))
+        if entry is not None and time.monotonic() - entry.fetched <= self.ttl:
+            CACHE_HITS.inc()
+            return entry
+        CACHE_MISSES.inc()
+        return await self._fetch((course_id, day))
+
+    async def available(self, course_id, day, earliest="00:00", latest="23:59", players=1, limit=5):
+        """Up to `limit` tee times starting in [earliest, latest] with room for `players`."""
+        entry = await self.day(course_id, day)
+        lo = bisect_left(entry.minutes, _minute(earliest))
+        hi = bisect_right(entry.minutes, _minute(latest))
+        found = []
+        for slot in entry.slots[lo:hi]:
+            if slot["players"] >= players:
+                found.append(slot)
+                if len(found) == limit:
+                    break
+        return found
+
+    def booked(self, course_id, day, tee_time_id, players):
+        """Take booked spots out of the cached day until the next refresh replaces it."""
+        entry = self._days.get((course_id, day))
+        if entry is not None and tee_time_id in entry.by_id:
+            slot = entry.by_id[tee_time_id]
+            slot["players"] = max(slot["players"] - players, 0)
+
+
+class TeeTimeTools:
+    """Runs the realtime function calls in `TOOLS` for one course."""
+
+    def __init__(self, cache, client, course_id):
+        self.cache = cache
+        self.client = client
+        self.course_id = course_id
+
+    async def call(self, name, arguments):
+        """Run tool `name` with its JSON `arguments`; errors become an `error` result for the model."""
+        started = time.monotonic()
+        try:
+            args = json.loads(arguments or "{}")
+            if name == "check_tee_times":
+                return await self.check_tee_times(**args)
+            if name == "book_tee_time":
+                return await self.book_tee_time(**args)
+            return {"error": f"unknown tool {name}"}
+        except Exception as e:
+            print(f"Error in tool {name}: {e}")
+            return {"error": str(e)}
+        finally:
+            TOOL_LATENCY.observe(time.monotonic() - started)
+
+    async def check_tee_times(self, date, earliest="00:00", latest="23:59", players=1):
+        day = parse_day(date)
+        slots = await self.cache.available(self.course_id, day, earliest, latest, players)
+        return {
+            "date": day.isoformat(),
+            "tee_times": [{"tee_time_id": s["id"], "time": s["time"], "open_spots": s["players"],
+                           "price": s["price"]} for s in slots],
+        }
+
+    async def book_tee_time(self, tee_time_id, players, name):
+        # Bookings always go to GolfNow; only availability is served from the cache
+        result = await self.client.book(self.course_id, tee_time_id, players, name)
+        day = parse_day(result.get("date")) if result.get("date") else None
+        if day is not None:
+            self.cache.booked(self.course_id, day, tee_time_id, players)
+        return result
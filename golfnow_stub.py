@@ -0,0 +1,103 @@
+# golfnow_stub.py
+#
+# Local stand-in for the GolfNow tee-time API, for tests and benchmarks.
+#
+#   python golfnow_stub.py --port 8600 --latency-ms 400
+#   GOLFNOW_API_URL=http://localhost:8600 python app.py
+#
+# Every course has a tee time every 10 minutes from 07:30 to 16:00 with a
+# deterministic number of open spots; bookings take spots away.
+
+import argparse
+import asyncio
+import hashlib
+import itertools
+from datetime import date, datetime, timedelta
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+FIRST_TEE = "07:30"
+LAST_TEE = "16:00"
+INTERVAL_MINUTES = 10
+
+
+class Booking(BaseModel):
+    tee_time_id: str
+    players: int
+    name: str
+
+
+def _open_spots(tee_time_id):
+    return hashlib.sha1(tee_time_id.encode()).digest()[0] % 5  # 0 to 4
+
+
+def create_app(latency_ms=0):
+    """The stub API. Each request sleeps `latency_ms` first, like a slow upstream."""
+    app = FastAPI()
+    booked = {}  # tee time id -> spots taken
+    confirmations = itertools.count(1)
+    app.state.requests = 0
+
+    async def upstream_delay():
+        app.state.requests += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    def tee_times(course_id, day):
+        slot = datetime.combine(day, datetime.strptime(FIRST_TEE, "%H:%M").time())
+        last = datetime.combine(day, datetime.strptime(LAST_TEE, "%H:%M").time())
+        slots = []
+        while slot <= last:
+            tee_time_id = f"{course_id}-{slot:%Y%m%d%H%M}"
+            slots.append({
+                "id": tee_time_id,
+                "time": f"{slot:%H:%M}",
+                "players": max(_open_spots(tee_time_id) - booked.get(tee_time_id, 0), 0),
+                "price": 35.0 if slot.hour >= 14 else 55.0,  # twilight rate
+            })
+            slot += timedelta(minutes=INTERVAL_MINUTES)
+        return slots
+
+    @app.get("/courses/{course_id}/tee-times")
+    async def list_tee_times(course_id: str, date: date):
+        await upstream_delay()
+        return {"course_id": course_id, "date": date.isoformat(), "tee_times": tee_times(course_id, date)}
+
+    @app.post("/courses/{course_id}/bookings")
+    async def book(course_id: str, booking: Booking):
+        await upstream_delay()
+        try:
+            when = datetime.strptime(booking.tee_time_id.rsplit("-", 1)[1], "%Y%m%d%H%M")
+        except (IndexError, ValueError):
+            raise HTTPException(status_code=404, detail="unknown tee time")
+        slot = next((s for s in tee_times(course_id, when.date()) if s["id"] == booking.tee_time_id), None)
+        if slot is None:
+            raise HTTPException(status_code=404, detail="unknown tee time")
+        if slot["players"] < booking.players:
+            raise HTTPException(status_code=409, detail="not enough open spots")
+        booked[booking.tee_time_id] = booked.get(booking.tee_time_id, 0) + booking.players
+        return {
+            "confirmation": f"GN{next(confirmations):08d}",
+            "tee_time_id": booking.tee_time_id,
+            "date": when.date().isoformat(),
+            "time": slot["time"],
+            "players": booking.players,
+            "name": booking.name,
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub GolfNow tee-time API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency-ms", type=int, default=400, help="delay added to every request")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# loop_watchdog.py
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import types
+
+from metrics import REGISTRY
+
+LOOP_LAG = REGISTRY.histogram(
+    "golfbot_event_loop_lag_seconds",
+    "How late the watchdog heartbeat woke up compared to its schedule.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+LOOP_STALLS = REGISTRY.counter(
+    "golfbot_event_loop_stalls_total", "Times the event loop was blocked past the watchdog threshold.")
+
+
+def handler_codes(*functions):
+    """Code objects of `functions` and of the functions defined inside them, for `LoopWatchdog`.
+
+    A call's closures have no module-level name, but their code objects are
+    constants of the enclosing function's. Comprehensions and lambdas are
+    left out, so a stall in one is blamed on the function around it.
+    """
+    codes = set()
+    pending = [function.__code__ for function in functions]
+    while pending:
+        code = pending.pop()
+        if code in codes:
+            continue
+        codes.add(code)
+        pending.extend(const for const in code.co_consts
+                       if isinstance(const, types.CodeType) and not const.co_name.startswith("<"))
+    return frozenset(codes)
+
+
+def _name(code):
+    return getattr(code, "co_qualname", code.co_name)
+
+
+class LoopWatchdog:
+    """Measures event-loop lag and reports what blocked the loop.
+
+    A heartbeat coroutine wakes every `interval` seconds and records how late
+    it was. A monitor thread checks the heartbeat; when it is older than
+    `threshold` the loop is stuck in synchronous code, so the thread grabs
+    the loop thread's current stack and names the handler responsible (the
+    innermost frame running one of the code objects in `handlers`, see
+    `handler_codes`). One report per stall.
+    The heartbeat alone is cheap enough to leave on for the `lag` reading;
+    `start(monitor=False)` skips the thread.
+    """
+
+    def __init__(self, handlers=(), interval=0.1, threshold=0.05, report=print):
+        self.handlers = frozenset(handlers)
+        self.interval = interval
+        self.threshold = threshold
+        self.report = report
+        self.stalls = {}  # handler name -> number of stalls it caused
+        self.lag = 0.0  # smoothed heartbeat lateness, in seconds
+        self._beat = time.monotonic()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(now - expected, 0.0)
+            LOOP_LAG.observe(lag)
+            self.lag = max(lag, 0.7 * self.lag + 0.3 * lag)  # rises at once, decays over ~1s
+
+    def _blamed(self, frame):
+        """Name of the handler on the stack, else the first non-asyncio frame."""
+        fallback = None
+        while frame is not None:
+            code = frame.f_code
+            if code in self.handlers:
+                return _name(code)
+            if fallback is None and "asyncio" not in code.co_filename:
+                fallback = f"{_name(code)} ({code.co_filename}:{frame.f_lineno})"
+            frame = frame.f_back
+        return fallback or "unknown"
+
+    def _monitor(self):
+        reported = None
+        while not self._stopped.wait(self.interval / 2):
+            beat = self._beat
+            stalled_for = time.monotonic() - beat - self.interval
+            if stalled_for < self.threshold or beat == reported:
+                continue
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            handler = self._blamed(frame)
+            self.stalls[handler] = self.stalls.get(handler, 0) + 1
+            LOOP_STALLS.inc()
+            stack = "".join(traceback.format_stack(frame, limit=12))
+            self.report(f"Event loop blocked for {stalled_for * 1000:.0f}ms+ in {handler}:\n{stack}")
+
+    def start(self, monitor=True):
+        """Start watching the running event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        if monitor:
+            self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
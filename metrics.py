@@ -0,0 +1,296 @@
+# metrics.py
+#
+# Low-overhead latency histograms rendered in the Prometheus text format.
+# Observing a value only bumps preallocated counters, so it is safe to call
+# from the per-frame path.
+
+from bisect import bisect_left
+
+# Seconds; covers sub-millisecond socket sends up to multi-second S3 uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.02, 0.04, 0.08, 0.16,
+                   0.32, 0.64, 1.28, 2.56, 5.12, 10.24)
+
+
+class Histogram:
+    __slots__ = ("name", "help", "buckets", "counts", "sum", "count")
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class Counter:
+    __slots__ = ("name", "help", "value")
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+class LabeledCounter:
+    """A counter split by the value of one label."""
+
+    __slots__ = ("name", "help", "label", "values")
+    kind = "counter"
+
+    def __init__(self, name, help, label):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values = {}
+
+    def inc(self, label_value, amount=1):
+        self.values[label_value] = self.values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_value, value in self.values.items():
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+
+class LabeledGauge(LabeledCounter):
+    """A gauge split by the value of one label."""
+
+    __slots__ = ()
+    kind = "gauge"
+
+    def dec(self, label_value, amount=1):
+        self.values[label_value] = self.values.get(label_value, 0) - amount
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value")
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+class Callback:
+    """A counter or gauge read from `fn()` at scrape time."""
+
+    def __init__(self, name, help, fn, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {value}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, buckets))
+
+    def counter(self, name, help):
+        return self._add(Counter(name, help))
+
+    def labeled_counter(self, name, help, label):
+        return self._add(LabeledCounter(name, help, label))
+
+    def labeled_gauge(self, name, help, label):
+        return self._add(LabeledGauge(name, help, label))
+
+    def gauge(self, name, help):
+        return self._add(Gauge(name, help))
+
+    def callback(self, name, help, fn, kind="gauge"):
+        return self._add(Callback(name, help, fn, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CALLS = REGISTRY.counter("golfbot_calls_total", "Media streams accepted.")
+COURSE_CALLS = REGISTRY.labeled_counter("golfbot_course_calls_total", "Media streams accepted, by course.", "course")
+ACTIVE_CALLS = REGISTRY.gauge("golfbot_active_calls", "Media streams currently open.")
+TIME_TO_FIRST_AUDIO = REGISTRY.histogram(
+    "golfbot_time_to_first_audio_seconds",
+    "WebSocket accept to first outbound audio frame.")
+TIME_TO_FIRST_AUDIO_CACHED = REGISTRY.histogram(
+    "golfbot_time_to_first_audio_cached_greeting_seconds",
+    "WebSocket accept to first outbound audio frame, for calls greeted from the clip cache.")
+RESPONSE_LATENCY = REGISTRY.histogram(
+    "golfbot_response_latency_seconds",
+    "input_audio_buffer.speech_stopped to the first response.audio.delta.")
+INBOUND_JITTER = REGISTRY.histogram(
+    "golfbot_inbound_frame_jitter_seconds",
+    "Deviation of the gap between inbound Twilio media frames from 20 ms.",
+    buckets=(0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0))
+TWILIO_SEND = REGISTRY.histogram("golfbot_twilio_send_seconds", "Time to send one message to Twilio.")
+OPENAI_SEND = REGISTRY.histogram("golfbot_openai_send_seconds", "Time to send one message to OpenAI.")
+UPLOAD_LAG = REGISTRY.histogram(
+    "golfbot_upload_lag_seconds",
+    "Recording part handed to the uploader to part stored in S3.")
+
+FRAME_INTERVAL = 0.02  # Twilio sends one media frame every 20 ms
+
+
+class CallMetrics:
+    """Latency measurements for one call.
+
+    Feeds the process-wide histograms and keeps the per-call maxima and
+    totals needed for `summary`, all in fixed slots.
+    """
+
+    __slots__ = ("accepted", "greeting_cached", "first_audio", "speech_stopped", "last_frame", "frames",
+                 "jitter_max", "jitter_sum", "responses", "response_max", "response_sum",
+                 "twilio_sends", "twilio_send_max", "twilio_send_sum",
+                 "openai_sends", "openai_send_max", "openai_send_sum")
+
+    def __init__(self, accepted):
+        self.accepted = accepted
+        self.greeting_cached = False
+        self.first_audio = None
+        self.speech_stopped = None
+        self.last_frame = None
+        self.frames = 0
+        self.jitter_max = 0.0
+        self.jitter_sum = 0.0
+        self.responses = 0
+        self.response_max = 0.0
+        self.response_sum = 0.0
+        self.twilio_sends = 0
+        self.twilio_send_max = 0.0
+        self.twilio_send_sum = 0.0
+        self.openai_sends = 0
+        self.openai_send_max = 0.0
+        self.openai_send_sum = 0.0
+
+    def frame_received(self, now):
+        if self.last_frame is not None:
+            jitter = abs(now - self.last_frame - FRAME_INTERVAL)
+            INBOUND_JITTER.observe(jitter)
+            self.jitter_sum += jitter
+            if jitter > self.jitter_max:
+                self.jitter_max = jitter
+        self.last_frame = now
+        self.frames += 1
+
+    def user_stopped_speaking(self, now):
+        self.speech_stopped = now
+
+    def audio_sent(self, now):
+        if self.first_audio is None:
+            self.first_audio = now
+            if self.greeting_cached:
+                TIME_TO_FIRST_AUDIO_CACHED.observe(now - self.accepted)
+            else:
+                TIME_TO_FIRST_AUDIO.observe(now - self.accepted)
+        if self.speech_stopped is not None:
+            latency = now - self.speech_stopped
+            self.speech_stopped = None
+            RESPONSE_LATENCY.observe(latency)
+            self.responses += 1
+            self.response_sum += latency
+            if latency > self.response_max:
+                self.response_max = latency
+
+    def twilio_sent(self, seconds):
+        TWILIO_SEND.observe(seconds)
+        self.twilio_sends += 1
+        self.twilio_send_sum += seconds
+        if seconds > self.twilio_send_max:
+            self.twilio_send_max = seconds
+
+    def openai_sent(self, seconds):
+        OPENAI_SEND.observe(seconds)
+        self.openai_sends += 1
+        self.openai_send_sum += seconds
+        if seconds > self.openai_send_max:
+            self.openai_send_max = seconds
+
+    def stats(self):
+        """The numbers in `summary`, in milliseconds, for structured logging."""
+        def ms(seconds):
+            return round(seconds * 1000, 1)
+
+        return {
+            "first_audio_ms": ms(self.first_audio - self.accepted) if self.first_audio is not None else None,
+            "greeting_cached": self.greeting_cached,
+            "responses": self.responses,
+            "response_avg_ms": ms(self.response_sum / self.responses) if self.responses else None,
+            "response_max_ms": ms(self.response_max),
+            "frames": self.frames,
+            "jitter_max_ms": ms(self.jitter_max),
+        }
+
+    def summary(self):
+        def ms(seconds):
+            return f"{seconds * 1000:.1f}ms"
+
+        def avg(total, n):
+            return ms(total / n) if n else "-"
+
+        first = ms(self.first_audio - self.accepted) if self.first_audio is not None else "-"
+        if self.greeting_cached:
+            first += " (cached greeting)"
+        return (
+            f"first audio {first}, "
+            f"response latency avg {avg(self.response_sum, self.responses)} max {ms(self.response_max)} "
+            f"over {self.responses}, "
+            f"inbound jitter avg {avg(self.jitter_sum, self.frames - 1 if self.frames else 0)} "
+            f"max {ms(self.jitter_max)} over {self.frames} frames, "
+            f"twilio send avg {avg(self.twilio_send_sum, self.twilio_sends)} max {ms(self.twilio_send_max)}, "
+            f"openai send avg {avg(self.openai_send_sum, self.openai_sends)} max {ms(self.openai_send_max)}"
+        )
@@ -0,0 +1,178 @@
+# mock_realtime.py
+#
+# Local stand-in for the OpenAI Realtime API, for tests and benchmarks.
+#
+#   python mock_realtime.py --port 9000
+#   OPENAI_REALTIME_URL=ws://localhost:9000 python app.py
+
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+
+import numpy as np
+import websockets
+
+from g711 import SAMPLE_RATE, pcm_to_ulaw
+
+
+def _tone(ms, freq=440):
+    """A mu-law encoded sine tone, so replies are audible when debugging."""
+    t = np.arange(ms * SAMPLE_RATE // 1000) / SAMPLE_RATE
+    return pcm_to_ulaw((8000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)).tobytes()
+
+
+class MockRealtimeServer:
+    """Answers every `response.create` with `reply_ms` of audio deltas.
+
+    Deltas are sent `delta_ms` of audio at a time, paced at `speed` times
+    real time (0 sends them as fast as possible), the first one
+    `response_delay_ms` after `response.created` to stand in for model time. `reply` replaces the tone
+    with recorded mu-law audio. With `turn_ms` set it also plays server VAD:
+    after every `turn_ms` of appended caller audio it sends
+    `speech_started`, `speech_stopped` and `committed`, then responds.
+    With `tool_call` set to (name, arguments JSON), the first caller turn of
+    each session is answered with that function call instead of audio.
+    Each caller turn and reply also gets a placeholder transcript event.
+    Counts what it receives, and keeps function call outputs in
+    `tool_outputs`, so tests can assert on it.
+    """
+
+    def __init__(self, reply_ms=2000, delta_ms=100, speed=1.0, turn_ms=0, reply=None, tool_call=None,
+                 response_delay_ms=0):
+        self.reply_ms = reply_ms
+        self.delta_ms = delta_ms
+        self.speed = speed
+        self.turn_ms = turn_ms
+        self.tool_call = tool_call
+        self.response_delay_ms = response_delay_ms
+        self.tool_outputs = []
+        self.sessions = 0
+        self.received = {}
+        self.appended_ms = 0
+        self._reply = reply if reply is not None else _tone(reply_ms)
+        self._ids = itertools.count(1)
+
+    async def handler(self, ws, path=None):
+        self.sessions += 1
+        await ws.send(json.dumps({"type": "session.created", "session": {"id": f"sess_{self.sessions}"}}))
+        responding = None
+        heard_ms = 0
+        tool_called = False
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                kind = event.get("type")
+                self.received[kind] = self.received.get(kind, 0) + 1
+                if kind == "input_audio_buffer.append":
+                    ms = len(event.get("audio", "")) * 3 // 4 // 8
+                    self.appended_ms += ms
+                    heard_ms += ms
+                    if self.turn_ms and heard_ms >= self.turn_ms:
+                        heard_ms -= self.turn_ms
+                        for vad_event in ("input_audio_buffer.speech_started",
+                                          "input_audio_buffer.speech_stopped",
+                                          "input_audio_buffer.committed"):
+                            await ws.send(json.dumps({"type": vad_event}))
+                        await ws.send(json.dumps({
+                            "type": "conversation.item.input_audio_transcription.completed",
+                            "item_id": f"input_{next(self._ids)}",
+                            "content_index": 0,
+                            "transcript": "(mock caller turn)",
+                        }))
+                        if responding is not None:
+                            responding.cancel()
+                        if self.tool_call and not tool_called:
+                            tool_called = True
+                            responding = asyncio.create_task(self.call_tool(ws))
+                        else:
+                            responding = asyncio.create_task(self.respond(ws))
+                elif kind == "conversation.item.create" and event["item"].get("type") == "function_call_output":
+                    self.tool_outputs.append(event["item"]["output"])
+                elif kind == "session.update":
+                    await ws.send(json.dumps({"type": "session.updated", "session": event.get("session", {})}))
+                elif kind == "response.create":
+                    if responding is not None:
+                        responding.cancel()
+                    responding = asyncio.create_task(self.respond(ws))
+                elif kind == "response.cancel" and responding is not None and not responding.done():
+                    # Like the real API, truncating alone does not stop a response; cancelling does
+                    responding.cancel()
+                    responding = None
+                    await ws.send(json.dumps({"type": "response.done",
+                                              "response": {"status": "cancelled"}}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if responding is not None:
+                responding.cancel()
+
+    async def respond(self, ws):
+        n = next(self._ids)
+        response_id, item_id = f"resp_{n}", f"item_{n}"
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        if self.response_delay_ms:
+            await asyncio.sleep(self.response_delay_ms / 1000)
+        step = self.delta_ms * 8
+        for offset in range(0, len(self._reply), step):
+            await ws.send(json.dumps({
+                "type": "response.audio.delta",
+                "response_id": response_id,
+                "item_id": item_id,
+                "delta": base64.b64encode(self._reply[offset:offset + step]).decode("ascii"),
+            }))
+            if self.speed:
+                await asyncio.sleep(self.delta_ms / 1000 / self.speed)
+        await ws.send(json.dumps({"type": "response.audio.done", "response_id": response_id, "item_id": item_id}))
+        await ws.send(json.dumps({"type": "response.audio_transcript.done", "response_id": response_id,
+                                  "item_id": item_id, "transcript": "(mock reply)"}))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id}}))
+
+    async def call_tool(self, ws):
+        n = next(self._ids)
+        response_id = f"resp_{n}"
+        name, arguments = self.tool_call
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await ws.send(json.dumps({
+            "type": "response.function_call_arguments.done",
+            "response_id": response_id,
+            "item_id": f"item_{n}",
+            "call_id": f"call_{n}",
+            "name": name,
+            "arguments": arguments,
+        }))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id}}))
+
+    def serve(self, host="127.0.0.1", port=9000):
+        return websockets.serve(self.handler, host, port)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI Realtime server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--reply-ms", type=int, default=2000)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--turn-ms", type=int, default=0,
+                        help="simulate a caller turn after this much appended audio")
+    parser.add_argument("--reply-file", help="raw mu-law audio to reply with instead of a tone")
+    parser.add_argument("--response-delay-ms", type=int, default=0,
+                        help="wait this long before the first audio delta of each response")
+    parser.add_argument("--tool-call", nargs=2, metavar=("NAME", "ARGUMENTS"),
+                        help="answer the first caller turn with this function call")
+    args = parser.parse_args()
+    reply = None
+    if args.reply_file:
+        with open(args.reply_file, "rb") as f:
+            reply = f.read()
+    server = MockRealtimeServer(reply_ms=args.reply_ms, speed=args.speed, turn_ms=args.turn_ms, reply=reply,
+                                tool_call=tuple(args.tool_call) if args.tool_call else None,
+                                response_delay_ms=args.response_delay_ms)
+    async with server.serve(args.host, args.port):
+        print(f"Mock realtime server listening on ws://{args.host}:{args.port}")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+# outbound.py
+
+import base64
+import time
+from collections import deque
+
+from g711 import SAMPLE_RATE
+
+SAMPLES_PER_MS = SAMPLE_RATE // 1000
+
+
+def _decoded_length(payload):
+    """Bytes encoded by a base64 string, without decoding it."""
+    return len(payload) * 3 // 4 - payload.count("=", -2)
+
+
+class OutboundScheduler:
+    """Turns OpenAI audio deltas into paced Twilio `media` and `mark` messages.
+
+    Agent audio is re-cut into `frame_ms` frames (0 relays every delta as
+    its own frame, without decoding) and a mark goes out after every
+    `mark_every_ms` of audio instead of after every delta. Each mark is named
+    after the agent-audio position it ends at, and outstanding marks sit in a
+    deque: Twilio acknowledges them in order, so every operation is O(1).
+    The acknowledged position plus the time since it was acknowledged gives
+    how much of the current item the caller has actually heard, which is what
+    `conversation.item.truncate` needs.
+    """
+
+    def __init__(self, template, frame_ms=100, mark_every_ms=500):
+        self.template = template  # relay.TwilioMediaTemplate for the stream
+        self.frame_bytes = frame_ms * SAMPLES_PER_MS
+        self.mark_samples = max(mark_every_ms, 1) * SAMPLES_PER_MS
+        self.sent = 0  # agent samples sent over the whole call
+        self.item_start = 0  # value of `sent` when the current item began
+        self._buf = bytearray()
+        self._marks = deque()  # positions of marks Twilio has not played yet
+        self._last_mark = 0
+        self._anchor_pos = 0  # a position Twilio was known to be playing...
+        self._anchor_time = time.monotonic()  # ...and when
+
+    @property
+    def playing(self):
+        """True while Twilio still has agent audio queued or playing."""
+        # Audio sent since the last mark has no mark to wait on yet
+        return bool(self._marks) or bool(self._buf) or self.sent > self._last_mark
+
+    def start_item(self):
+        """Positions reported by `item_played_ms` restart from here."""
+        out = self.flush()
+        self.item_start = self.sent
+        return out
+
+    def push(self, payload, audio=None):
+        """Queue one delta; returns the messages to send to Twilio now.
+
+        Pass the decoded `audio` if it is already at hand, to skip decoding.
+        """
+        if not self.playing:
+            # Twilio starts playing as soon as the first frame arrives
+            self._anchor_pos = self.sent
+            self._anchor_time = time.monotonic()
+        out = []
+        if not self.frame_bytes:
+            out.append(self.template.render(payload))
+            self._advance(len(audio) if audio is not None else _decoded_length(payload), out)
+            return out
+        self._buf += audio if audio is not None else base64.b64decode(payload)
+        while len(self._buf) >= self.frame_bytes:
+            self._emit(self.frame_bytes, out)
+        return out
+
+    def flush(self):
+        """Send any partial frame and a closing mark, e.g. on `response.audio.done`."""
+        out = []
+        self.flush_into(out)
+        return out
+
+    def flush_into(self, out):
+        if self._buf:
+            self._emit(len(self._buf), out)
+        if self.sent > self._last_mark:
+            self._mark(out)
+
+    def _emit(self, n, out):
+        out.append(self.template.render(base64.b64encode(self._buf[:n]).decode("ascii")))
+        del self._buf[:n]
+        self._advance(n, out)
+
+    def _advance(self, n, out):
+        self.sent += n
+        if self.sent - self._last_mark >= self.mark_samples:
+            self._mark(out)
+
+    def _mark(self, out):
+        self._last_mark = self.sent
+        self._marks.append(self.sent)
+        out.append(self.template.mark(str(self.sent)))
+
+    def mark_played(self, name):
+        """Handle a Twilio `mark` echo for the mark called `name`."""
+        try:
+            position = int(name)
+        except (TypeError, ValueError):
+            return
+        # Echoes for marks dropped by `clear` no longer match anything
+        while self._marks and self._marks[0] <= position:
+            self._marks.popleft()
+            self._anchor_pos = position
+            self._anchor_time = time.monotonic()
+
+    def item_played_ms(self):
+        """Milliseconds of the current item the caller has heard so far."""
+        elapsed = (time.monotonic() - self._anchor_time) * SAMPLE_RATE
+        played = min(self.sent, self._anchor_pos + int(elapsed))
+        return max(played - self.item_start, 0) // SAMPLES_PER_MS
+
+    def clear(self):
+        """Forget queued audio after a Twilio `clear`."""
+        self._buf.clear()
+        self._marks.clear()
+        self._last_mark = self.sent
@@ -0,0 +1,144 @@
+# realtime_pool.py
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import websockets
+
+
+class RealtimeSessionPool:
+    """Keeps connected, already-configured OpenAI Realtime sessions ready for new calls.
+
+    Every session is opened with `setup_messages` (the pre-serialized
+    course-independent `session.update`) already sent, so answering a call
+    only costs a deque pop. The pool targets enough warm sessions to cover
+    the calls expected to arrive while a new one is being opened, based on
+    the recent arrival rate, bounded by `min_size` and `max_size`. Sessions
+    idle for longer than `idle_ttl` seconds are closed and replaced.
+    """
+
+    def __init__(self, url, headers, setup_messages, min_size=1, max_size=8,
+                 idle_ttl=300.0, rate_window=60.0, check_interval=1.0):
+        self.url = url
+        self.headers = headers
+        self.setup_messages = setup_messages
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.rate_window = rate_window
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.target = min_size
+        self.connect_time = 1.0  # moving average of seconds to open a session
+        self._ready = deque()  # (opened_at, websocket)
+        self._opening = 0
+        self._arrivals = deque()
+        self._task = None
+        self._wakeup = asyncio.Event()
+
+    async def _open(self):
+        started = time.monotonic()
+        ws = await websockets.connect(self.url, extra_headers=self.headers)
+        for message in self.setup_messages:
+            await ws.send(message)
+        self.connect_time = 0.8 * self.connect_time + 0.2 * (time.monotonic() - started)
+        return ws
+
+    async def acquire(self):
+        """Return a configured session, opening one on the spot if none is warm."""
+        now = time.monotonic()
+        self._arrivals.append(now)
+        self._wakeup.set()
+        while self._ready:
+            opened_at, ws = self._ready.popleft()
+            if ws.open and now - opened_at < self.idle_ttl:
+                self.hits += 1
+                return ws
+            await ws.close()
+        self.misses += 1
+        return await self._open()
+
+    @asynccontextmanager
+    async def session(self, ws=None):
+        """Hold a session for the length of one call and close it afterwards.
+
+        Acquires one unless the caller already did (`ws`).
+        """
+        if ws is None:
+            ws = await self.acquire()
+        try:
+            yield ws
+        finally:
+            await ws.close()
+
+    def _update_target(self, now):
+        while self._arrivals and now - self._arrivals[0] > self.rate_window:
+            self._arrivals.popleft()
+        rate = len(self._arrivals) / self.rate_window
+        # Calls expected while a replacement session is still connecting
+        wanted = math.ceil(rate * max(self.connect_time, self.check_interval) * 2)
+        self.target = max(self.min_size, min(self.max_size, wanted))
+
+    async def _expire(self, now):
+        while self._ready and (now - self._ready[0][0] >= self.idle_ttl or not self._ready[0][1].open):
+            _, ws = self._ready.popleft()
+            self.expired += 1
+            await ws.close()
+        # Shrink when the arrival rate has dropped
+        while len(self._ready) > self.target:
+            _, ws = self._ready.popleft()
+            await ws.close()
+
+    async def _fill(self):
+        self._opening += 1
+        try:
+            ws = await self._open()
+            self._ready.append((time.monotonic(), ws))
+        except Exception as e:
+            print(f"Error pre-warming realtime session: {e}")
+            await asyncio.sleep(self.check_interval)
+        finally:
+            self._opening -= 1
+
+    async def _maintain(self):
+        while True:
+            try:
+                now = time.monotonic()
+                self._update_target(now)
+                await self._expire(now)
+                for _ in range(self.target - len(self._ready) - self._opening):
+                    asyncio.create_task(self._fill())
+            except Exception as e:
+                print(f"Error maintaining realtime session pool: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.max_size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._ready:
+            _, ws = self._ready.popleft()
+            await ws.close()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "ready": len(self._ready),
+            "opening": self._opening,
+            "target": self.target,
+        }
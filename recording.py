@@ -0,0 +1,180 @@
+# recording.py
+
+from collections import deque
+
+import numpy as np
+
+from g711 import SAMPLE_RATE, ULAW_SILENCE
+from s3_uploader import PART_SIZE
+
+RECORDING_MAX_PARTS = 4  # hard cap of 4 x 5 MB part buffers per call
+MIX_CHUNK_SAMPLES = SAMPLE_RATE  # mix one second of audio at a time
+
+
+class RecordingBuffer:
+    """Per-call recording memory made of fixed-size, reusable part buffers.
+
+    Audio is copied once, into a preallocated `part_size` bytearray. Full
+    parts are handed out as memoryviews (no slicing, no copies) and come back
+    through `release` once the uploader is done with them, so a call never
+    holds more than `max_parts` buffers. Audio that arrives while every
+    buffer is still waiting on S3 is dropped and counted in `dropped`.
+    """
+
+    peak_bytes = 0  # highest per-call high-water mark seen in this process
+
+    def __init__(self, part_size=PART_SIZE, max_parts=RECORDING_MAX_PARTS):
+        self.part_size = part_size
+        self.max_parts = max_parts
+        self.allocated = 0
+        self.high_water = 0  # most part-buffer bytes this call held at once
+        self.dropped = 0  # bytes lost because the call hit its cap
+        self._free = []
+        self._full = deque()
+        self._current = self._acquire()
+        self._fill = 0
+
+    def _acquire(self):
+        if self._free:
+            return self._free.pop()
+        if self.allocated >= self.max_parts:
+            return None
+        self.allocated += 1
+        held = self.allocated * self.part_size
+        if held > self.high_water:
+            self.high_water = held
+            if held > RecordingBuffer.peak_bytes:
+                RecordingBuffer.peak_bytes = held
+        return bytearray(self.part_size)
+
+    def write(self, data):
+        """Append `data` to the recording. Returns False if any of it was dropped."""
+        src = memoryview(data)
+        offset = 0
+        while offset < len(src):
+            if self._current is None:
+                self._current = self._acquire()
+                if self._current is None:
+                    self.dropped += len(src) - offset
+                    return False
+            n = min(len(src) - offset, self.part_size - self._fill)
+            self._current[self._fill:self._fill + n] = src[offset:offset + n]
+            self._fill += n
+            offset += n
+            if self._fill == self.part_size:
+                self._full.append(self._current)
+                self._current = None
+                self._fill = 0
+        return True
+
+    def pop_full(self):
+        """Return a memoryview of the oldest full part, or None."""
+        if not self._full:
+            return None
+        return memoryview(self._full.popleft())
+
+    def tail(self):
+        """Return a memoryview of the partially filled last part and detach it."""
+        part, fill = self._current, self._fill
+        self._current = None
+        self._fill = 0
+        if part is None:
+            return memoryview(b"")
+        return memoryview(part)[:fill]
+
+    def release(self, view):
+        """Give a part buffer handed out by `pop_full` or `tail` back for reuse."""
+        part = view.obj
+        view.release()
+        if isinstance(part, bytearray) and len(part) == self.part_size:
+            self._free.append(part)
+
+    def __len__(self):
+        """Bytes recorded but not yet handed out."""
+        return len(self._full) * self.part_size + self._fill
+
+
+class _Track:
+    """Mono mu-law samples for one side of the call, positioned on the call timeline."""
+
+    def __init__(self):
+        self.base = 0  # timeline position (in samples) of buf[0]
+        self.buf = bytearray()
+
+    @property
+    def end(self):
+        return self.base + len(self.buf)
+
+    def write_at(self, pos, data):
+        if pos < self.base:
+            # Late audio for a stretch that has already been mixed
+            data = data[self.base - pos:]
+            pos = self.base
+        offset = pos - self.base
+        if offset > len(self.buf):
+            self.buf.extend(bytes((ULAW_SILENCE,)) * (offset - len(self.buf)))
+        self.buf[offset:offset + len(data)] = data
+
+    def truncate(self, pos):
+        if pos < self.end:
+            del self.buf[max(pos - self.base, 0):]
+
+    def take_into(self, column, n):
+        """Copy the next `n` samples into `column`, padding with silence, and drop them."""
+        available = min(n, len(self.buf))
+        if available:
+            samples = np.frombuffer(self.buf, dtype=np.uint8, count=available)
+            column[:available] = samples
+            del samples  # release the buffer export before resizing
+            del self.buf[:available]
+        column[available:] = ULAW_SILENCE
+        self.base += n
+
+
+class StereoRecorder:
+    """Two-channel recording with the caller on the left and the agent on the right.
+
+    Caller audio is placed by the Twilio `media.timestamp`. Agent audio is
+    placed back to back from where the agent last stopped, or from the
+    caller's current position if the agent was silent, which follows the
+    order Twilio plays it in. Gaps on either side are filled with silence.
+    Once the caller timeline is `chunk_samples` past the mixed position, that
+    chunk is interleaved into `sink` with NumPy, so mixing work stays
+    proportional to call time instead of happening all at the end.
+    """
+
+    def __init__(self, sink, chunk_samples=MIX_CHUNK_SAMPLES):
+        self.sink = sink
+        self.chunk_samples = chunk_samples
+        self.caller = _Track()
+        self.agent = _Track()
+        self._frame = np.empty((chunk_samples, 2), dtype=np.uint8)
+
+    def write_caller(self, timestamp_ms, data):
+        self.caller.write_at(int(timestamp_ms) * SAMPLE_RATE // 1000, data)
+        self._mix_ready()
+
+    def write_agent(self, data):
+        self.agent.write_at(max(self.agent.end, self.caller.end), data)
+
+    def clear_agent(self):
+        """Drop agent audio that Twilio discarded on a `clear` before playing it."""
+        self.agent.truncate(self.caller.end)
+
+    def _mix_ready(self):
+        while self.caller.end - self.caller.base >= self.chunk_samples:
+            self._mix(self.chunk_samples)
+
+    def _mix(self, n):
+        frame = self._frame[:n]
+        self.caller.take_into(frame[:, 0], n)
+        self.agent.take_into(frame[:, 1], n)
+        self.sink.write(frame.reshape(-1))  # interleaved L/R bytes
+
+    def close(self):
+        """Mix whatever is left on either track."""
+        remaining = max(self.caller.end, self.agent.end) - self.caller.base
+        while remaining > 0:
+            n = min(remaining, self.chunk_samples)
+            self._mix(n)
+            remaining -= n
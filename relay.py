@@ -0,0 +1,52 @@
+# relay.py
+#
+# Fast path for the per-frame messages relayed between Twilio and OpenAI.
+# Audio payloads are base64 strings on both sides, so they are spliced into
+# pre-built JSON templates as-is instead of being decoded and re-encoded.
+# Base64 never needs JSON escaping, which makes the splice safe.
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+_APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+_SUFFIX = '"}'
+_MEDIA_PREFIX = '{"event":"media"'
+
+
+def input_audio_append(payload):
+    """`input_audio_buffer.append` for OpenAI carrying a Twilio media payload."""
+    return _APPEND_PREFIX + payload + _SUFFIX
+
+
+def is_audio_append(message):
+    """Whether a message for OpenAI is caller audio (not a control event)."""
+    return message.startswith(_APPEND_PREFIX)
+
+
+def is_twilio_media(message):
+    """Whether a message rendered by `TwilioMediaTemplate` is audio (not a mark or control event)."""
+    return message.startswith(_MEDIA_PREFIX)
+
+
+class TwilioMediaTemplate:
+    """Pre-serialized Twilio `media` and `mark` messages for one stream."""
+
+    def __init__(self, stream_sid):
+        sid = json.dumps(stream_sid)
+        self.prefix = '{"event":"media","streamSid":%s,"media":{"payload":"' % sid
+        self.mark_prefix = '{"event":"mark","streamSid":%s,"mark":{"name":"' % sid
+
+    def render(self, payload):
+        return self.prefix + payload + '"}}'
+
+    def mark(self, name):
+        return self.mark_prefix + name + '"}}'
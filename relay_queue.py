@@ -0,0 +1,121 @@
+# relay_queue.py
+#
+# Bounded queues between the two legs of a call. Each direction of the relay
+# has a reader that enqueues and a pump that sends, so a slow peer backs up
+# only its own queue instead of stalling reads on the other socket, and the
+# depth and wait time of each queue show where latency accumulates.
+
+import asyncio
+from collections import deque
+from time import perf_counter
+
+from metrics import REGISTRY
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+POLICIES = (DROP_OLDEST, BLOCK)
+
+QUEUE_DEPTH = REGISTRY.labeled_gauge(
+    "golfbot_relay_queue_depth", "Messages waiting in relay queues, summed over calls.", "queue")
+QUEUE_DROPPED = REGISTRY.labeled_counter(
+    "golfbot_relay_queue_dropped_total", "Messages dropped because a relay queue was full.", "queue")
+QUEUE_PAUSES = REGISTRY.labeled_counter(
+    "golfbot_relay_queue_pauses_total", "Times a full relay queue paused reading from its source.", "queue")
+_WAIT = {}  # queue name -> histogram of time from put to send
+
+
+def _wait_histogram(name):
+    if name not in _WAIT:
+        _WAIT[name] = REGISTRY.histogram(
+            f"golfbot_relay_{name}_wait_seconds", f"Time a message spent in the {name} relay queue.")
+    return _WAIT[name]
+
+
+class RelayQueue:
+    """FIFO of outgoing messages for one direction of one call.
+
+    When full, `put` either drops the oldest droppable message (DROP_OLDEST,
+    for audio that is worthless once stale) or waits for room (BLOCK), which
+    pauses the reader feeding it until the peer catches up. Messages put with
+    `droppable=False` (marks, control events) are never dropped.
+    """
+
+    def __init__(self, name, maxsize, policy=BLOCK):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self.high_water = 0
+        self.dropped = 0
+        self._items = deque()  # (message, droppable, put time)
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._wait = _wait_histogram(name)
+
+    def __len__(self):
+        return len(self._items)
+
+    async def put(self, message, droppable=True):
+        """Queue `message`; a closed queue discards it."""
+        while len(self._items) >= self.maxsize and not self.closed:
+            if self.policy == DROP_OLDEST and self._drop_oldest():
+                break
+            QUEUE_PAUSES.inc(self.name)
+            self._not_full.clear()
+            await self._not_full.wait()
+        if self.closed:
+            return
+        self._items.append((message, droppable, perf_counter()))
+        QUEUE_DEPTH.inc(self.name)
+        if len(self._items) > self.high_water:
+            self.high_water = len(self._items)
+        self._not_empty.set()
+
+    def _drop_oldest(self):
+        for i, (_, droppable, _) in enumerate(self._items):
+            if droppable:
+                del self._items[i]
+                self.dropped += 1
+                QUEUE_DEPTH.dec(self.name)
+                QUEUE_DROPPED.inc(self.name)
+                return True
+        return False
+
+    async def get(self):
+        """The next message, or None once the queue is closed."""
+        while not self._items:
+            if self.closed:
+                return None
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        message, _, put_at = self._items.popleft()
+        QUEUE_DEPTH.dec(self.name)
+        self._wait.observe(perf_counter() - put_at)
+        self._not_full.set()
+        return message
+
+    def clear(self):
+        """Discard every waiting message."""
+        QUEUE_DEPTH.dec(self.name, len(self._items))
+        self._items.clear()
+        self._not_full.set()
+
+    def close(self):
+        """Discard waiting messages and wake the pump and any paused reader."""
+        self.clear()
+        self.closed = True
+        self._not_empty.set()
+
+    async def pump(self, send):
+        """Send messages with `send` until the queue is closed. Closes it if a send fails."""
+        try:
+            while True:
+                message = await self.get()
+                if message is None:
+                    return
+                await send(message)
+        finally:
+            self.close()
@@ -1,12 +1,63 @@
 # s3_client.py
+#
+# The S3 client is built on first use rather than at import: importing boto3
+# and loading the S3 service model takes a noticeable fraction of a second,
+# which a freshly autoscaled worker should not spend before it can answer
+# calls. Code that only passes the client around never pays for it.
 
-import boto3
-import config  # Your configuration file with AWS credentials
+import os
+import threading
 
-# Initialize S3 client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=config.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
-    region_name=config.AWS_REGION  # e.g., "us-east-1"
-)
\ No newline at end of file
+# boto3 keeps at most this many connections per client; size it to the number
+# of threads making requests at once, or requests queue for a connection. The
+# default is the app's 8 upload threads (S3_UPLOAD_WORKERS) plus headroom for the
+# clip cache, analytics and spool recovery, which make requests from their own threads.
+MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 12))
+
+
+class LazyS3Client:
+    """Stands in for a boto3 S3 client and builds the real one on first use.
+
+    Attribute access is forwarded to the real client, so it can be passed
+    anywhere a client is expected. Building is thread-safe; the first use
+    from an upload thread keeps it off the event loop.
+    """
+
+    def __init__(self, max_pool_connections=MAX_POOL_CONNECTIONS):
+        self.max_pool_connections = max_pool_connections
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def built(self):
+        return self._client is not None
+
+    def get(self):
+        """The real client, building it if this is the first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._build()
+        return self._client
+
+    def _build(self):
+        import boto3
+        from botocore.config import Config
+
+        import config  # Your configuration file with AWS credentials
+
+        return boto3.client(
+            "s3",
+            aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY,
+            region_name=config.AWS_REGION,  # e.g., "us-east-1"
+            # Point at a local S3 stand-in (MinIO, moto server) for testing
+            endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+            config=Config(max_pool_connections=self.max_pool_connections, tcp_keepalive=True),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+s3_client = LazyS3Client()
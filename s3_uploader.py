@@ -0,0 +1,272 @@
+# s3_uploader.py
+
+import asyncio
+import functools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PART_SIZE = 5 * 1024 * 1024  # S3 minimum size for every part except the last
+
+
+def _is_permanent(error):
+    """A 4xx response other than a timeout or throttle; retrying will not help."""
+    status = getattr(error, "response", {}).get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+class MultipartUpload:
+    """Multipart upload state for a single call recording."""
+
+    def __init__(self, key, bucket):
+        self.key = key
+        self.bucket = bucket
+        self.upload_id = None
+        self.created = None  # task running create_multipart_upload
+        self.next_part_number = 1
+        self.etags = {}  # part number -> ETag, filled in as parts finish
+        self.pending = set()  # in-flight part upload tasks
+        self.failed = False
+        self.closed = False
+
+
+class S3Uploader:
+    """Uploads call recordings to S3 from a bounded thread pool.
+
+    boto3 is synchronous, so every S3 request runs on a worker thread and the
+    event loop only ever awaits the result. Each call owns a `MultipartUpload`
+    so parts from different calls never mix. `upload_part` waits for a free
+    slot once `max_pending_parts` parts are in flight across all calls, which
+    pushes back on the recording path instead of buffering without limit.
+    """
+
+    def __init__(self, client, bucket, max_workers=8, max_pending_parts=16,
+                 max_attempts=5, base_delay=0.2, max_delay=5.0, lag_histogram=None):
+        self.client = client
+        self.bucket = bucket
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lag_histogram = lag_histogram  # observes seconds from queued to stored
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-upload")
+        self.max_pending_parts = max_pending_parts
+        self._slots = asyncio.Semaphore(max_pending_parts)
+        self._in_flight = 0
+
+    async def _call(self, method, **kwargs):
+        """Run one boto3 request on the worker pool, retrying with backoff."""
+        loop = asyncio.get_running_loop()
+        delay = self.base_delay
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(self._request, method, kwargs)
+                )
+            except Exception as e:
+                if attempt == self.max_attempts or _is_permanent(e):
+                    raise
+                print(f"S3 {method} failed (attempt {attempt}/{self.max_attempts}): {e}")
+                # Full jitter keeps retries from many calls from arriving in lockstep
+                await asyncio.sleep(random.uniform(0, delay))
+                delay = min(delay * 2, self.max_delay)
+
+    def _request(self, method, kwargs):
+        # Looked up on the worker thread, so a lazily built client is built there
+        return getattr(self.client, method)(**kwargs)
+
+    async def warm(self, connections=1, buckets=None):
+        """Open up to `connections` pooled connections to S3 before the first call needs one.
+
+        Sends ListMultipartUploads, which spool recovery needs anyway
+        (s3:ListBucketMultipartUploads), at least once per bucket. A bucket
+        that refuses it still proves S3 is reachable, so it is returned in
+        {bucket: error} instead of failing the warm-up. Raises only if S3
+        itself cannot be reached.
+        """
+        buckets = buckets or [self.bucket]
+        count = max(min(connections, self.max_workers), len(buckets))
+        requests = [buckets[i % len(buckets)] for i in range(count)]
+        results = await asyncio.gather(
+            *(self._call("list_multipart_uploads", Bucket=bucket, MaxUploads=1) for bucket in requests),
+            return_exceptions=True,
+        )
+        refused = {}
+        for bucket, result in zip(requests, results):
+            if isinstance(result, Exception):
+                if not _is_permanent(result):
+                    raise result
+                refused[bucket] = str(result)
+        return refused
+
+    def start(self, key, bucket=None):
+        """Begin the multipart upload for a call and return its state.
+
+        Returns immediately; the create request runs in the background and
+        part uploads wait for it. `bucket` defaults to the uploader's.
+        """
+        upload = MultipartUpload(key, bucket or self.bucket)
+        upload.created = asyncio.create_task(self._create(upload))
+        return upload
+
+    def resume(self, key, upload_id, etags, bucket=None):
+        """State for an upload an earlier process created, with `etags` already stored."""
+        upload = MultipartUpload(key, bucket or self.bucket)
+        upload.upload_id = upload_id
+        upload.created = asyncio.get_running_loop().create_future()
+        upload.created.set_result(None)
+        upload.etags = dict(etags)
+        upload.next_part_number = max(etags, default=0) + 1
+        return upload
+
+    async def list_parts(self, key, upload_id, bucket=None):
+        """{part number: (ETag, size)} stored for an upload, or None if it no longer exists."""
+        parts = {}
+        kwargs = {"Bucket": bucket or self.bucket, "Key": key, "UploadId": upload_id}
+        while True:
+            try:
+                response = await self._call("list_parts", **kwargs)
+            except self.client.exceptions.NoSuchUpload:
+                return None
+            for part in response.get("Parts", []):
+                parts[part["PartNumber"]] = (part["ETag"], part["Size"])
+            if not response.get("IsTruncated"):
+                return parts
+            kwargs["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+    async def list_uploads(self, bucket=None):
+        """(key, upload id, initiated datetime) of every multipart upload open in the bucket."""
+        uploads = []
+        kwargs = {"Bucket": bucket or self.bucket}
+        while True:
+            response = await self._call("list_multipart_uploads", **kwargs)
+            for u in response.get("Uploads", []):
+                uploads.append((u["Key"], u["UploadId"], u["Initiated"]))
+            if not response.get("IsTruncated"):
+                return uploads
+            kwargs["KeyMarker"] = response["NextKeyMarker"]
+            kwargs["UploadIdMarker"] = response["NextUploadIdMarker"]
+
+    async def _create(self, upload):
+        response = await self._call("create_multipart_upload", Bucket=upload.bucket, Key=upload.key)
+        upload.upload_id = response["UploadId"]
+        print(f"S3 multipart upload initialized with Key: {upload.key}")
+
+    async def upload_part(self, upload, body, on_done=None):
+        """Queue `body` as the next part of `upload`.
+
+        Returns once the part has been handed to the worker pool, not when it
+        has finished uploading. Waits while the pool is saturated. `on_done`
+        is called with `body` once S3 no longer needs it, whatever the outcome.
+        """
+        if upload.closed:
+            raise RuntimeError(f"Upload for {upload.key} is already closed")
+        await self._slots.acquire()
+        self._in_flight += 1
+        part_number = upload.next_part_number
+        upload.next_part_number += 1
+        task = asyncio.create_task(self._upload_part(upload, part_number, body, on_done, time.monotonic()))
+        upload.pending.add(task)
+        task.add_done_callback(upload.pending.discard)
+        return part_number
+
+    async def _upload_part(self, upload, part_number, body, on_done, queued_at):
+        try:
+            await upload.created
+            response = await self._call(
+                "upload_part",
+                Bucket=upload.bucket,
+                Key=upload.key,
+                PartNumber=part_number,
+                UploadId=upload.upload_id,
+                Body=await self._as_body(body),
+            )
+            upload.etags[part_number] = response["ETag"]
+            if self.lag_histogram is not None:
+                self.lag_histogram.observe(time.monotonic() - queued_at)
+            print(f"Uploaded part {part_number} of {upload.key} to S3.")
+        except Exception as e:
+            upload.failed = True
+            print(f"Error uploading part {part_number} of {upload.key}: {e}")
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+            if on_done is not None:
+                on_done(body)
+
+    async def _as_body(self, body):
+        """Turn a memoryview into something botocore accepts as a request body.
+
+        A view over a whole buffer passes the buffer itself through. A view
+        over part of one (the short last part of a call) is copied once, on
+        a worker thread. A body with a `load()` method (a slice of a spool
+        file) is read on a worker thread.
+        """
+        if hasattr(body, "load"):
+            return await asyncio.get_running_loop().run_in_executor(self._executor, body.load)
+        if not isinstance(body, memoryview):
+            return body
+        if isinstance(body.obj, (bytes, bytearray)) and body.nbytes == len(body.obj):
+            return body.obj
+        return await asyncio.get_running_loop().run_in_executor(self._executor, body.tobytes)
+
+    async def complete(self, upload, body=None, on_done=None):
+        """Upload the final part (if any), wait for all parts and finish the upload.
+
+        Aborts the multipart upload if any part could not be uploaded. Calling
+        this more than once for the same upload is a no-op. Returns whether
+        this call stored the object.
+        """
+        if upload.closed:
+            if on_done is not None and body is not None:
+                on_done(body)
+            return False
+        try:
+            if body:
+                await self.upload_part(upload, body, on_done)
+            elif on_done is not None and body is not None:
+                on_done(body)
+            upload.closed = True
+            await upload.created
+            if upload.pending:
+                await asyncio.gather(*upload.pending)
+            if upload.failed or not upload.etags:
+                raise RuntimeError(f"no complete set of parts for {upload.key}")
+            parts = [{"PartNumber": n, "ETag": upload.etags[n]} for n in sorted(upload.etags)]
+            await self._call(
+                "complete_multipart_upload",
+                Bucket=upload.bucket,
+                Key=upload.key,
+                MultipartUpload={"Parts": parts},
+                UploadId=upload.upload_id,
+            )
+            print(f"Recording {upload.key} successfully uploaded to S3.")
+            return True
+        except Exception as e:
+            print(f"Error completing upload of {upload.key}: {e}")
+            await self.abort(upload)
+            return False
+
+    async def abort(self, upload):
+        """Abort the multipart upload so S3 drops any stored parts."""
+        upload.closed = True
+        if upload.upload_id is None:
+            return
+        try:
+            await self._call(
+                "abort_multipart_upload",
+                Bucket=upload.bucket,
+                Key=upload.key,
+                UploadId=upload.upload_id,
+            )
+            print(f"Aborted incomplete multipart upload of {upload.key}.")
+        except Exception as e:
+            print(f"Error aborting upload of {upload.key}: {e}")
+
+    @property
+    def in_flight(self):
+        """Number of parts currently queued or uploading."""
+        return self._in_flight
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,255 @@
+# spool.py
+#
+# Crash-safe recording path. Each call appends its audio to a file in the
+# spool directory, next to a small JSON sidecar holding the S3 key and the
+# multipart upload id. A background shipper uploads full parts from disk, so
+# a call only ever holds a small write buffer in memory and never waits on
+# S3. If the worker dies mid-call, the spool file and sidecar survive and the
+# next startup finishes the upload from them.
+
+import asyncio
+import fcntl
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+from s3_uploader import PART_SIZE
+
+SPOOL_BUFFER_BYTES = 16 * 1024  # at most this much audio is lost if the process is killed
+
+
+class SpoolPart:
+    """A byte range of a spool file, read from disk when the uploader needs it."""
+
+    __slots__ = ("path", "offset", "length")
+
+    def __init__(self, path, offset, length):
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            return f.read(self.length)
+
+
+class RecordingSpool:
+    """Append-only spool file for one call's recording.
+
+    Accepts the same `write` calls as `RecordingBuffer`. The file is locked
+    while its call is live, which is how recovery tells an orphan from a
+    recording another worker is still writing.
+    """
+
+    peak_bytes = 0  # highest per-call high-water mark seen in this process
+
+    def __init__(self, directory, part_size=PART_SIZE, name=None, resume=False):
+        self.directory = directory
+        self.part_size = part_size
+        self.name = name or uuid.uuid4().hex
+        self.path = os.path.join(directory, f"{self.name}.raw")
+        self.state_path = os.path.join(directory, f"{self.name}.json")
+        self.key = None
+        self.upload = None
+        self.shipped = 0  # bytes handed to the uploader
+        self.high_water = 0  # most bytes waiting on disk to be shipped
+        self.dropped = 0
+        self.closed = False
+        self.lock = asyncio.Lock()  # keeps part numbers in file order
+        self._file = open(self.path, "r+b" if resume else "ab", buffering=SPOOL_BUFFER_BYTES)
+        try:
+            # Raises BlockingIOError if another process holds the recording
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            raise
+        self.size = os.fstat(self._file.fileno()).st_size
+
+    def write(self, data):
+        self._file.write(data)
+        self.size += memoryview(data).nbytes
+        if self.size - self.shipped > self.high_water:
+            self.high_water = self.size - self.shipped
+            if self.high_water > RecordingSpool.peak_bytes:
+                RecordingSpool.peak_bytes = self.high_water
+        return True
+
+    def attach(self, upload):
+        """Record which S3 upload this spool feeds, so a restart can finish it."""
+        self.key = upload.key
+        self.upload = upload
+        self._save_state()
+        if upload.upload_id is None:
+            upload.created.add_done_callback(self._created)
+
+    def _created(self, task):
+        if not task.cancelled() and task.exception() is None:
+            self._save_state()
+
+    def _save_state(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"key": self.key, "bucket": self.upload.bucket, "upload_id": self.upload.upload_id}, f)
+        os.replace(tmp, self.state_path)
+
+    def pop_full(self):
+        """The next full part not yet shipped, or None."""
+        if self.size - self.shipped < self.part_size:
+            return None
+        self._file.flush()
+        part = SpoolPart(self.path, self.shipped, self.part_size)
+        self.shipped += self.part_size
+        return part
+
+    def tail(self):
+        """Everything not yet shipped, as the last part."""
+        self._file.flush()
+        part = SpoolPart(self.path, self.shipped, self.size - self.shipped)
+        self.shipped = self.size
+        return part
+
+    def close(self, uploaded):
+        """Close the file; delete it unless it still needs to reach S3."""
+        if self.closed:
+            return
+        self.closed = True
+        self._file.close()
+        if uploaded or self.key is None:
+            for path in (self.path, self.state_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class SpoolShipper:
+    """Uploads full parts from every live spool in the background.
+
+    Shipping runs every `interval` seconds, so the call path only writes to
+    disk. `finish` ships the rest of a call at hangup; `recover` finishes
+    recordings left behind by a dead worker and aborts stale uploads.
+    """
+
+    def __init__(self, uploader, directory, part_size=PART_SIZE, interval=1.0, stale_after=24 * 3600):
+        self.uploader = uploader
+        self.directory = directory
+        self.part_size = part_size
+        self.interval = interval
+        self.stale_after = stale_after
+        self.spools = set()
+        self._task = None
+        os.makedirs(directory, exist_ok=True)
+
+    def open(self):
+        spool = RecordingSpool(self.directory, self.part_size)
+        self.spools.add(spool)
+        return spool
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for spool in list(self.spools):
+                try:
+                    await self._ship(spool)
+                except Exception as e:
+                    print(f"Error shipping spool {spool.name}: {e}")
+
+    async def _ship(self, spool):
+        async with spool.lock:
+            while spool.upload is not None and not spool.upload.closed:
+                part = spool.pop_full()
+                if part is None:
+                    break
+                await self.uploader.upload_part(spool.upload, part)
+
+    async def finish(self, spool):
+        """Ship the rest of `spool` and complete its upload. Returns whether S3 has it."""
+        self.spools.discard(spool)
+        uploaded = False
+        try:
+            if spool.upload is not None:
+                await self._ship(spool)
+                async with spool.lock:
+                    uploaded = await self.uploader.complete(spool.upload, spool.tail())
+        finally:
+            # A failed upload keeps the spool on disk for the next startup
+            spool.close(uploaded)
+        return uploaded
+
+    def discard(self, spool):
+        """Forget a spool whose call never started an upload."""
+        self.spools.discard(spool)
+        spool.close(False)
+
+    async def recover(self, buckets=None):
+        """Finish recordings orphaned by a dead worker, then abort stale uploads in `buckets`."""
+        known = set()
+        for entry in sorted(os.listdir(self.directory)):
+            name, ext = os.path.splitext(entry)
+            if ext != ".raw":
+                continue
+            try:
+                known.add(await self._recover_one(name))
+            except BlockingIOError:
+                # Live call in another worker; remember its upload so it is not aborted
+                known.add(self._read_state(name).get("upload_id"))
+            except Exception as e:
+                print(f"Error recovering spool {name}: {e}")
+        for bucket in buckets or [self.uploader.bucket]:
+            try:
+                await self._abort_stale(known, bucket)
+            except Exception as e:
+                print(f"Error aborting stale uploads in {bucket}: {e}")
+
+    def _read_state(self, name):
+        try:
+            with open(os.path.join(self.directory, f"{name}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    async def _recover_one(self, name):
+        spool = RecordingSpool(self.directory, self.part_size, name=name, resume=True)
+        state = self._read_state(name)
+        spool.key = state.get("key")
+        if spool.key is None or spool.size == 0:
+            # Died before the stream started or before any audio arrived
+            spool.close(True)
+            return None
+        upload_id = state.get("upload_id")
+        bucket = state.get("bucket")
+        parts = await self.uploader.list_parts(spool.key, upload_id, bucket) if upload_id else None
+        if parts is None:
+            spool.upload = self.uploader.start(spool.key, bucket)
+        else:
+            # Keep the leading run of full parts; anything after it is uploaded again
+            etags = {}
+            while len(etags) + 1 in parts and parts[len(etags) + 1][1] == spool.part_size:
+                etags[len(etags) + 1] = parts[len(etags) + 1][0]
+            spool.upload = self.uploader.resume(spool.key, upload_id, etags, bucket)
+            spool.shipped = len(etags) * spool.part_size
+        spool._save_state()
+        print(f"Recovering {spool.key} from spool: {spool.size - spool.shipped} of {spool.size} bytes to upload")
+        await self.finish(spool)
+        return spool.upload.upload_id
+
+    async def _abort_stale(self, known, bucket):
+        now = datetime.now(timezone.utc)
+        for key, upload_id, initiated in await self.uploader.list_uploads(bucket):
+            if upload_id in known or (now - initiated).total_seconds() < self.stale_after:
+                continue
+            print(f"Aborting stale multipart upload of {key} from {initiated:%Y-%m-%d %H:%M}")
+            await self.uploader.abort(self.uploader.resume(key, upload_id, {}, bucket))
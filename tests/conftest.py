@@ -0,0 +1,24 @@
+# tests/conftest.py
+#
+# S3 is moto, in process. Coroutines are driven with asyncio.run, so the suite
+# needs nothing beyond pytest and moto (requirements-dev.txt).
+#
+#   python -m pytest -q
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from tests.support import BUCKET
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """A moto S3 client with BUCKET already created."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
@@ -0,0 +1,47 @@
+# tests/support.py
+#
+# Helpers shared by the tests; fixtures live in conftest.py.
+
+from botocore.exceptions import ClientError
+
+from s3_uploader import S3Uploader
+
+BUCKET = "audio-calls-info"
+
+
+def fast_uploader(client, **kwargs):
+    """An S3Uploader for BUCKET whose retries take milliseconds."""
+    return S3Uploader(client, BUCKET, max_workers=2, base_delay=0.001, max_delay=0.002, **kwargs)
+
+
+def open_uploads(s3):
+    return s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+
+
+def client_error(status, code="Error"):
+    return ClientError({"Error": {"Code": code, "Message": code},
+                        "ResponseMetadata": {"HTTPStatusCode": status}}, "S3")
+
+
+class FlakyClient:
+    """Forwards to a real client, raising the queued errors of a method first."""
+
+    def __init__(self, client):
+        self.client = client
+        self.failures = {}  # method -> errors to raise, in order
+        self.calls = {}
+
+    def fail(self, method, *errors):
+        self.failures.setdefault(method, []).extend(errors)
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+        if not callable(method):
+            return method
+
+        def call(**kwargs):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.failures.get(name):
+                raise self.failures[name].pop(0)
+            return method(**kwargs)
+        return call
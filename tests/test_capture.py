@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from capture import OPENAI_IN, TWILIO_IN, TWILIO_OUT, CallCapture, read_capture
+
+
+def _capture(directory, count, flush_bytes=64 * 1024):
+    async def run():
+        capture = CallCapture(str(directory), {"course": "fremont-park"}, flush_bytes=flush_bytes)
+        for n in range(count):
+            capture.record((TWILIO_IN, TWILIO_OUT, OPENAI_IN)[n % 3], f'{{"n":{n}}}')
+        return await capture.close("MZtest")
+
+    return asyncio.run(run())
+
+
+def test_capture_round_trips_across_flushes(tmp_path):
+    path = _capture(tmp_path, 500, flush_bytes=1024)
+    assert path == os.path.join(tmp_path, "MZtest.gbcap")
+    header, records = read_capture(path)
+    assert header == {"course": "fremont-park"}
+    assert [message for _, _, message in records] == [f'{{"n":{n}}}' for n in range(500)]
+    assert [direction for _, direction, _ in records[:3]] == [TWILIO_IN, TWILIO_OUT, OPENAI_IN]
+    assert os.listdir(tmp_path) == ["MZtest.gbcap"]
+
+
+def test_truncated_capture_reads_up_to_its_last_complete_record(tmp_path):
+    path = _capture(tmp_path, 2000, flush_bytes=1024)
+    with open(path, "rb") as f:
+        raw = f.read()
+    # A worker killed mid-call leaves no gzip trailer and maybe half a block
+    with open(path, "wb") as f:
+        f.write(raw[:len(raw) * 2 // 3])
+    header, records = read_capture(path)
+    assert header == {"course": "fremont-park"}
+    assert 0 < len(records) < 2000
+    assert [message for _, _, message in records] == [f'{{"n":{n}}}' for n in range(len(records))]
+
+
+def test_close_without_a_written_file_returns_none(tmp_path):
+    directory = tmp_path / "captures"
+
+    async def run():
+        capture = CallCapture(str(directory))
+        capture.record(TWILIO_IN, "{}")
+        directory.rmdir()  # so opening the file fails
+        return await capture.close("MZtest")
+
+    assert asyncio.run(run()) is None
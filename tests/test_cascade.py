@@ -0,0 +1,57 @@
+from cascade import SentenceChunker
+
+
+def _chunks(chunker, deltas):
+    out = []
+    for delta in deltas:
+        out += chunker.push(delta)
+    rest = chunker.flush()
+    return out + ([rest] if rest else [])
+
+
+def test_sentences_are_cut_as_tokens_arrive():
+    chunker = SentenceChunker()
+    assert chunker.push("Sure") == []
+    assert chunker.push(".") == []  # the cut needs the whitespace after the period
+    assert chunker.push(" We open at 7:30") == ["Sure."]
+    assert chunker.push(" tomorrow! Anything") == ["We open at 7:30 tomorrow!"]
+    assert chunker.flush() == "Anything"
+    assert chunker.flush() is None
+
+
+def test_closing_quotes_stay_with_their_sentence():
+    assert _chunks(SentenceChunker(), ['He said "Hello." ', "Then left."]) == ['He said "Hello."', "Then left."]
+
+
+def test_titles_do_not_end_a_sentence():
+    chunker = SentenceChunker()
+    assert _chunks(chunker, ["Mr. Smith, you are booked with Dr. Lee at Mt. Diablo. See you then."]) == [
+        "Mr. Smith, you are booked with Dr. Lee at Mt. Diablo.", "See you then."]
+
+
+def test_short_fragments_wait_for_min_chars():
+    assert _chunks(SentenceChunker(min_chars=4), ["No. ", "We are closed."]) == ["No. We are closed."]
+
+
+def test_long_text_falls_back_to_the_last_clause_then_the_last_space():
+    chunker = SentenceChunker(max_chars=40)
+    assert chunker.push("We have nine, ten and eleven in the morning and") == ["We have nine,"]
+    chunker = SentenceChunker(max_chars=20)
+    assert chunker.push("one two three four five six seven") == ["one two three four"]
+    assert chunker.flush() == "five six seven"
+
+
+def test_no_piece_is_longer_than_max_chars():
+    chunker = SentenceChunker(max_chars=20)
+    text = "We have tee times at seven, eight and nine. The back nine opens at noon. Carts are extra! "
+    pieces = chunker.push(text)
+    assert all(len(piece) <= 20 for piece in pieces)
+    assert " ".join(pieces) == text.strip()
+    assert chunker.flush() is None
+    assert SentenceChunker(max_chars=5).push("abcdefghijkl") == ["abcde", "fghij"]
+
+
+def test_disabled_chunker_waits_for_flush():
+    chunker = SentenceChunker(enabled=False)
+    assert chunker.push("Sure. We open at 7:30. ") == []
+    assert chunker.flush() == "Sure. We open at 7:30."
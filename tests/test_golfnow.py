@@ -0,0 +1,92 @@
+import asyncio
+from datetime import date, timedelta
+
+from golfnow import TeeTimeCache
+
+TODAY = date.today()
+
+
+class FakeGolfNow:
+    """Counts fetches; each one waits until `release` is set."""
+
+    def __init__(self):
+        self.fetches = []
+        self.release = asyncio.Event()
+
+    async def tee_times(self, course_id, day):
+        self.fetches.append((course_id, day))
+        await self.release.wait()
+        return [{"id": "a", "time": "07:30", "players": 4}, {"id": "b", "time": "09:00", "players": 2}]
+
+
+def test_concurrent_lookups_share_one_fetch():
+    async def run():
+        client = FakeGolfNow()
+        cache = TeeTimeCache(client, ["fremont"])
+        lookups = [asyncio.create_task(cache.day("fremont", TODAY)) for _ in range(5)]
+        await asyncio.sleep(0)
+        client.release.set()
+        days = await asyncio.gather(*lookups)
+        return client, days
+
+    client, days = asyncio.run(run())
+    assert client.fetches == [("fremont", TODAY)]
+    assert all(day is days[0] for day in days)
+
+
+def test_cancelled_lookup_does_not_cancel_the_shared_fetch():
+    async def run():
+        client = FakeGolfNow()
+        cache = TeeTimeCache(client, ["fremont"])
+        first = asyncio.create_task(cache.day("fremont", TODAY))
+        second = asyncio.create_task(cache.day("fremont", TODAY))
+        await asyncio.sleep(0)
+        first.cancel()
+        client.release.set()
+        return client, await second
+
+    client, day = asyncio.run(run())
+    assert len(client.fetches) == 1
+    assert len(day.slots) == 2
+
+
+def test_cached_day_is_reused_until_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("golfnow.time.monotonic", lambda: now[0])
+
+    async def run():
+        client = FakeGolfNow()
+        client.release.set()
+        cache = TeeTimeCache(client, ["fremont"], ttl=300)
+        await cache.day("fremont", TODAY)
+        now[0] += 299
+        await cache.day("fremont", TODAY)
+        fetches = len(client.fetches)
+        now[0] += 2
+        await cache.day("fremont", TODAY)
+        return fetches, len(client.fetches)
+
+    assert asyncio.run(run()) == (1, 2)
+
+
+def test_evict_drops_expired_and_past_days(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("golfnow.time.monotonic", lambda: now[0])
+
+    async def run():
+        client = FakeGolfNow()
+        client.release.set()
+        cache = TeeTimeCache(client, ["fremont"], ttl=300)
+        await cache.day("fremont", TODAY - timedelta(days=1))
+        await cache.day("fremont", TODAY + timedelta(days=1))
+        now[0] += 200
+        await cache.day("fremont", TODAY)
+        cache._evict(TODAY)
+        kept = set(cache._days)
+        now[0] += 200
+        cache._evict(TODAY)
+        return kept, set(cache._days)
+
+    kept, later = asyncio.run(run())
+    assert kept == {("fremont", TODAY), ("fremont", TODAY + timedelta(days=1))}
+    assert later == {("fremont", TODAY)}
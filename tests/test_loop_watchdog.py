@@ -0,0 +1,21 @@
+import sys
+
+from loop_watchdog import LoopWatchdog, handler_codes
+
+
+def relay(block):
+    def send_to_twilio():
+        return [block() for _ in range(1)]  # a comprehension is blamed on its function
+
+    return send_to_twilio()
+
+
+def test_stall_is_blamed_on_the_innermost_handler_closure():
+    watchdog = LoopWatchdog(handler_codes(relay))
+    blamed = relay(lambda: watchdog._blamed(sys._getframe(1)))
+    assert blamed == ["relay.<locals>.send_to_twilio"]
+
+
+def test_outside_any_handler_the_first_frame_is_named():
+    watchdog = LoopWatchdog(handler_codes(relay))
+    assert watchdog._blamed(sys._getframe()).startswith("test_outside_any_handler_the_first_frame_is_named (")
@@ -0,0 +1,100 @@
+import base64
+import json
+
+from outbound import OutboundScheduler
+from relay import TwilioMediaTemplate
+
+
+def _scheduler(frame_ms=100, mark_every_ms=500):
+    return OutboundScheduler(TwilioMediaTemplate("MZtest"), frame_ms=frame_ms, mark_every_ms=mark_every_ms)
+
+
+def _split(messages):
+    events = [json.loads(m) for m in messages]
+    media = [base64.b64decode(e["media"]["payload"]) for e in events if e["event"] == "media"]
+    marks = [e["mark"]["name"] for e in events if e["event"] == "mark"]
+    return media, marks
+
+
+def test_audio_is_reframed_and_marked_by_position():
+    outbound = _scheduler()
+    # 1.2 s of audio in uneven deltas
+    media, marks = _split(outbound.push(None, b"\x01" * 3000) + outbound.push(None, b"\x02" * 6600))
+    assert [len(frame) for frame in media] == [800] * 12
+    assert marks == ["4000", "8000"]  # one per 500 ms of audio, named after its end position
+    media, marks = _split(outbound.flush())
+    assert media == []  # 1.2 s is a whole number of frames
+    assert marks == ["9600"]  # flush closes the item with a final mark
+    assert outbound.sent == 9600
+
+
+def test_partial_frame_is_sent_on_flush():
+    outbound = _scheduler()
+    media, marks = _split(outbound.push(None, b"\x01" * 1000))
+    assert [len(frame) for frame in media] == [800]
+    media, marks = _split(outbound.flush())
+    assert [len(frame) for frame in media] == [200]
+    assert marks == ["1000"]
+
+
+def test_playing_until_every_mark_is_echoed():
+    outbound = _scheduler()
+    outbound.push(None, b"\x01" * 8000)
+    outbound.flush()
+    assert outbound.playing
+    outbound.mark_played("4000")
+    assert outbound.playing
+    outbound.mark_played("8000")
+    assert not outbound.playing
+
+
+def test_echo_acknowledges_every_earlier_mark():
+    outbound = _scheduler(mark_every_ms=100)
+    outbound.push(None, b"\x01" * 4000)  # marks at 800, 1600, ..., 4000
+    outbound.mark_played("2400")
+    assert outbound.playing
+    outbound.mark_played("4000")
+    assert not outbound.playing
+
+
+def test_clear_drops_outstanding_marks_and_stale_echoes():
+    outbound = _scheduler()
+    outbound.push(None, b"\x01" * 4500)  # one mark at 4000, 500 bytes buffered
+    outbound.clear()
+    assert not outbound.playing
+    outbound.mark_played("4000")  # echo of a mark sent before the clear
+    assert not outbound.playing
+    # The buffered 500 bytes were dropped, so the next mark is a full interval after 4000
+    _, marks = _split(outbound.push(None, b"\x01" * 4000))
+    assert marks == ["8000"]
+
+
+def test_item_played_ms_counts_from_the_item_start(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("outbound.time.monotonic", lambda: now[0])
+    outbound = _scheduler()
+    outbound.push(None, b"\x01" * 8000)  # first item, 1 s
+    outbound.mark_played("8000")
+    outbound.start_item()
+    outbound.push(None, b"\x01" * 8000)  # second item starts playing now
+    now[0] += 0.25
+    assert outbound.item_played_ms() == 250
+    now[0] += 5  # can never exceed what was sent
+    assert outbound.item_played_ms() == 1000
+
+
+def test_passthrough_relays_each_delta_without_decoding():
+    outbound = _scheduler(frame_ms=0)
+    payload = base64.b64encode(b"\x01" * 4000).decode("ascii")
+    messages = outbound.push(payload)
+    assert json.loads(messages[0])["media"]["payload"] == payload
+    _, marks = _split(messages)
+    assert marks == ["4000"]
+
+
+def test_playing_from_the_first_frame_before_any_mark():
+    outbound = _scheduler()
+    outbound.push(None, b"\x01" * 800)  # one frame, well short of the first mark
+    assert outbound.playing
+    outbound.clear()
+    assert not outbound.playing
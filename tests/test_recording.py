@@ -0,0 +1,120 @@
+import io
+
+from g711 import ULAW_SILENCE
+from recording import RecordingBuffer, StereoRecorder
+
+SILENCE = bytes((ULAW_SILENCE,))
+
+
+def _recorder(chunk_samples=1000):
+    sink = io.BytesIO()
+    return StereoRecorder(sink, chunk_samples=chunk_samples), sink
+
+
+def _channels(sink):
+    data = sink.getvalue()
+    return data[0::2], data[1::2]  # caller (left), agent (right)
+
+
+def test_caller_is_placed_by_timestamp_with_gaps_filled():
+    stereo, sink = _recorder()
+    stereo.write_caller(0, b"\x01" * 40)  # 5 ms
+    stereo.write_caller(10, b"\x02" * 80)  # Twilio skipped 5 ms
+    stereo.write_caller(5, b"\x03" * 20)  # a late frame fills part of the gap
+    stereo.close()
+    caller, agent = _channels(sink)
+    assert caller == b"\x01" * 40 + b"\x03" * 20 + SILENCE * 20 + b"\x02" * 80
+    assert agent == SILENCE * 160
+
+
+def test_agent_follows_its_own_end_or_the_caller_whichever_is_later():
+    stereo, sink = _recorder()
+    stereo.write_caller(0, b"\x01" * 80)
+    stereo.write_agent(b"\x02" * 40)  # starts where the caller is
+    stereo.write_agent(b"\x03" * 40)  # back to back, ahead of the caller
+    stereo.write_caller(10, b"\x01" * 240)
+    stereo.write_agent(b"\x04" * 10)  # the agent was silent, so from the caller again
+    stereo.close()
+    caller, agent = _channels(sink)
+    assert caller == b"\x01" * 320 + SILENCE * 10
+    assert agent == SILENCE * 80 + b"\x02" * 40 + b"\x03" * 40 + SILENCE * 160 + b"\x04" * 10
+
+
+def test_clear_agent_drops_what_the_caller_never_heard():
+    stereo, sink = _recorder()
+    stereo.write_caller(0, b"\x01" * 80)
+    stereo.write_agent(b"\x02" * 800)  # 100 ms sent, Twilio plays it in real time
+    stereo.write_caller(10, b"\x01" * 80)
+    stereo.clear_agent()  # the caller barged in 10 ms into the reply
+    stereo.write_caller(20, b"\x01" * 80)
+    stereo.write_agent(b"\x03" * 40)  # the next reply starts after the barge-in
+    stereo.close()
+    caller, agent = _channels(sink)
+    assert caller == b"\x01" * 240 + SILENCE * 40
+    assert agent == SILENCE * 80 + b"\x02" * 80 + SILENCE * 80 + b"\x03" * 40
+
+
+def test_mixing_waits_for_a_whole_chunk_of_caller_audio():
+    stereo, sink = _recorder(chunk_samples=100)
+    stereo.write_agent(b"\x02" * 500)
+    assert sink.getvalue() == b""  # agent audio alone never mixes
+    stereo.write_caller(0, b"\x01" * 96)
+    assert sink.getvalue() == b""
+    stereo.write_caller(13, b"\x01" * 150)  # caller timeline now at 254 samples
+    caller, agent = _channels(sink)
+    assert caller == b"\x01" * 96 + SILENCE * 8 + b"\x01" * 96
+    assert agent == b"\x02" * 200
+    # Only the unmixed remainder is held
+    assert len(stereo.caller.buf) == 54 and stereo.caller.base == 200
+    assert len(stereo.agent.buf) == 300 and stereo.agent.base == 200
+
+
+def test_close_mixes_the_rest_of_the_longer_track():
+    stereo, sink = _recorder(chunk_samples=100)
+    stereo.write_caller(0, b"\x01" * 150)
+    stereo.write_agent(b"\x02" * 100)
+    stereo.close()
+    caller, agent = _channels(sink)
+    assert caller == b"\x01" * 150 + SILENCE * 100
+    assert agent == SILENCE * 150 + b"\x02" * 100
+
+
+def test_buffer_drops_audio_past_its_cap():
+    buffer = RecordingBuffer(part_size=100, max_parts=2)
+    assert buffer.write(b"\x01" * 150)
+    assert not buffer.write(b"\x02" * 100)  # only 50 bytes of room left
+    assert buffer.dropped == 50
+    assert buffer.allocated == 2
+    assert buffer.high_water == 200
+    assert RecordingBuffer.peak_bytes >= 200
+    assert bytes(buffer.pop_full()) == b"\x01" * 100
+    assert bytes(buffer.pop_full()) == b"\x01" * 50 + b"\x02" * 50
+    assert buffer.pop_full() is None
+
+
+def test_buffer_reuses_parts_once_released():
+    buffer = RecordingBuffer(part_size=100, max_parts=2)
+    buffer.write(b"\x01" * 200)
+    first, second = buffer.pop_full(), buffer.pop_full()
+    assert not buffer.write(b"\x02")  # both parts still with the uploader
+    buffer.release(first)
+    assert buffer.write(b"\x03" * 100)
+    assert bytes(buffer.pop_full()) == b"\x03" * 100
+    buffer.release(second)
+    assert buffer.write(b"\x04" * 30)
+    assert buffer.allocated == 2  # no part was allocated past the cap
+    assert buffer.high_water == 200
+    assert buffer.dropped == 1
+
+
+def test_buffer_tail_hands_out_the_partial_part():
+    buffer = RecordingBuffer(part_size=100, max_parts=2)
+    buffer.write(b"\x01" * 130)
+    assert len(buffer) == 130
+    full = buffer.pop_full()
+    tail = buffer.tail()
+    assert bytes(tail) == b"\x01" * 30
+    assert len(buffer) == 0
+    buffer.release(full)
+    buffer.release(tail)
+    assert len(buffer._free) == 2  # both buffers are back for the next writes
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import socket
+
+import websockets
+
+from benchmarks.loadtest import CALLER_FRAMES, FRAME_MS, start_app, wait_until_up
+from mock_realtime import MockRealtimeServer
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_local_barge_in_stops_the_interrupted_item(tmp_path):
+    # app.py imports config.py for its keys; the mock never checks them
+    (tmp_path / "config.py").write_text('OPENAI_API_KEY = "test"\n')
+    mock = MockRealtimeServer(reply_ms=10000, speed=1)
+    port, mock_port = _free_port(), _free_port()
+
+    async def call():
+        async with websockets.connect(f"ws://127.0.0.1:{port}/media-stream") as ws:
+            await ws.send(json.dumps({"event": "start", "start": {"streamSid": "MZtest"}}))
+            # The greeting is playing; marks are never echoed, so it stays playing
+            while json.loads(await ws.recv())["event"] != "media":
+                pass
+            for n, payload in enumerate(CALLER_FRAMES[:10]):
+                await ws.send(json.dumps({"event": "media",
+                                          "media": {"timestamp": str(n * FRAME_MS), "payload": payload}}))
+                await asyncio.sleep(FRAME_MS / 1000)
+            while json.loads(await ws.recv())["event"] != "clear":
+                pass
+            after_clear = []
+            try:
+                while True:
+                    after_clear.append(json.loads(await asyncio.wait_for(ws.recv(), 1))["event"])
+            except asyncio.TimeoutError:
+                return after_clear
+
+    async def run():
+        async with mock.serve(port=mock_port):
+            app = start_app(port, mock_port, "off", None, extra_env={
+                "PYTHONPATH": str(tmp_path),
+                "COURSES_FILE": str(tmp_path / "courses.json"),
+                "LOCAL_BARGE_IN": "1",
+            })
+            try:
+                await wait_until_up(f"http://127.0.0.1:{port}")
+                return await asyncio.wait_for(call(), 30)
+            finally:
+                app.terminate()
+                # Off the loop, so the mock can still close the app's pooled sessions
+                await asyncio.to_thread(app.wait)
+
+    after_clear = asyncio.run(run())
+    assert "media" not in after_clear
+    assert mock.received.get("conversation.item.truncate") == 1
+    assert mock.received.get("response.cancel") == 1
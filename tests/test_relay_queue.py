@@ -0,0 +1,94 @@
+import asyncio
+
+from relay_queue import BLOCK, DROP_OLDEST, RelayQueue
+
+
+def _waiting(queue):
+    """The queued messages, oldest first, without taking them."""
+    return [queue._items[i][0] for i in range(len(queue))]
+
+
+def test_drop_oldest_counts_what_it_drops():
+    async def run():
+        queue = RelayQueue("test", 3, DROP_OLDEST)
+        for n in range(5):
+            await queue.put(n)
+        return queue
+
+    queue = asyncio.run(run())
+    assert _waiting(queue) == [2, 3, 4]
+    assert queue.dropped == 2
+    assert queue.high_water == 3
+
+
+def test_drop_oldest_keeps_non_droppable_messages_in_order():
+    async def run():
+        queue = RelayQueue("test", 3, DROP_OLDEST)
+        await queue.put("mark 1", droppable=False)
+        await queue.put("media a")
+        await queue.put("media b")
+        await queue.put("media c")  # drops "media a", not the mark ahead of it
+        await queue.put("mark 2", droppable=False)  # drops "media b"
+        return queue
+
+    queue = asyncio.run(run())
+    assert _waiting(queue) == ["mark 1", "media c", "mark 2"]
+    assert queue.dropped == 2
+
+
+def test_drop_oldest_waits_once_only_non_droppable_messages_are_left():
+    async def run():
+        queue = RelayQueue("test", 2, DROP_OLDEST)
+        await queue.put("mark 1", droppable=False)
+        await queue.put("mark 2", droppable=False)
+        put = asyncio.create_task(queue.put("media"))
+        await asyncio.sleep(0.01)
+        paused = not put.done()
+        first = await queue.get()
+        await put
+        return queue, paused, first
+
+    queue, paused, first = asyncio.run(run())
+    assert paused
+    assert first == "mark 1"
+    assert _waiting(queue) == ["mark 2", "media"]
+    assert queue.dropped == 0
+
+
+def test_block_pauses_the_reader_until_the_pump_catches_up():
+    sent = []
+
+    async def send(message):
+        await asyncio.sleep(0.001)  # a slow peer
+        sent.append(message)
+
+    async def run():
+        queue = RelayQueue("test", 2, BLOCK)
+        pump = asyncio.create_task(queue.pump(send))
+        for n in range(20):
+            await queue.put(n)
+        while len(queue):
+            await asyncio.sleep(0.001)
+        queue.close()
+        await pump
+        return queue
+
+    queue = asyncio.run(run())
+    assert sent == list(range(20))
+    assert queue.dropped == 0
+    assert queue.high_water == 2
+
+
+def test_close_releases_a_paused_put():
+    async def run():
+        queue = RelayQueue("test", 1, BLOCK)
+        await queue.put("first")
+        put = asyncio.create_task(queue.put("second"))
+        await asyncio.sleep(0)
+        queue.close()
+        await asyncio.wait_for(put, 1)
+        return queue, await queue.get()
+
+    queue, message = asyncio.run(run())
+    assert message is None
+    assert len(queue) == 0
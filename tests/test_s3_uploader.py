@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from s3_uploader import PART_SIZE
+from tests.support import BUCKET, FlakyClient, client_error, fast_uploader, open_uploads
+
+
+def test_parts_are_uploaded_and_completed(s3):
+    async def run():
+        uploader = fast_uploader(s3)
+        upload = uploader.start("call.raw")
+        released = []
+        await uploader.upload_part(upload, b"a" * PART_SIZE, on_done=released.append)
+        stored = await uploader.complete(upload, b"tail", on_done=released.append)
+        uploader.shutdown()
+        return stored, released
+
+    stored, released = asyncio.run(run())
+    assert stored
+    assert len(released) == 2
+    body = s3.get_object(Bucket=BUCKET, Key="call.raw")["Body"].read()
+    assert body == b"a" * PART_SIZE + b"tail"
+
+
+def test_transient_errors_are_retried(s3):
+    flaky = FlakyClient(s3)
+    flaky.fail("create_multipart_upload", client_error(500), client_error(503))
+    flaky.fail("upload_part", client_error(429, "SlowDown"))
+
+    async def run():
+        uploader = fast_uploader(flaky)
+        upload = uploader.start("retried.raw")
+        stored = await uploader.complete(upload, b"audio")
+        uploader.shutdown()
+        return stored
+
+    assert asyncio.run(run())
+    assert flaky.calls["create_multipart_upload"] == 3
+    assert flaky.calls["upload_part"] == 2
+    assert s3.get_object(Bucket=BUCKET, Key="retried.raw")["Body"].read() == b"audio"
+
+
+def test_permanent_error_is_not_retried_and_upload_is_aborted(s3):
+    flaky = FlakyClient(s3)
+    flaky.fail("upload_part", client_error(403, "AccessDenied"))
+
+    async def run():
+        uploader = fast_uploader(flaky)
+        upload = uploader.start("denied.raw")
+        stored = await uploader.complete(upload, b"audio")
+        uploader.shutdown()
+        return upload, stored
+
+    upload, stored = asyncio.run(run())
+    assert not stored
+    assert upload.failed and upload.closed
+    assert flaky.calls["upload_part"] == 1
+    assert flaky.calls["abort_multipart_upload"] == 1
+    assert open_uploads(s3) == []
+
+
+def test_retries_give_up_after_max_attempts(s3):
+    flaky = FlakyClient(s3)
+    flaky.fail("upload_part", *[client_error(500)] * 3)
+
+    async def run():
+        uploader = fast_uploader(flaky, max_attempts=3)
+        upload = uploader.start("flaky.raw")
+        stored = await uploader.complete(upload, b"audio")
+        uploader.shutdown()
+        return stored
+
+    assert not asyncio.run(run())
+    assert flaky.calls["upload_part"] == 3
+    assert open_uploads(s3) == []
+
+
+def test_complete_twice_is_a_no_op(s3):
+    async def run():
+        uploader = fast_uploader(s3)
+        upload = uploader.start("once.raw")
+        first = await uploader.complete(upload, b"audio")
+        released = []
+        second = await uploader.complete(upload, b"late", on_done=released.append)
+        uploader.shutdown()
+        return first, second, released
+
+    first, second, released = asyncio.run(run())
+    assert first and not second
+    assert released == [b"late"]  # handed back even though it was not uploaded
+
+
+def test_warm_reports_a_refused_bucket_without_failing(s3):
+    async def run():
+        uploader = fast_uploader(s3)
+        refused = await uploader.warm(1, [BUCKET, "missing-bucket"])  # every bucket is tried once
+        uploader.shutdown()
+        return refused
+
+    refused = asyncio.run(run())
+    assert list(refused) == ["missing-bucket"]
+
+
+def test_warm_raises_when_s3_is_unreachable(s3):
+    flaky = FlakyClient(s3)
+    flaky.fail("list_multipart_uploads", *[EndpointConnectionError(endpoint_url="https://s3")] * 5)
+
+    async def run():
+        uploader = fast_uploader(flaky)
+        try:
+            await uploader.warm(1)
+        finally:
+            uploader.shutdown()
+
+    with pytest.raises(EndpointConnectionError):
+        asyncio.run(run())
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import pytest
+
+from s3_uploader import PART_SIZE
+from spool import RecordingSpool, SpoolShipper
+from tests.support import BUCKET, fast_uploader, open_uploads
+
+
+def test_orphaned_spool_resumes_its_upload(s3, tmp_path):
+    audio = b"a" * PART_SIZE + b"b" * 1000
+
+    async def crash():
+        # A call that shipped its first part, then lost its worker
+        uploader = fast_uploader(s3)
+        shipper = SpoolShipper(uploader, str(tmp_path))
+        spool = shipper.open()
+        spool.attach(uploader.start("orphan.raw"))
+        spool.write(audio)
+        await shipper._ship(spool)
+        await asyncio.gather(*spool.upload.pending)
+        spool._file.close()  # the process dies holding the file
+        uploader.shutdown()
+
+    async def restart():
+        uploader = fast_uploader(s3)
+        await SpoolShipper(uploader, str(tmp_path), stale_after=3600).recover()
+        uploader.shutdown()
+
+    asyncio.run(crash())
+    assert len(open_uploads(s3)) == 1
+    asyncio.run(restart())
+    assert s3.get_object(Bucket=BUCKET, Key="orphan.raw")["Body"].read() == audio
+    assert open_uploads(s3) == []
+    assert os.listdir(tmp_path) == []
+
+
+def test_orphan_without_an_upload_id_starts_a_new_upload(s3, tmp_path):
+    spool = RecordingSpool(str(tmp_path), name="early")
+    with open(spool.state_path, "w") as f:
+        f.write('{"key": "early.raw", "bucket": "%s", "upload_id": null}' % BUCKET)
+    spool.write(b"c" * 1000)
+    spool._file.close()
+
+    async def restart():
+        uploader = fast_uploader(s3)
+        await SpoolShipper(uploader, str(tmp_path)).recover()
+        uploader.shutdown()
+
+    asyncio.run(restart())
+    assert s3.get_object(Bucket=BUCKET, Key="early.raw")["Body"].read() == b"c" * 1000
+
+
+def test_stale_uploads_are_aborted_and_live_ones_kept(s3, tmp_path):
+    stale = s3.create_multipart_upload(Bucket=BUCKET, Key="stale.raw")["UploadId"]
+
+    async def run():
+        uploader = fast_uploader(s3)
+        shipper = SpoolShipper(uploader, str(tmp_path), stale_after=0)
+        live = shipper.open()  # still locked by a call in progress
+        live.attach(uploader.start("live.raw"))
+        await live.upload.created
+        await shipper.recover()
+        uploader.shutdown()
+        return live
+
+    live = asyncio.run(run())
+    open_ids = {u["UploadId"] for u in open_uploads(s3)}
+    assert stale not in open_ids
+    assert live.upload.upload_id in open_ids
+    assert os.path.exists(live.path)
+    live.close(False)
+
+
+def test_locked_spool_does_not_leak_its_file(tmp_path):
+    live = RecordingSpool(str(tmp_path), name="live")
+    open_fds = len(os.listdir("/dev/fd"))
+    with pytest.raises(BlockingIOError) as excinfo:
+        RecordingSpool(str(tmp_path), name="live", resume=True)
+    # excinfo keeps the failed __init__ alive, so a file it left open would still be open here
+    assert len(os.listdir("/dev/fd")) == open_fds
+    live.close(True)
+
+
+def test_write_tracks_the_process_peak(tmp_path):
+    spool = RecordingSpool(str(tmp_path), part_size=1000)
+    spool.write(b"d" * 1500)
+    spool.pop_full()
+    spool.write(b"d" * 100)
+    assert spool.high_water == 1500
+    assert RecordingSpool.peak_bytes >= 1500
+    spool.close(True)
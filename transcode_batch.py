@@ -0,0 +1,177 @@
+# transcode_batch.py
+#
+# Nightly job: turn raw call recordings in S3 into playable, compressed files.
+#
+#   python transcode_batch.py --workers 8 --formats flac opus --max-minutes 120
+#
+# For every {stream_sid}_{mode}_audio.raw without a manifest it writes
+# transcoded/{name}/{name}.wav (and .flac, .opus, ...) plus
+# transcoded/{name}/manifest.json. The manifest is written last, so a
+# recording only counts as done once all its outputs exist; rerunning the job
+# skips finished recordings and redoes interrupted ones.
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timezone
+
+from convertwav import raw_to_wav
+from g711 import SAMPLE_RATE
+
+S3_BUCKET_NAME = "audio-calls-info"
+OUTPUT_PREFIX = "transcoded/"
+RAW_SUFFIXES = {"_combined_audio.raw": 1, "_stereo_audio.raw": 2}  # suffix -> channels
+# pydub export arguments per output format
+EXPORT_OPTIONS = {
+    "flac": {"format": "flac"},
+    "opus": {"format": "opus", "bitrate": "24k"},
+    "mp3": {"format": "mp3", "bitrate": "32k"},
+}
+
+
+def _channels(key):
+    for suffix, channels in RAW_SUFFIXES.items():
+        if key.endswith(suffix):
+            return channels
+    return None
+
+
+def _name(key):
+    return key.rsplit("/", 1)[-1][:-len(".raw")]
+
+
+def list_unprocessed(client, bucket):
+    """Raw recordings in `bucket` that have no manifest yet, oldest first."""
+    paginator = client.get_paginator("list_objects_v2")
+    done = set()
+    for page in paginator.paginate(Bucket=bucket, Prefix=OUTPUT_PREFIX):
+        for obj in page.get("Contents", []):
+            if obj["Key"].endswith("/manifest.json"):
+                done.add(obj["Key"][len(OUTPUT_PREFIX):-len("/manifest.json")])
+    pending = []
+    for page in paginator.paginate(Bucket=bucket):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            if not key.startswith(OUTPUT_PREFIX) and _channels(key) and _name(key) not in done:
+                pending.append(obj)
+    pending.sort(key=lambda obj: obj["LastModified"])
+    return [obj["Key"] for obj in pending]
+
+
+def transcode_one(bucket, key, formats):
+    """Download, transcode and upload one recording. Runs in a worker process."""
+    from s3_client import s3_client  # each spawned worker builds its own client
+
+    started = time.monotonic()
+    name = _name(key)
+    channels = _channels(key)
+    prefix = f"{OUTPUT_PREFIX}{name}/"
+    outputs = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        wav_path = os.path.join(workdir, f"{name}.wav")
+        # Streams the object body through the converter chunk by chunk
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+        try:
+            frames = raw_to_wav(body, wav_path, num_channels=channels)
+        finally:
+            body.close()
+        paths = {"wav": wav_path}
+        if formats:
+            from pydub import AudioSegment
+            audio = AudioSegment.from_wav(wav_path)
+            for fmt in formats:
+                paths[fmt] = os.path.join(workdir, f"{name}.{fmt}")
+                audio.export(paths[fmt], **EXPORT_OPTIONS[fmt])
+        for fmt, path in paths.items():
+            out_key = f"{prefix}{name}.{fmt}"
+            s3_client.upload_file(path, bucket, out_key)
+            outputs[fmt] = {"key": out_key, "bytes": os.path.getsize(path)}
+
+    manifest = {
+        "source": key,
+        "channels": channels,
+        "sample_rate": SAMPLE_RATE,
+        "duration_seconds": frames / SAMPLE_RATE,
+        "outputs": outputs,
+        "transcoded_at": datetime.now(timezone.utc).isoformat(),
+        "elapsed_seconds": round(time.monotonic() - started, 3),
+    }
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=f"{prefix}manifest.json",
+        Body=json.dumps(manifest, indent=2).encode("utf-8"),
+        ContentType="application/json",
+    )
+    return manifest
+
+
+def run(bucket=S3_BUCKET_NAME, workers=None, formats=("flac", "opus"), max_minutes=None, limit=None):
+    """Transcode every unprocessed recording; stops taking new work after `max_minutes`."""
+    from s3_client import s3_client
+
+    for fmt in formats:
+        if fmt not in EXPORT_OPTIONS:
+            raise ValueError(f"Unsupported format: {fmt}")
+    keys = list_unprocessed(s3_client, bucket)
+    if limit is not None:
+        keys = keys[:limit]
+    print(f"{len(keys)} recordings to transcode")
+
+    workers = workers or os.cpu_count()
+    deadline = time.monotonic() + max_minutes * 60 if max_minutes else None
+    started = time.monotonic()
+    files = failed = 0
+    audio_seconds = 0.0
+    todo = iter(keys)
+    # spawn, so no worker inherits the parent's boto3 connection pool
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        running = {}
+
+        def submit_more():
+            # Keep a bounded number of tasks queued instead of submitting all keys up front
+            while len(running) < workers * 2 and (deadline is None or time.monotonic() < deadline):
+                key = next(todo, None)
+                if key is None:
+                    return
+                running[pool.submit(transcode_one, bucket, key, tuple(formats))] = key
+
+        submit_more()
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = running.pop(future)
+                try:
+                    manifest = future.result()
+                    files += 1
+                    audio_seconds += manifest["duration_seconds"]
+                except Exception as e:
+                    failed += 1
+                    print(f"Error transcoding {key}: {e}")
+            submit_more()
+
+    minutes = max(time.monotonic() - started, 1e-9) / 60
+    print(f"Transcoded {files} recordings ({failed} failed, {len(keys) - files - failed} left for the next run) "
+          f"in {minutes:.1f} min: {files / minutes:.1f} files/min, "
+          f"{audio_seconds / 3600 / minutes:.3f} audio-hours/min")
+    return files, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transcode raw call recordings in S3.")
+    parser.add_argument("--bucket", default=S3_BUCKET_NAME)
+    parser.add_argument("--workers", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--formats", nargs="*", default=["flac", "opus"], choices=sorted(EXPORT_OPTIONS))
+    parser.add_argument("--max-minutes", type=float, default=None,
+                        help="stop starting new recordings after this long")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args(argv)
+    run(args.bucket, args.workers, args.formats, args.max_minutes, args.limit)
+
+
+if __name__ == "__main__":
+    main()